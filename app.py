@@ -1,4 +1,6 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from utils import metrics
 
 def load_css(file_path):
     with open(file_path) as f:
@@ -24,4 +26,12 @@ pg = st.navigation(
         }
     )
 
+show_performance = st.sidebar.toggle("Painel de desempenho", key="performance_panel")
+metrics.begin_run(trace_memory=show_performance, tracer=get_script_run_ctx().session_id)
+
 pg.run()
+
+if show_performance:
+    from tabs import sidebar_performance
+    sidebar_performance.render()
+metrics.write_prometheus()
@@ -0,0 +1,331 @@
+"""
+Benchmarks dos caminhos críticos do app, com dados sintéticos e serviços locais.
+
+Mede leitura e inclusão em lote na planilha (com um `GSheetsConnection` falso com latência),
+token e download do CEDA (servidor local com Range e autenticação), leitura e
+extração de NetCDF (local e via HTTP Range), filtro/pivot/agregação dos dados
+INMET, decodificação de coordenadas e índice espacial das estações e as
+métricas KGE. Para cada caso registra tempo (mediana), vazão e pico de
+memória (tracemalloc), compara com a última execução de mesma configuração
+no histórico JSONL e aponta regressões.
+
+Exemplos:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --stations 600 --years 40 --grid 240x360x720 --repeat 5
+    python benchmarks/run_benchmarks.py --only inmet_filter_pivot kge_score_table --fail-on-regression
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks import synthetic  # noqa: E402
+from benchmarks.standins import TOKEN, CedaStandIn, FakeGSheetsConnection, install_fake_gsheets  # noqa: E402
+
+HISTORY_PATH = os.path.join(ROOT, "benchmarks", "history", "benchmarks.jsonl")
+REGRESSION_THRESHOLD = 0.2
+
+BENCHMARKS = {}
+
+
+def benchmark(unit=None):
+    """Registra um caso. A função recebe o contexto e devolve quantas `unit` processou (ou None)."""
+    def register(fn):
+        BENCHMARKS[fn.__name__] = (fn, unit)
+        return fn
+    return register
+
+
+class Context:
+    def __init__(self, args, workdir):
+        self.args = args
+        self.workdir = workdir
+        self.stations = synthetic.stations_table(args.stations)
+        self.inmet = synthetic.inmet_table(args.stations, args.years)
+        self.extract_stations = self._with_coordinates(args.extract_stations)
+        self.grid_path = os.path.join(workdir, "grid.nc")
+        times, lat, lon = args.grid
+        synthetic.netcdf_grid(self.grid_path, times, lat, lon, chunks=args.chunks)
+        self.grid_bytes = os.path.getsize(self.grid_path)
+        self.sheets = install_fake_gsheets(FakeGSheetsConnection(
+            {"Estacoes": self.stations, "Dados INMET": self.inmet}, latency=args.sheets_latency
+        ))
+        self.ceda = CedaStandIn(workdir, latency=args.ceda_latency, bandwidth=args.bandwidth)
+        self.headers = {"Authorization": f"Bearer {TOKEN}"}
+
+    def _with_coordinates(self, n):
+        from utils.stations import stations_with_coordinates
+
+        return stations_with_coordinates(self.stations.head(n))[["CD_ESTACAO", "lat", "lon"]]
+
+
+@benchmark(unit="leituras")
+def sheets_read_cold(ctx):
+    from utils.gsheets_connection import invalidate, read_worksheet
+
+    invalidate("Estacoes")
+    read_worksheet("Estacoes")
+    return 1
+
+
+@benchmark(unit="leituras")
+def sheets_read_warm(ctx):
+    from utils.gsheets_connection import read_worksheet
+
+    read_worksheet("Estacoes")
+    for _ in range(99):
+        read_worksheet("Estacoes")
+    return 100
+
+
+@benchmark(unit="estações")
+def sheets_append_batch(ctx):
+    from benchmarks.synthetic import stations_table
+    from utils.station_writes import StationWriteQueue
+
+    ctx.appended = getattr(ctx, "appended", 0) + 1
+    new_rows = stations_table(50, seed=ctx.appended)
+    new_rows["CD_ESTACAO"] = [f"N{ctx.appended}-{i}" for i in range(len(new_rows))]
+    queue = StationWriteQueue(delay=60)
+    futures = [queue.append([row]) for row in new_rows.to_dict("records")]
+    queue.flush()
+    return sum(future.result() for future in futures)
+
+
+@benchmark(unit="tokens")
+def ceda_token(ctx):
+    from utils import ceda_access_token
+
+    ceda_access_token.TOKEN_URL = ctx.ceda.token_url
+    ceda_access_token.clear_token("bench", "bench")
+    ceda_access_token.get_access_token("bench", "bench")
+    ceda_access_token.clear_token("bench", "bench")
+    return 1
+
+
+@benchmark(unit="bytes")
+def ceda_download(ctx):
+    from utils.ceda_download import download_dataset
+
+    dest = os.path.join(ctx.workdir, "download.nc")
+    result = download_dataset(ctx.ceda.url("grid.nc"), headers=ctx.headers, dest_path=dest)
+    os.unlink(result["path"])
+    return result["size"]
+
+
+@benchmark(unit="estações")
+def netcdf_extract_local(ctx):
+    import xarray as xr
+    from utils.station_extraction import _grid_index_cache, extract_monthly_series
+
+    _grid_index_cache.clear()
+    with xr.open_dataset(ctx.grid_path) as ds:
+        series, _ = extract_monthly_series(ds, ctx.extract_stations, var_name="pre")
+    return series.shape[1]
+
+
+@benchmark(unit="estações")
+def netcdf_extract_range(ctx):
+    from utils import ceda_remote
+    from utils.ceda_remote import open_remote_dataset
+    from utils.station_extraction import _grid_index_cache, extract_monthly_series
+
+    url = ctx.ceda.url("grid.nc")
+    ceda_remote.BLOCK_CACHE_DIR = os.path.join(ctx.workdir, "blocks")
+    shutil.rmtree(ceda_remote.BLOCK_CACHE_DIR, ignore_errors=True)
+    _grid_index_cache.clear()
+    ds, remote_file = open_remote_dataset(url, headers=ctx.headers, mode="range")
+    try:
+        series, _ = extract_monthly_series(ds, ctx.extract_stations, var_name="pre")
+    finally:
+        ds.close()
+        remote_file.close()
+    return series.shape[1]
+
+
+@benchmark(unit="linhas")
+def inmet_index_build(ctx):
+    from utils.inmet_index import InmetIndex
+
+    InmetIndex(ctx.inmet)
+    return len(ctx.inmet)
+
+
+@benchmark(unit="linhas")
+def inmet_filter_pivot(ctx):
+    from utils.inmet_index import get_inmet_index
+
+    index = get_inmet_index(ctx.inmet)
+    stations = index.stations[:10]
+    filtered = index.filter(stations, index.min_date, index.max_date)
+    filtered.pivot(index="Data_Medicao", columns="Nome", values="PRECIPITACAO_TOTAL_MENSAL_mm")
+    return len(filtered)
+
+
+@benchmark(unit="linhas")
+def inmet_cube_query(ctx):
+    from utils.inmet_cube import aggregate, query
+    from utils.inmet_index import get_inmet_index
+
+    index = get_inmet_index(ctx.inmet)
+    aggregate(ctx.inmet, ["PRECIPITACAO_TOTAL_MENSAL_mm"])
+    start = index.min_date + (index.max_date - index.min_date) / 4
+    query(ctx.inmet, index, "PRECIPITACAO_TOTAL_MENSAL_mm", index.stations, start, index.max_date)
+    return len(ctx.inmet)
+
+
+@benchmark(unit="estações")
+def coordinates_decode(ctx):
+    from utils.stations import stations_with_coordinates
+
+    stations_with_coordinates(ctx.stations)
+    return len(ctx.stations)
+
+
+@benchmark(unit="consultas")
+def station_index_queries(ctx):
+    from utils.stations import StationIndex, stations_with_coordinates
+
+    index = StationIndex(stations_with_coordinates(ctx.stations))
+    points = ctx.extract_stations
+    for row in points.itertuples():
+        index.within_radius(row.lat, row.lon, 50)
+        index.within_bbox(row.lat - 0.5, row.lat + 0.5, row.lon - 0.5, row.lon + 0.5)
+    return 2 * len(points)
+
+
+@benchmark(unit="estações")
+def kge_score_table(ctx):
+    from utils.kge import score_table
+
+    simulations, evaluations = synthetic.monthly_frames(ctx.args.stations, ctx.args.years * 12)
+    score_table(simulations, evaluations)
+    return ctx.args.stations
+
+
+def run_case(fn, ctx, repeat):
+    """Mediana de `repeat` execuções cronometradas e pico de memória de uma execução extra com tracemalloc."""
+    fn(ctx)  # aquecimento: imports e caches de processo
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        units = fn(ctx)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn(ctx)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    seconds = statistics.median(timings)
+    return {
+        "seconds": round(seconds, 6),
+        "peak_mb": round(peak / 2 ** 20, 2),
+        "throughput": round(units / seconds, 2) if units and seconds else None,
+    }
+
+
+def previous_record(history_path, config):
+    if not os.path.exists(history_path):
+        return None
+    previous = None
+    with open(history_path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get("config") == config:
+                previous = record
+    return previous
+
+
+def regressions(results, previous, threshold):
+    """Casos mais lentos, com menos vazão ou mais memória que na execução anterior (acima de `threshold`)."""
+    found = []
+    for name, result in results.items():
+        before = (previous or {}).get("results", {}).get(name)
+        if not before:
+            continue
+        for metric in ("seconds", "peak_mb"):
+            if before[metric] and result[metric] > before[metric] * (1 + threshold):
+                found.append(f"{name}: {metric} {before[metric]} -> {result[metric]}")
+    return found
+
+
+def git_commit():
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def dimensions(value):
+    return [int(part) for part in value.lower().split("x")]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmarks dos caminhos críticos com dados sintéticos.")
+    parser.add_argument("--stations", type=int, default=300, help="Estações nas tabelas sintéticas")
+    parser.add_argument("--years", type=int, default=30, help="Anos de dados mensais por estação")
+    parser.add_argument("--grid", type=dimensions, default=[120, 360, 720], help="Grade NetCDF tempo x lat x lon")
+    parser.add_argument("--chunks", type=dimensions, default=[12, 60, 60], help="Chunking HDF5 da grade")
+    parser.add_argument("--extract-stations", type=int, default=50, help="Estações extraídas da grade")
+    parser.add_argument("--sheets-latency", type=float, default=0.3, help="Latência (s) do Google Sheets falso")
+    parser.add_argument("--ceda-latency", type=float, default=0.005, help="Latência (s) por requisição ao CEDA local")
+    parser.add_argument("--bandwidth", type=float, help="Limite de banda do CEDA local (bytes/s)")
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções cronometradas por caso")
+    parser.add_argument("--only", nargs="*", choices=sorted(BENCHMARKS), help="Casos a executar (padrão: todos)")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Piora relativa tolerada")
+    parser.add_argument("--history", default=HISTORY_PATH, help="Arquivo JSONL do histórico")
+    parser.add_argument("--no-save", action="store_true", help="Não grava no histórico")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Código de saída 1 se houver regressão")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    config = {key: getattr(args, key) for key in (
+        "stations", "years", "grid", "chunks", "extract_stations", "sheets_latency", "ceda_latency", "bandwidth"
+    )}
+
+    workdir = tempfile.mkdtemp(prefix="ceda_bench_")
+    results = {}
+    try:
+        ctx = Context(args, workdir)
+        with ctx.ceda:
+            for name in args.only or BENCHMARKS:
+                fn, unit = BENCHMARKS[name]
+                results[name] = {**run_case(fn, ctx, args.repeat), "unit": unit}
+                result = results[name]
+                throughput = f"{result['throughput']:>14,.1f} {unit}/s" if result["throughput"] else ""
+                print(f"{name:<24} {result['seconds'] * 1000:>10.1f} ms {result['peak_mb']:>9.1f} MB {throughput}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    found = regressions(results, previous_record(args.history, config), args.threshold)
+    for line in found:
+        print(f"REGRESSÃO {line}")
+
+    if not args.no_save:
+        record = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "config": config,
+            "results": results,
+        }
+        os.makedirs(os.path.dirname(args.history), exist_ok=True)
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    return 1 if found and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
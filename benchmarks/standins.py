@@ -0,0 +1,220 @@
+"""Substitutos locais do servidor CEDA e do `GSheetsConnection`, com latência configurável."""
+import os
+import re
+import time
+import json
+import base64
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TOKEN = "benchmark-token"
+TOKEN_PATH = "/api/token/create/"
+
+
+class CedaStandIn:
+    """
+    Servidor HTTP local que imita o CEDA para os arquivos de `root`.
+
+    Exige `Authorization: Bearer <TOKEN>`, responde HEAD com ETag e
+    Content-Length, atende `Range` (206/416, respeitando `If-Range`) e emite
+    tokens em `TOKEN_PATH` com autenticação Basic. `latency` (s) é somada a
+    cada resposta e `bandwidth` (bytes/s) limita a taxa de envio. Conta
+    requisições e bytes.
+    """
+
+    def __init__(self, root, latency=0.0, bandwidth=None, username="bench", password="bench", expires_in=3600):
+        self.root = root
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.credentials = base64.b64encode(f"{username}:{password}".encode()).decode()
+        self.expires_in = expires_in
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/"
+
+    @property
+    def token_url(self):
+        return self.base_url.rstrip("/") + TOKEN_PATH
+
+    def url(self, name):
+        return self.base_url + name
+
+    def _count(self, sent):
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += sent
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, headers=None, body=b""):
+                time.sleep(stand_in.latency)
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self._write(body)
+                stand_in._count(len(body) if self.command != "HEAD" else 0)
+
+            def _write(self, body):
+                if not stand_in.bandwidth:
+                    self.wfile.write(body)
+                    return
+                step = max(1, int(stand_in.bandwidth / 20))
+                for start in range(0, len(body), step):
+                    self.wfile.write(body[start:start + step])
+                    time.sleep(len(body[start:start + step]) / stand_in.bandwidth)
+
+            def _path(self):
+                path = os.path.join(stand_in.root, self.path.lstrip("/").split("?")[0])
+                return path if os.path.isfile(path) else None
+
+            def _authorized(self):
+                return self.headers.get("Authorization") == f"Bearer {TOKEN}"
+
+            def do_POST(self):
+                if self.path != TOKEN_PATH:
+                    return self._send(404)
+                if self.headers.get("Authorization") != f"Basic {stand_in.credentials}":
+                    return self._send(401)
+                body = json.dumps({"access_token": TOKEN, "expires_in": stand_in.expires_in}).encode()
+                self._send(200, {"Content-Type": "application/json"}, body)
+
+            def do_HEAD(self):
+                self._serve(head=True)
+
+            def do_GET(self):
+                self._serve(head=False)
+
+            def _serve(self, head):
+                if not self._authorized():
+                    return self._send(401)
+                path = self._path()
+                if path is None:
+                    return self._send(404)
+
+                stat = os.stat(path)
+                headers = {"ETag": f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"', "Accept-Ranges": "bytes",
+                           "Content-Type": "application/x-netcdf"}
+                if head:
+                    time.sleep(stand_in.latency)
+                    self.send_response(200)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", str(stat.st_size))
+                    self.end_headers()
+                    stand_in._count(0)
+                    return
+
+                match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+                if_range = self.headers.get("If-Range")
+                if not match or (if_range and if_range != headers["ETag"]):
+                    with open(path, "rb") as f:
+                        return self._send(200, headers, f.read())
+
+                start = int(match.group(1))
+                if start >= stat.st_size:
+                    return self._send(416, {"Content-Range": f"bytes */{stat.st_size}"})
+                end = min(int(match.group(2)) if match.group(2) else stat.st_size - 1, stat.st_size - 1)
+                with open(path, "rb") as f:
+                    f.seek(start)
+                    body = f.read(end - start + 1)
+                self._send(206, {**headers, "Content-Range": f"bytes {start}-{end}/{stat.st_size}"}, body)
+
+        return Handler
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class FakeWorksheet:
+    """`gspread.Worksheet` mínimo sobre uma aba do `FakeGSheetsConnection` (linha 1 = cabeçalho)."""
+
+    def __init__(self, connection, name):
+        self.connection = connection
+        self.name = name
+
+    @property
+    def _df(self):
+        return self.connection.worksheets[self.name]
+
+    @property
+    def row_count(self):
+        return len(self._df) + 1
+
+    def row_values(self, row):
+        self.connection._call()
+        return [str(col) for col in self._df.columns] if row == 1 else [str(v) for v in self._df.iloc[row - 2]]
+
+    def col_values(self, col):
+        self.connection._call()
+        return [str(self._df.columns[col - 1])] + [str(v) for v in self._df.iloc[:, col - 1]]
+
+    def append_rows(self, values, **kwargs):
+        import pandas as pd
+
+        self.connection._call()
+        new_rows = pd.DataFrame(values, columns=self._df.columns)
+        self.connection.worksheets[self.name] = pd.concat([self._df, new_rows], ignore_index=True)
+
+
+class FakeGSheetsConnection:
+    """
+    `GSheetsConnection` em memória: `read`/`update`/`clear` sobre DataFrames,
+    com `latency` segundos por chamada, como uma chamada à API do Google Sheets.
+    `client._select_worksheet` devolve um `FakeWorksheet`, usado por `open_worksheet`.
+    """
+
+    def __init__(self, worksheets, latency=0.3):
+        self.worksheets = {name: df.copy() for name, df in worksheets.items()}
+        self.latency = latency
+        self.calls = 0
+        self.client = self
+
+    def _select_worksheet(self, worksheet=None):
+        return FakeWorksheet(self, worksheet)
+
+    def _call(self):
+        self.calls += 1
+        time.sleep(self.latency)
+
+    def read(self, worksheet=None, ttl=None, **kwargs):
+        self._call()
+        return self.worksheets[worksheet].copy()
+
+    def update(self, worksheet=None, data=None, **kwargs):
+        self._call()
+        self.worksheets[worksheet] = data.copy()
+
+    def clear(self, worksheet=None, **kwargs):
+        self._call()
+
+
+def install_fake_gsheets(connection):
+    """Faz `utils.gsheets_connection` usar `connection` e limpa o cache de leituras."""
+    from utils import gsheets_connection
+
+    gsheets_connection.get_connection = lambda: connection
+    gsheets_connection.invalidate()
+    return connection
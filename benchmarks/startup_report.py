@@ -0,0 +1,122 @@
+"""
+Tempo de importação (cold start) de cada página do app.
+
+Para cada arquivo em `pages/`, importa em um processo Python novo os módulos
+de `tabs/` usados pela página, com `-X importtime`, e desconta o tempo de
+importar o próprio Streamlit (que o servidor já carregou). Mostra os módulos
+mais pesados de cada página e acrescenta o resultado ao histórico em JSONL,
+para acompanhar a evolução entre commits.
+
+Exemplos:
+    python benchmarks/startup_report.py
+    python benchmarks/startup_report.py --repeat 5 --budget-ms 800
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_PATH = os.path.join(ROOT, "benchmarks", "history", "startup.jsonl")
+BASELINE_MODULES = ["streamlit"]
+
+
+def page_modules(page_path):
+    """Módulos `tabs.*` importados por um arquivo de `pages/`."""
+    with open(page_path, encoding="utf-8") as f:
+        source = f.read()
+    modules = []
+    for names in re.findall(r"^from tabs import (.+)$", source, flags=re.MULTILINE):
+        modules += [f"tabs.{name.strip()}" for name in names.split(",")]
+    modules += re.findall(r"^import (tabs\.\w+)", source, flags=re.MULTILINE)
+    return modules
+
+
+def import_times(modules):
+    """`{módulo: tempo acumulado em µs}` ao importar `modules` num processo novo."""
+    code = "; ".join(f"import {module}" for module in BASELINE_MODULES + modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    times = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", line)
+        if match:
+            times[match.group(4)] = (int(match.group(2)), len(match.group(3)))
+    return times
+
+
+def measure(modules, repeat):
+    """Tempo (ms) das importações da página, além do Streamlit, e os módulos mais pesados da última execução."""
+    baseline = set(import_times([]))
+    totals = []
+    for _ in range(repeat):
+        times = import_times(modules)
+        top_level = [(name, cumulative) for name, (cumulative, depth) in times.items() if depth == 1]
+        totals.append(sum(cumulative for name, cumulative in top_level if name not in BASELINE_MODULES) / 1000)
+
+    # Pacotes de terceiros (nível superior) e módulos `utils.*` importados pelas abas.
+    heavy = sorted(
+        ((name, cumulative / 1000) for name, (cumulative, depth) in times.items()
+         if name not in baseline and ("." not in name or (name.startswith("utils.") and depth == 2))),
+        key=lambda item: item[1], reverse=True,
+    )
+    return statistics.median(totals), heavy
+
+
+def git_commit():
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Relatório do tempo de importação das páginas.")
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções por página (usa a mediana)")
+    parser.add_argument("--top", type=int, default=5, help="Módulos mais pesados listados por página")
+    parser.add_argument("--budget-ms", type=float, help="Falha (código 1) se alguma página passar deste tempo")
+    parser.add_argument("--history", default=HISTORY_PATH, help="Arquivo JSONL do histórico")
+    parser.add_argument("--no-save", action="store_true", help="Não grava no histórico")
+    args = parser.parse_args(argv)
+
+    pages = {}
+    pages_dir = os.path.join(ROOT, "pages")
+    for name in sorted(os.listdir(pages_dir)):
+        if not name.endswith(".py"):
+            continue
+        modules = page_modules(os.path.join(pages_dir, name))
+        total_ms, heavy = measure(modules, args.repeat) if modules else (0.0, [])
+        pages[name] = {"modules": modules, "import_ms": round(total_ms, 1),
+                       "heaviest": [[module, round(ms, 1)] for module, ms in heavy[:args.top]]}
+
+        print(f"{name}: {total_ms:.0f} ms")
+        for module, ms in heavy[:args.top]:
+            print(f"    {ms:8.1f} ms  {module}")
+
+    record = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "pages": pages,
+    }
+    if not args.no_save:
+        os.makedirs(os.path.dirname(args.history), exist_ok=True)
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    over_budget = [name for name, page in pages.items() if args.budget_ms and page["import_ms"] > args.budget_ms]
+    if over_budget:
+        print(f"Acima de {args.budget_ms:.0f} ms: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""Dados sintéticos com o formato das planilhas e dos datasets CEDA usados pelo app."""
+import numpy as np
+import pandas as pd
+
+INMET_COLUMNS = {
+    "PRECIPITACAO_TOTAL_MENSAL_mm": (120.0, 80.0),
+    "TEMPERATURA_MEDIA_COMPENSADA_MENSAL_C": (26.0, 3.0),
+    "VENTO_VELOCIDADE_MEDIA_MENSAL_m/s": (2.0, 0.8),
+}
+UFS = ["PA", "AM", "MA", "TO", "MT", "BA", "MG", "SP", "RS", "CE"]
+
+
+def station_codes(n):
+    return [str(82000 + i) for i in range(n)]
+
+
+def stations_table(n, seed=0):
+    """Aba `Estacoes`: coordenadas no território brasileiro, gravadas como inteiros x 1e8."""
+    rng = np.random.default_rng(seed)
+    codes = station_codes(n)
+    return pd.DataFrame({
+        "CD_ESTACAO": codes,
+        "DC_NOME": [f"ESTACAO {code}" for code in codes],
+        "CIDADE": [f"CIDADE {code}" for code in codes],
+        "SG_ESTADO": rng.choice(UFS, n),
+        "CD_SITUACAO": rng.choice(["Operante", "Pane", "Desativada"], n, p=[0.8, 0.1, 0.1]),
+        "VL_LATITUDE": np.round(rng.uniform(-33.0, 4.0, n) * 1e8).astype(np.int64).astype(str),
+        "VL_LONGITUDE": np.round(rng.uniform(-73.0, -35.0, n) * 1e8).astype(np.int64).astype(str),
+    })
+
+
+def inmet_table(stations, years, start_year=1991, missing=0.05, seed=0):
+    """Aba `Dados INMET` já tipada: uma linha por estação e mês, com falhas aleatórias."""
+    rng = np.random.default_rng(seed)
+    codes = station_codes(stations)
+    months = pd.date_range(f"{start_year}-01-31", periods=years * 12, freq="ME")
+
+    df = pd.DataFrame({
+        "Estacao": np.repeat(codes, len(months)),
+        "Nome": np.repeat([f"ESTACAO {code}" for code in codes], len(months)),
+        "Data_Medicao": np.tile(months.to_numpy(), stations),
+    })
+    for column, (mean, std) in INMET_COLUMNS.items():
+        values = np.abs(rng.normal(mean, std, len(df)))
+        values[rng.random(len(df)) < missing] = np.nan
+        df[column] = values
+    for column in ("Nome", "Estacao"):
+        df[column] = df[column].astype("category")
+    return df
+
+
+def netcdf_grid(path, times=120, lat=360, lon=720, freq="MS", chunks=(12, 60, 60), units="mm", seed=0):
+    """Grade global regular (lat/lon) gravada em NetCDF-4 com o chunking HDF5 informado."""
+    import xarray as xr
+
+    rng = np.random.default_rng(seed)
+    ds = xr.Dataset(
+        {"pre": (("time", "lat", "lon"), rng.random((times, lat, lon), dtype=np.float32) * 200, {"units": units})},
+        coords={
+            "time": pd.date_range("2000-01-01", periods=times, freq=freq),
+            "lat": np.linspace(-89.75, 89.75, lat),
+            "lon": np.linspace(-179.75, 179.75, lon),
+        },
+    )
+    chunks = tuple(min(size, chunk) for size, chunk in zip((times, lat, lon), chunks))
+    ds.to_netcdf(path, engine="h5netcdf", encoding={"pre": {"chunksizes": chunks}})
+    return path
+
+
+def monthly_frames(stations, months, seed=0):
+    """Par (simulação, observação) tempo x estação, correlacionado, para as métricas KGE."""
+    rng = np.random.default_rng(seed)
+    index = pd.period_range("2000-01", periods=months, freq="M")
+    obs = rng.gamma(2.0, 60.0, (months, stations))
+    sim = obs * rng.normal(1.0, 0.2, obs.shape) + rng.normal(0, 10, obs.shape)
+    columns = station_codes(stations)
+    return pd.DataFrame(sim, index=index, columns=columns), pd.DataFrame(obs, index=index, columns=columns)
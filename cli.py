@@ -0,0 +1,182 @@
+"""
+Execução em lote do pipeline fora do Streamlit.
+
+Extrai as séries CEDA das estações informadas, calcula as métricas KGE contra
+os dados INMET e grava os resultados em Parquet, para serem pré-calculados
+(por exemplo, via cron) e apenas lidos pelo app.
+
+Exemplos:
+    python cli.py extract --infos infos.csv --stations-file estacoes.csv --datasets pre tmp --stations 82191 82263
+    python cli.py score --infos infos.csv --datasets pre --inmet dados_inmet.parquet --out resultados/
+    python cli.py run --infos infos.csv --stations-file estacoes.csv --datasets pre --out resultados/
+    python cli.py catalog --infos infos.csv
+"""
+import os
+import sys
+import time
+import argparse
+
+
+def read_table(path):
+    import pandas as pd
+
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def select_datasets(infos, dataset_ids):
+    """Linhas do `Infos` cujo `var_id` ou `dataset` está em `dataset_ids`."""
+    if not dataset_ids:
+        return infos
+    mask = infos["var_id"].astype(str).isin(dataset_ids) | infos["dataset"].astype(str).isin(dataset_ids)
+    return infos[mask]
+
+
+def select_stations(stations, station_codes):
+    from utils.stations import stations_with_coordinates
+
+    if station_codes:
+        stations = stations[stations["CD_ESTACAO"].astype(str).isin(station_codes)]
+    return stations_with_coordinates(stations).dropna(subset=["lat", "lon"])
+
+
+def request_headers(token, username, password):
+    """Token fixo, ou credenciais CEDA com token gerado e renovado durante a execução."""
+    from utils.ceda_access_token import auth_headers, get_access_token
+
+    if token:
+        return auth_headers(token)
+    if username and password:
+        return lambda: auth_headers(get_access_token(username, password))
+    return None
+
+
+def run_extraction(datasets, stations, headers, access_mode):
+    from utils.jobs import get_job_runner
+
+    runner = get_job_runner()
+    records = stations[["CD_ESTACAO", "lat", "lon"]].to_dict("records")
+    tasks = [
+        runner.submit(row.var_id, row.url, records, headers=headers, access_mode=access_mode)
+        for row in datasets.itertuples()
+    ]
+    while runner.has_active():
+        time.sleep(1)
+
+    failed = 0
+    for task in tasks:
+        print(f"[{task.var_id}] {task.status}: {task.cached_stations} em cache, {task.extracted_stations} extraídas"
+              + (f" - {task.error}" if task.error else ""))
+        failed += task.status != "done"
+    return failed
+
+
+def update_catalog(datasets, headers):
+    from utils.dataset_catalog import refresh_catalog
+
+    if callable(headers):
+        headers = headers()
+    catalog = refresh_catalog(datasets["url"].dropna().tolist(), headers=headers)
+    failed = 0
+    for url in datasets["url"].dropna().unique():
+        entry = catalog[url]
+        if entry.get("error"):
+            print(f"{url}: erro - {entry['error']}")
+            failed += 1
+        else:
+            print(f"{url}: {entry.get('size')} bytes, {entry.get('dims')}, {entry.get('time_start')} a {entry.get('time_end')}")
+    return 1 if failed else 0
+
+
+def write_outputs(datasets, stations, inmet_path, out_dir, score):
+    from utils.result_cache import series_frame
+
+    os.makedirs(out_dir, exist_ok=True)
+    inmet_data = None
+    if score:
+        from utils.inmet_mirror import MIRROR_PATH
+
+        inmet_data = read_table(inmet_path or MIRROR_PATH)
+
+    codes = stations["CD_ESTACAO"].astype(str).tolist() if stations is not None else None
+    for row in datasets.itertuples():
+        series = series_frame(row.url, codes)
+        if series.empty:
+            print(f"[{row.var_id}] nenhuma série em cache para {row.url}")
+            continue
+        series.to_parquet(os.path.join(out_dir, f"series_{row.var_id}.parquet"))
+
+        if score:
+            from utils.kge import INMET_VARIABLES, align_series, inmet_station_frame, score_table
+
+            variable = INMET_VARIABLES.get(row.var_id)
+            if variable not in inmet_data.columns:
+                print(f"[{row.var_id}] sem variável INMET correspondente; métricas não calculadas")
+                continue
+            simulations, evaluations = align_series(series, inmet_station_frame(inmet_data, variable))
+            scores = score_table(simulations, evaluations)
+            scores.to_parquet(os.path.join(out_dir, f"scores_{row.var_id}.parquet"))
+            print(f"[{row.var_id}] {len(scores)} estações avaliadas, KGE mediano {scores['KGE'].median():.3f}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Extração CEDA e métricas KGE em lote.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--infos", required=True, help="Exportação (CSV/Parquet) da aba Infos")
+    common.add_argument("--datasets", nargs="*", default=[], help="var_id ou dataset do Infos (padrão: todos)")
+    common.add_argument("--stations", nargs="*", default=[], help="Códigos CD_ESTACAO (padrão: todos)")
+    common.add_argument("--out", default="resultados", help="Diretório de saída dos arquivos Parquet")
+
+    extraction = argparse.ArgumentParser(add_help=False)
+    extraction.add_argument("--stations-file", required=True, help="Exportação (CSV/Parquet) da aba Estacoes")
+    extraction.add_argument("--mode", default="download", choices=["download", "range", "opendap"])
+
+    auth = argparse.ArgumentParser(add_help=False)
+    auth.add_argument("--token", default=os.environ.get("CEDA_ACCESS_TOKEN"), help="Token de acesso CEDA")
+    auth.add_argument("--username", default=os.environ.get("CEDA_USERNAME"), help="Usuário CEDA (gera o token automaticamente)")
+    auth.add_argument("--password", default=os.environ.get("CEDA_PASSWORD"), help="Senha CEDA")
+
+    scoring = argparse.ArgumentParser(add_help=False)
+    scoring.add_argument("--inmet", help="Dados INMET (CSV/Parquet); padrão: espelho local")
+
+    subparsers.add_parser("extract", parents=[common, extraction, auth], help="Extrai e grava as séries")
+    subparsers.add_parser("score", parents=[common, scoring], help="Calcula métricas a partir das séries em cache")
+    subparsers.add_parser("run", parents=[common, extraction, auth, scoring], help="Extrai e calcula as métricas")
+    subparsers.add_parser("catalog", parents=[common, auth], help="Atualiza o catálogo de metadados dos datasets")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    datasets = select_datasets(read_table(args.infos), args.datasets)
+    if datasets.empty:
+        print("Nenhum dataset encontrado no Infos para os identificadores informados.")
+        return 1
+
+    if args.command == "catalog":
+        return update_catalog(datasets, request_headers(args.token, args.username, args.password))
+
+    stations = None
+    failed = 0
+    if args.command in ("extract", "run"):
+        stations = select_stations(read_table(args.stations_file), args.stations)
+        failed = run_extraction(datasets, stations, request_headers(args.token, args.username, args.password), args.mode)
+    elif args.stations:
+        import pandas as pd
+
+        stations = pd.DataFrame({"CD_ESTACAO": args.stations})
+
+    write_outputs(datasets, stations, getattr(args, "inmet", None), args.out, score=args.command in ("score", "run"))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    from utils.metrics import write_prometheus
+
+    try:
+        sys.exit(main())
+    finally:
+        write_prometheus()
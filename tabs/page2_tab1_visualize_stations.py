@@ -1,30 +1,46 @@
 import streamlit as st
-import pydeck as pdk
 import pandas as pd
-from utils.gsheets_connection import get_connection
+from utils.stations import load_stations
+from utils.map_clustering import MAX_ZOOM, MIN_ZOOM, POINT_LIMIT, cluster_points, fit_view
 
-def convert_coordinates(coord_str):
-    try:
-        num = float(coord_str)
-        return num / 100000000
-    except ValueError:
-        return None
+MAP_MODES = ["Automático", "Pontos", "Agrupado"]
+SPATIAL_FILTERS = ["Nenhum", "Raio a partir de uma estação", "Retângulo (lat/lon)"]
+
+def spatial_filter(df, station_index):
+    """Opções de busca espacial; retorna as posições das estações selecionadas ou None quando não há filtro."""
+    mode = st.radio("Busca espacial:", SPATIAL_FILTERS, horizontal=True)
+
+    if mode == SPATIAL_FILTERS[1]:
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            center = st.selectbox("Estação de referência:", sorted(df['DC_NOME'].dropna().unique()))
+        with col2:
+            radius_km = st.number_input("Raio (km):", min_value=1, max_value=5000, value=50, step=10)
+        reference = df[df['DC_NOME'] == center].dropna(subset=['lat', 'lon'])
+        if reference.empty:
+            st.warning("A estação de referência não possui coordenadas válidas.")
+            return None
+        return station_index.within_radius(reference['lat'].iloc[0], reference['lon'].iloc[0], radius_km).index
+
+    if mode == SPATIAL_FILTERS[2]:
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            lat_min = st.number_input("Lat. mínima:", min_value=-90.0, max_value=90.0, value=-10.0)
+        with col2:
+            lat_max = st.number_input("Lat. máxima:", min_value=-90.0, max_value=90.0, value=0.0)
+        with col3:
+            lon_min = st.number_input("Lon. mínima:", min_value=-180.0, max_value=180.0, value=-60.0)
+        with col4:
+            lon_max = st.number_input("Lon. máxima:", min_value=-180.0, max_value=180.0, value=-45.0)
+        return station_index.within_bbox(lat_min, lat_max, lon_min, lon_max).index
+
+    return None
 
 def render():
 
     st.title("Estações Meteorológicas INMET")    
     
-    conn = get_connection()
-    
-    def load_stations_data():
-        df = conn.read(worksheet="Estacoes")
-        
-        df['lat'] = df['VL_LATITUDE'].apply(convert_coordinates)
-        df['lon'] = df['VL_LONGITUDE'].apply(convert_coordinates)
-        
-        return df
-    
-    df = load_stations_data()
+    df, station_index = load_stations()
     
     cont1 = st.container()
     cont2 = st.container()
@@ -57,6 +73,8 @@ def render():
             default=['Operante']
         )
 
+        spatial_positions = spatial_filter(df, station_index)
+
         
 
     if not selected_estados:
@@ -74,6 +92,9 @@ def render():
     
     if selected_estacoes:
         mask = mask & (df['DC_NOME'].isin(selected_estacoes))
+
+    if spatial_positions is not None:
+        mask = mask & df.index.isin(spatial_positions)
     
     filtered_df = df[mask]
 
@@ -83,29 +104,75 @@ def render():
         'Estação': filtered_df['DC_NOME'] + ' (Código: ' + filtered_df['CD_ESTACAO'].astype(str) + ')'
     }).dropna()
 
-    brazil_lat = -14.235
-    brazil_lon = -51.9253
+    center_lat, center_lon, fitted_zoom = fit_view(map_data['Latitude'], map_data['Longitude'])
 
-    point_layer = pdk.Layer(
-        "ScatterplotLayer",
-        data=map_data,
-        get_position=["Longitude", "Latitude"],
-        get_color="[200, 30, 0, 160]",
-        get_radius=50000,
-        pickable=True
-    )
+    with st.expander("Exibição do Mapa", icon=":material/map:"):
+        render_mode = st.radio(
+            "Modo de exibição:",
+            MAP_MODES,
+            horizontal=True,
+            help=f"No modo automático, as estações são agrupadas quando passam de {POINT_LIMIT}."
+        )
+        zoom = st.slider(
+            "Nível de zoom:",
+            min_value=float(MIN_ZOOM),
+            max_value=float(MAX_ZOOM),
+            value=fitted_zoom,
+            step=0.5,
+            help="Zoom inicial do mapa; no modo agrupado, define também o tamanho dos grupos."
+        )
+
+    import pydeck as pdk
+
+    clustered = render_mode == MAP_MODES[2] or (render_mode == MAP_MODES[0] and len(map_data) > POINT_LIMIT)
+
+    if clustered:
+        clusters = cluster_points(map_data['Latitude'], map_data['Longitude'], map_data['Estação'], zoom)
+        layers = [
+            pdk.Layer(
+                "ScatterplotLayer",
+                data=clusters,
+                get_position=["lon", "lat"],
+                get_color="[200, 30, 0, 160]",
+                get_radius="radius",
+                pickable=True
+            ),
+            pdk.Layer(
+                "TextLayer",
+                data=clusters[clusters['n'] > 1],
+                get_position=["lon", "lat"],
+                get_text="count",
+                get_size=14,
+                get_color="[255, 255, 255, 255]",
+            ),
+        ]
+        tooltip = {"html": "<b>{label}</b>"}
+        sent_points = len(clusters)
+    else:
+        layers = [
+            pdk.Layer(
+                "ScatterplotLayer",
+                data=map_data,
+                get_position=["Longitude", "Latitude"],
+                get_color="[200, 30, 0, 160]",
+                get_radius=50000,
+                pickable=True
+            )
+        ]
+        tooltip = {"html": "<b>Estação:</b> {Estação}"}
+        sent_points = len(map_data)
 
     view_state = pdk.ViewState(
-        latitude=brazil_lat,
-        longitude=brazil_lon,
-        zoom=3,
-        pitch=50
+        latitude=center_lat,
+        longitude=center_lon,
+        zoom=zoom,
+        pitch=0 if clustered else 50
     )
 
     chart = pdk.Deck(
-        layers=[point_layer],
+        layers=layers,
         initial_view_state=view_state,
-        tooltip={"html": "<b>Estação:</b> {Estação}"},
+        tooltip=tooltip,
     )
 
     with st.container():
@@ -122,6 +189,7 @@ def render():
 
         if not map_data.empty:
             st.pydeck_chart(chart, use_container_width=True)
+            st.caption(f"Pontos enviados ao mapa: {sent_points} ({len(map_data)} estações).")
         else:
             st.error("Não há coordenadas válidas para exibir no mapa")
 
@@ -1,16 +1,15 @@
 import streamlit as st
-import pandas as pd
 import time
-from utils.gsheets_connection import get_connection
+from utils.gsheets_connection import read_worksheet
+from utils.station_writes import StationConflict, get_station_queue
 
-conn = get_connection()
 
 def load_stations_data():
     """Função para carregar os dados das estações."""
-    return conn.read()
+    return read_worksheet("Estacoes")
 
 @st.dialog("Adicionar Nova Estação", width="large")
-def new_station_dialog(data, display_columns, conn):
+def new_station_dialog():
     """Dialog para adicionar uma nova estação."""
     with st.form("add_station_form"):
         col1, col2, col3 = st.columns(3)
@@ -30,12 +29,13 @@ def new_station_dialog(data, display_columns, conn):
 
         submitted = st.form_submit_button("Adicionar Estação")
 
-        if submitted:
+        if submitted and not cd_estacao.strip():
+            st.error("Informe o código da estação.")
+        elif submitted:
             with st.spinner("Adicionando nova estação..."):
                 try:
-
-                    new_row = pd.DataFrame([{
-                        "CD_ESTACAO": cd_estacao,
+                    new_row = {
+                        "CD_ESTACAO": cd_estacao.strip(),
                         "DC_NOME": cidade.upper(),
                         "CIDADE": cidade,
                         "SG_ESTADO": sg_estado,
@@ -43,15 +43,16 @@ def new_station_dialog(data, display_columns, conn):
                         "VL_LONGITUDE": vl_longitude,
                         "BIOMA": bioma,
                         "CD_SITUACAO": situacao
-                    }])
+                    }
 
-                    updated_data = pd.concat([data[list(display_columns.keys())], new_row], ignore_index=True)
-                    conn.clear()
-                    conn.update(worksheet="Estacoes", data=updated_data)
+                    # Acrescenta só a linha nova; inclusões simultâneas de outros editores vão no mesmo lote.
+                    get_station_queue().append_and_wait([new_row])
 
                     st.toast("Nova estação adicionada com sucesso!", icon="✅")
                     time.sleep(1)
                     st.rerun()
+                except StationConflict as e:
+                    st.warning(f"{e}. Atualize a página para ver as alterações de outros editores.")
                 except Exception as e:
                     st.error(f"Erro ao adicionar estação: {e}")
 
@@ -78,7 +79,7 @@ def render():
                         })
     
     if st.button("Nova Estação", type="secondary"):
-        new_station_dialog(data, display_columns, conn)
+        new_station_dialog()
 
 
 if __name__ == "__main__":
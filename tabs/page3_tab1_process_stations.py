@@ -1,93 +1,235 @@
 import streamlit as st
-from utils.gsheets_connection import get_connection
-from utils.ceda_access_token import get_access_token
+from utils.gsheets_connection import read_worksheet
+from utils.ceda_access_token import auth_headers, clear_token, get_access_token, load_cached_token, token_expiration
+from utils.ceda_download import download_dataset, format_bytes
+from utils.ceda_remote import ACCESS_MODES, open_remote_dataset
+from utils.stations import stations_with_coordinates
+from utils.station_extraction import extract_monthly_series
+from utils.chunked_extraction import extract_station_series_chunked, use_chunked
+from utils.result_cache import dataset_version, get_series, put_extraction
+from utils.jobs import get_job_runner
+from utils.dataset_catalog import catalog_frame, load_catalog, refresh_catalog
+from utils.metrics import fragment_run, span
+import os
+import pandas as pd
 import requests
-from netCDF4 import Dataset
-from io import BytesIO
-import numpy as np
-
-conn = get_connection()
 
 def load_infos_data():
-    return conn.read(worksheet="Infos")
+    return read_worksheet("Infos")
 
 def load_stations_data():
-    return conn.read(worksheet="Estacoes")
+    return read_worksheet("Estacoes")
 
-def display_dataset_info(dataset):
+def display_dataset_info(entry):
     st.subheader("Informações do Dataset")
+
+    if entry.get("error"):
+        st.warning(f"Não foi possível ler os metadados: {entry['error']}")
+        return
     
     st.write("**Dimensões:**")
-    for dim_name, dim in dataset.dimensions.items():
-        st.write(f"- {dim_name}: {len(dim)}")
+    for dim_name, size in entry.get("dims", {}).items():
+        st.write(f"- {dim_name}: {size}")
+
+    if entry.get("time_start"):
+        st.write(f"**Cobertura temporal:** {entry['time_start']} a {entry['time_end']}")
 
     st.write("**Variáveis:**")
-    for var_name, var in dataset.variables.items():
-        st.write(f"- {var_name}")
+    for var_name, var in entry.get("variables", {}).items():
+        st.write(f"- {var_name}" + (f" ({var['long_name']})" if var.get("long_name") else ""))
         col1, col2 = st.columns(2)
         with col1:
-            st.write(f"  - Dimensões: {var.dimensions}")
+            st.write(f"  - Dimensões: {tuple(var['dims'])}")
         with col2:
-            st.write(f"  - Tipo: {var.dtype}")
+            st.write(f"  - Tipo: {var['dtype']}" + (f", unidade: {var['units']}" if var.get("units") else ""))
     
-    if dataset.ncattrs():
+    if entry.get("attrs"):
         st.write("**Atributos Globais:**")
-        for attr in dataset.ncattrs():
-            value = dataset.getncattr(attr)
-            if isinstance(value, (str, int, float, np.integer, np.floating)):
-                st.write(f"- {attr}: {value}")
+        for attr, value in entry["attrs"].items():
+            st.write(f"- {attr}: {value}")
+
+def render_catalog_refresh(infos_data, headers):
+    if st.button("Atualizar Catálogo", help="Lê o cabeçalho de todos os datasets do Infos, sem baixá-los."):
+        progress_bar = st.progress(0.0, text="Lendo metadados dos datasets...")
+
+        def update_progress(done, total):
+            progress_bar.progress(done / total, text=f"Metadados lidos: {done} de {total}")
+
+        catalog = refresh_catalog(infos_data["url"].dropna().tolist(), headers=headers, progress_callback=update_progress)
+        failed = sum(1 for entry in catalog.values() if entry.get("error"))
+        progress_bar.progress(1.0, text="Catálogo atualizado")
+        if failed:
+            st.warning(f"{failed} dataset(s) não puderam ser lidos.")
+
+def current_token(username, password):
+    """Token manual da sessão ou, havendo credenciais, o token compartilhado do processo."""
+    manual_token = st.session_state.get("ceda_manual_token")
+    if manual_token:
+        return manual_token
+    if username and password:
+        return load_cached_token(username, password)
+    return None
+
+def headers_provider(username, password):
+    """Cabeçalhos para a fila: com credenciais, cada etapa usa o token vigente (renovado em segundo plano)."""
+    manual_token = st.session_state.get("ceda_manual_token")
+    if manual_token or not (username and password):
+        return auth_headers(manual_token)
+    return lambda: auth_headers(get_access_token(username, password))
+
+def download_to_disk(dataset_url, headers):
+    progress_bar = st.progress(0.0, text="Iniciando download...")
+
+    def update_progress(downloaded, total):
+        if total:
+            progress_bar.progress(
+                min(downloaded / total, 1.0),
+                text=f"Baixando: {format_bytes(downloaded)} de {format_bytes(total)}"
+            )
+        else:
+            progress_bar.progress(0.0, text=f"Baixando: {format_bytes(downloaded)}")
+
+    download = download_dataset(dataset_url, headers=headers, progress_callback=update_progress)
+
+    progress_bar.progress(1.0, text="Download concluído")
+    st.info(f"Content-Type: {download['content_type'] or 'Não especificado'}")
+    st.info(f"Tamanho do arquivo: {format_bytes(download['size'])}")
+    st.info(f"SHA-256: {download['sha256']}")
+    if download["resumed"]:
+        st.info("Download retomado a partir de um arquivo parcial.")
+    return download["path"]
+
+def load_cached_extraction(var_id, dataset_url, stations_points, version):
+    """Separa as estações já extraídas (no cache de séries) das que ainda precisam do dataset."""
+    cached_series, cached_points, missing = {}, [], []
+    for code in stations_points["CD_ESTACAO"].astype(str):
+        series, meta = get_series(var_id, dataset_url, code, version)
+        if series is None:
+            missing.append(code)
+        else:
+            cached_series[code] = series
+            cached_points.append(meta["grid_point"])
+    missing_stations = stations_points[stations_points["CD_ESTACAO"].astype(str).isin(missing)]
+    return cached_series, cached_points, missing_stations
+
+def extract_and_cache(ds, var_id, stations_points, dataset_url, version):
+    st.subheader("Informações Básicas do Dataset")
+    st.write(f"Número de variáveis: {len(ds.data_vars)}")
+    st.write(f"Número de dimensões: {len(ds.dims)}")
+
+    series, grid_points = extract_monthly_series(
+        ds, stations_points, var_name=var_id, cache_key=dataset_url
+    )
+    store_series(var_id, dataset_url, version, series, grid_points)
+    return series, grid_points
+
+def store_series(var_id, dataset_url, version, series, grid_points):
+    put_extraction(var_id, dataset_url, version, series, grid_points)
+
+def render_series(series, grid_points):
+    if series.empty:
+        st.warning("Nenhuma estação selecionada possui coordenadas válidas.")
+        return
+
+    st.subheader("Séries Extraídas por Estação")
+    st.line_chart(series)
+
+    with st.expander("Pontos de grade utilizados"):
+        st.dataframe(grid_points, use_container_width=True, hide_index=True)
+
+    with st.expander("Séries extraídas"):
+        st.dataframe(series, use_container_width=True)
+
+@st.fragment(run_every=2)
+def render_job_queue():
+    with fragment_run():
+        _render_job_queue()
+
+def _render_job_queue():
+    runner = get_job_runner()
+    tasks = runner.table()
+    if tasks.empty:
+        return
+
+    st.header("Fila de Processamento")
+    st.dataframe(
+        tasks,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "url": st.column_config.LinkColumn("Url Dataset"),
+            "download": st.column_config.ProgressColumn("Download", min_value=0.0, max_value=1.0),
+            "criada em": st.column_config.DatetimeColumn("Criada em", format="DD/MM/YYYY HH:mm:ss"),
+        }
+    )
+
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 1], vertical_alignment="bottom")
+    with col1:
+        task_id = st.selectbox("Tarefa:", tasks["id"], format_func=lambda x: f"{x} - {tasks.set_index('id').loc[x, 'var_id']}")
+    with col2:
+        task = runner.tasks.get(task_id)
+        if st.button("Cancelar", use_container_width=True, disabled=task is None or not task.cancellable,
+                     help="Disponível apenas para tarefas na fila ou baixando."):
+            runner.cancel(task_id)
+    with col3:
+        if st.button("Tentar Novamente", use_container_width=True):
+            runner.retry(task_id)
+    with col4:
+        if st.button("Limpar Finalizadas", use_container_width=True):
+            runner.clear_finished()
 
 def render():
     st.title("Processar Estações")
     
+    ceda_credentials = st.secrets.get("ceda_credentials") or {}
+    username = ceda_credentials.get("username")
+    password = ceda_credentials.get("password")
+
     with st.sidebar:
         st.title("Autenticação CEDA")
-        
-        ceda_credentials = st.secrets.get("ceda_credentials")
-        token = st.session_state.get("ceda_token")
+
+        token = current_token(username, password)
         
         if not token:
             st.text("Para utilização dos datasets do CEDA de forma remota, gere um novo token com suas credenciais CEDA.")
             st.warning("Gere um token para continuar.")
             
-            if not ceda_credentials or not ceda_credentials.get("username") or not ceda_credentials.get("password"):
+            if not username or not password:
                 st.error("Vincule suas credenciais para processar estações com os datasets do CEDA!", icon=":material/passkey:")
             else:
-                username = ceda_credentials["username"]
-                password = ceda_credentials["password"]
-
                 token_generation_status = st.empty()
 
                 if st.button("Gerar Novo Token"):
                     try:
                         with st.spinner("Gerando Token..."):
-                            new_token = get_access_token(username, password)
-                            if new_token:
-                                st.session_state["ceda_token"] = new_token
-                                token_generation_status.success("Token gerado!")
-                                st.rerun()
-                            else:
-                                token_generation_status.error("Erro ao gerar token.")
-                    except Exception as e:
-                        token_generation_status.error(f"Erro ao gerar Token!")
-                        print(f"Erro ao gerar token: {str(e)}")
-                        
-                        st.caption("Tente inserir manulmente um token")
-                        
-                        manual_token = st.text_input("Token Manual:", type="password")
-                        if manual_token and st.button("Registrar Token"):
-                            st.session_state["ceda_token"] = manual_token
+                            get_access_token(username, password)
+                            token_generation_status.success("Token gerado!")
                             st.rerun()
-            
+                    except ValueError as e:
+                        token_generation_status.error(f"Erro ao gerar Token!")
+                        print(str(e))
+                        st.session_state["ceda_manual_token_form"] = True
+
+            if st.session_state.get("ceda_manual_token_form") or not (username and password):
+                st.caption("Tente inserir manulmente um token")
 
+                manual_token = st.text_input("Token Manual:", type="password")
+                if manual_token and st.button("Registrar Token"):
+                    st.session_state["ceda_manual_token"] = manual_token
+                    st.rerun()
               
         else:
             st.success("Token Ativo ✓")
+            expires = token_expiration(username, password) if username and password else None
+            if expires:
+                st.caption(f"Renovado automaticamente antes de expirar ({expires.astimezone():%d/%m/%Y %H:%M}).")
             if st.button("Limpar Token"):
-                del st.session_state["ceda_token"]
+                st.session_state.pop("ceda_manual_token", None)
+                if username and password:
+                    clear_token(username, password)
                 st.rerun()
     
-    if st.session_state.get("ceda_token"):
+    if token:
         infos_data = load_infos_data()
         stations_data = load_stations_data()
 
@@ -98,15 +240,35 @@ def render():
         if selected_dataset:
             selected_infos_columns = ["var_id", "dataset", "type", "url", "size"]
             dataset_info = infos_data[infos_data["dataset"] == selected_dataset][selected_infos_columns]
+            catalog = load_catalog()
+            catalog_info = catalog_frame(dataset_info, catalog)
+            catalog_info["real_size"] = catalog_info["real_size"].map(
+                lambda size: format_bytes(size) if pd.notna(size) else None
+            )
             
             with st.expander("Informações sobre o Dataset selecionado"):
                 st.dataframe(
-                    dataset_info,
+                    catalog_info,
                     use_container_width=True,
-                    column_config={"URL": st.column_config.LinkColumn("Url Dataset")},
+                    column_config={
+                        "url": st.column_config.LinkColumn("Url Dataset"),
+                        "real_size": "Tamanho real",
+                        "dims": "Dimensões",
+                        "time_start": "Início",
+                        "time_end": "Fim",
+                        "checked_at": "Verificado em",
+                        "error": "Erro",
+                    },
                     hide_index=True
                 )
 
+                for row in dataset_info.itertuples():
+                    if row.url in catalog:
+                        with st.popover(f"Metadados: {row.var_id}"):
+                            display_dataset_info(catalog[row.url])
+
+                render_catalog_refresh(infos_data, auth_headers(token))
+
             st.header("Seleção de Estações")
             station_options = stations_data["CIDADE"].unique()
             selected_stations = st.multiselect("Selecione as Estações para Processar:", station_options)
@@ -139,74 +301,63 @@ def render():
                     )
 
                 st.header("Processar Dados")
-                if st.button("Processar Dataset"):
+                access_mode = st.radio(
+                    "Modo de acesso ao dataset:",
+                    options=list(ACCESS_MODES.keys()),
+                    format_func=lambda mode: ACCESS_MODES[mode],
+                    horizontal=True,
+                    help="A leitura remota e o OPeNDAP buscam apenas os trechos do arquivo necessários para as estações."
+                )
+                headers = auth_headers(token)
+
+                col1, col2 = st.columns(2)
+                with col1:
+                    process_now = st.button("Processar Dataset")
+                with col2:
+                    if st.button("Enviar para Fila", help="Processa em segundo plano todas as variáveis do dataset selecionado."):
+                        stations_points = stations_with_coordinates(filtered_stations).dropna(subset=["lat", "lon"])
+                        stations_records = stations_points[["CD_ESTACAO", "lat", "lon"]].to_dict("records")
+                        runner = get_job_runner()
+                        for row in dataset_info.itertuples():
+                            runner.submit(row.var_id, row.url, stations_records, headers=headers_provider(username, password), access_mode=access_mode)
+                        st.toast(f"{len(dataset_info)} tarefa(s) enviada(s) para a fila.", icon="✅")
+
+                if process_now:
                     with st.spinner("Carregando dataset..."):
                         try:
                             dataset_url = dataset_info.iloc[0]["url"]
-                            headers = {"Authorization": f"Bearer eyJhbGciOiJSUzI1NiIsInR5cCIgOiAiSldUIiwia2lkIiA6ICI4ZjhmaUpyaUtDY3hmaHhzdU5vazVEekdJdFZ4amhhTWNJa05ZX2U4MnhJIn0.eyJleHAiOjE3MzcxNTExNTgsImlhdCI6MTczNjg5MTk1OCwianRpIjoiZTAxZWM4M2EtNTg3OS00MTY4LTg1YzUtMDUzOTc1ZjdlYTcwIiwiaXNzIjoiaHR0cHM6Ly9hY2NvdW50cy5jZWRhLmFjLnVrL3JlYWxtcy9jZWRhIiwic3ViIjoiODAxZjY5YTEtYzExYy00MDIyLTliY2YtNzQ3MGNiNGRkMmVhIiwidHlwIjoiQmVhcmVyIiwiYXpwIjoic2VydmljZXMtcG9ydGFsLWNlZGEtYWMtdWsiLCJzZXNzaW9uX3N0YXRlIjoiYzIwMmE1YzEtNmU5MS00MDhmLWIxNmEtNDZmODNiZjNkNDhiIiwiYWNyIjoiMSIsInNjb3BlIjoiZW1haWwgb3BlbmlkIHByb2ZpbGUgZ3JvdXBfbWVtYmVyc2hpcCIsInNpZCI6ImMyMDJhNWMxLTZlOTEtNDA4Zi1iMTZhLTQ2ZjgzYmYzZDQ4YiIsImVtYWlsX3ZlcmlmaWVkIjp0cnVlLCJvcGVuaWQiOiJodHRwczovL2NlZGEuYWMudWsvb3BlbmlkL0d1c3Rhdm8uTWFjaGFkbyIsIm5hbWUiOiJHdXN0YXZvIE1hY2hhZG8iLCJwcmVmZXJyZWRfdXNlcm5hbWUiOiJnbXVuaWZlc3NwYSIsImdpdmVuX25hbWUiOiJHdXN0YXZvIiwiZmFtaWx5X25hbWUiOiJNYWNoYWRvIiwiZW1haWwiOiJndXN0YXZvLnBhaXhhb0B1bmlmZXNzcGEuZWR1LmJyIn0.a6qh9RuLgJiSOCK-c7gKRwlJTwsTPlm1qydcfkhDB0Ez63_HwOiSz3sSoSnw-cazellUTUGOoLIazq4QsjGg83TlFKn5o1EniKbxD04a6tqZTMY8JcylCwoLZ17KL8Weu-QBJFY8DFqhAbN6AjtXeTBnu62bgXNLAfS3f_ojR0vHABRlFB2hcRZhF5cja5pXaZ1EYJOmLsCrIw5acVQy7fW8lTJVqjUI9qnMLrL6j5V_bV2rhyUNgjWoSv7ENdUqM1rcgc0oCiuaeiQ-KkZ6tjZyHEsNe-uVhEKfupJ0hdnO6OAlNXo-zyJB3Qi6HaN7OzXcgDn78VR8_mUvdpoH_A"}
-                            
-                            with st.spinner("Fazendo requisição do dataset..."):
-                                response = requests.get(dataset_url, headers=headers, stream=True)
-                                st.info(f"Status da requisição: {response.status_code}")
-                                st.info(f"Content-Type: {response.headers.get('content-type', 'Não especificado')}")
-                                st.info(f"Content-Length: {response.headers.get('content-length', 'Não especificado')}")
-                                
-                                print(response.content)
-                                
-                                st.html(response.content)
-                                
-                             
-                                response.raise_for_status()
-                                
-                               
-                                content_start = response.content[:50]
-                                st.info(f"Primeiros bytes do conteúdo (hex): {content_start.hex()}")
-                                
-         
-                                import tempfile
-                                import os
-                                
-                                with tempfile.NamedTemporaryFile(suffix='.nc', delete=False, mode='wb') as tmp_file:
-                                  
-                                    tmp_file.write(response.content)
-                                    tmp_file_path = tmp_file.name
-                                    
-                                    st.info(f"Arquivo temporário criado em: {tmp_file_path}")
-                                    st.info(f"Tamanho do arquivo: {os.path.getsize(tmp_file_path)} bytes")
-                                
+                            var_id = dataset_info.iloc[0]["var_id"]
+                            stations_points = stations_with_coordinates(filtered_stations).dropna(subset=["lat", "lon"])
+                            version = dataset_version(dataset_url, headers)
+                            catalog_entry = catalog.get(dataset_url, {})
+                            if access_mode == "download" and catalog_entry.get("size"):
+                                st.info(f"Tamanho do download: {format_bytes(catalog_entry['size'])}")
+                            cached_series, cached_points, missing_stations = load_cached_extraction(
+                                var_id, dataset_url, stations_points, version
+                            )
+                            if cached_series:
+                                st.info(f"{len(cached_series)} estação(ões) carregada(s) do cache de séries.")
+
+                            series, grid_points = pd.DataFrame(), pd.DataFrame()
+                            if not missing_stations.empty and access_mode == "download":
+                                with st.spinner("Fazendo requisição do dataset..."):
+                                    tmp_file_path = download_to_disk(dataset_url, headers)
+
                                 try:
                                    
-                                    import xarray as xr
-                                    try:
-                                        ds = xr.open_dataset(tmp_file_path)
-                                        st.success("Arquivo aberto com sucesso usando xarray!")
-                                        st.write(ds)
-                                    except Exception as xr_error:
-                                        st.warning(f"Erro ao abrir com xarray: {str(xr_error)}")
-                                    
-                                    
-                                    dataset = Dataset(tmp_file_path, 'r')
-                                    
-                                    st.subheader("Informações Básicas do Dataset")
-                                    st.write(f"Número de variáveis: {len(dataset.variables)}")
-                                    st.write(f"Número de dimensões: {len(dataset.dimensions)}")
-                                    
-                                    st.subheader("Primeiras Variáveis")
-                                    for i, (var_name, var) in enumerate(dataset.variables.items()):
-                                        if i < 5:
-                                            st.write(f"\n**{var_name}**")
-                                            st.write(f"- Dimensões: {var.dimensions}")
-                                            st.write(f"- Tipo: {var.dtype}")
-                                            
-                                            try:
-                                                data = var[:]
-                                                if data.size > 0:
-                                                    st.write("- Primeiros valores:")
-                                                    st.write(data.flatten()[:5])
-                                            except Exception as e:
-                                                st.write(f"- Não foi possível mostrar valores: {str(e)}")
-                                    
-                                    dataset.close()
+                                    if use_chunked(tmp_file_path):
+                                        st.info("Arquivo grande: processando em blocos com Dask.")
+                                        series, grid_points = extract_station_series_chunked(
+                                            tmp_file_path, missing_stations, var_id, cache_key=dataset_url
+                                        )
+                                        store_series(var_id, dataset_url, version, series, grid_points)
+                                    else:
+                                        import xarray as xr
+                                        with span("parse", mode=access_mode):
+                                            ds = xr.open_dataset(tmp_file_path)
+                                        with ds:
+                                            st.success("Arquivo aberto com sucesso usando xarray!")
+                                            series, grid_points = extract_and_cache(ds, var_id, missing_stations, dataset_url, version)
                                     
                                 finally:
                
@@ -216,10 +367,28 @@ def render():
                                             st.info("Arquivo temporário removido com sucesso")
                                         except Exception as e:
                                             st.warning(f"Erro ao remover arquivo temporário: {str(e)}")
+                            elif not missing_stations.empty:
+                                with st.spinner("Abrindo dataset remoto..."):
+                                    ds, remote_file = open_remote_dataset(dataset_url, headers=headers, mode=access_mode)
+
+                                try:
+                                    st.success("Dataset remoto aberto sem download completo!")
+                                    series, grid_points = extract_and_cache(ds, var_id, missing_stations, dataset_url, version)
+                                    if remote_file is not None:
+                                        st.info(f"Bytes transferidos: {format_bytes(remote_file.bytes_fetched)} de {format_bytes(remote_file.size)}")
+                                finally:
+                                    ds.close()
+                                    if remote_file is not None:
+                                        remote_file.close()
+
+                            if cached_series:
+                                series = pd.concat([pd.DataFrame(cached_series), series], axis=1)
+                                grid_points = pd.concat([pd.DataFrame(cached_points), grid_points], ignore_index=True)
+                            render_series(series, grid_points)
 
                         except requests.exceptions.RequestException as e:
                             st.error(f"Erro na requisição HTTP: {str(e)}")
-                            if hasattr(e, 'response'):
+                            if getattr(e, 'response', None) is not None:
                                 st.error(f"Resposta do servidor: {e.response.text}")
                         except Exception as e:
                             st.error(f"Erro ao carregar o dataset: {str(e)}")
@@ -227,9 +396,10 @@ def render():
                         st.write("---")
                         st.write("Informações de Debug:")
                         st.write(f"URL do dataset: {dataset_url}")
-                        st.write(f"Headers da requisição: {headers}")
             else:
                 st.warning("Selecione pelo menos uma estação antes de processar os dados.")
+
+        render_job_queue()
     else:
         st.info("Por favor, gere ou insira um token na barra lateral para começar.")
 
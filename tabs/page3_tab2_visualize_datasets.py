@@ -1,8 +1,54 @@
 import streamlit as st
-from utils.gsheets_connection import get_connection
+from utils.ceda_download import format_bytes
+from utils.result_cache import MAX_CACHE_BYTES, list_entries, purge
 
 def render():
-        st.write("oi")
-        
+    st.title("Cache de Séries Extraídas")
+    st.caption("Séries já extraídas dos datasets CEDA são reaproveitadas sem novo download enquanto o dataset não mudar (ETag/Last-Modified).")
+
+    entries = list_entries()
+
+    with st.container(border=True):
+        col1, col2, col3 = st.columns(3, gap="small")
+        with col1:
+            st.metric("Séries em Cache", len(entries))
+        with col2:
+            st.metric("Tamanho", format_bytes(entries["size_bytes"].sum()))
+        with col3:
+            st.metric("Limite", format_bytes(MAX_CACHE_BYTES))
+
+    if entries.empty:
+        st.info("O cache de séries está vazio.")
+        return
+
+    display_columns = {
+        "var_id": "Variável",
+        "CD_ESTACAO": "Código da Estação",
+        "url": "Url Dataset",
+        "rows": "Registros",
+        "size_bytes": "Tamanho (bytes)",
+        "last_access": "Último Acesso",
+    }
+    st.dataframe(
+        entries[list(display_columns.keys())].rename(columns=display_columns),
+        use_container_width=True,
+        hide_index=True,
+        column_config={"Url Dataset": st.column_config.LinkColumn("Url Dataset")}
+    )
+
+    selected_stations = st.multiselect("Remover séries das estações:", sorted(entries["CD_ESTACAO"].unique()))
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Remover Selecionadas", disabled=not selected_stations):
+            removed = purge(entries[entries["CD_ESTACAO"].isin(selected_stations)]["key"].tolist())
+            st.toast(f"{removed} série(s) removida(s) do cache.", icon="✅")
+            st.rerun()
+    with col2:
+        if st.button("Limpar Cache", type="primary"):
+            removed = purge()
+            st.toast(f"{removed} série(s) removida(s) do cache.", icon="✅")
+            st.rerun()
+
 if __name__ == "__main__":
-    render()
\ No newline at end of file
+    render()
@@ -1,17 +1,10 @@
 import streamlit as st
-from utils.gsheets_connection import get_connection
-
-conn = get_connection()
+from utils.inmet_mirror import last_sync, load_inmet_data, measurement_columns, sync_mirror
+from utils.inmet_cube import get_cube, summarize
 
 def render():
-    def load_stations_data():
-        return conn.read(worksheet="Dados INMET")
-    
-    data = load_stations_data()
-    
-    measurement_keywords = ["TEMPERATURA", "PRECIPITACAO", "VENTO"]
-    
-    measurement_columns = [col for col in data.columns if any(keyword in col.upper() for keyword in measurement_keywords)]
+    data = load_inmet_data()
+    variable_stats = summarize(get_cube(data), by="variable")
     
     unique_stations = data['Estacao'].nunique()
 
@@ -28,11 +21,21 @@ def render():
             st.metric("Dados Filtrados", len(data))
 
         st.subheader("Variáveis Disponíveis")
-        for column in measurement_columns:
-            mean_value = data[column].mean()
+        for column in measurement_columns(data.columns):
+            mean_value = variable_stats.loc[column, "mean"]
             
             st.markdown(f"`{column}` - Média: {mean_value:.2f}")
         
+    col1, col2 = st.columns([3, 1], vertical_alignment="center")
+    with col1:
+        st.caption(f"Última sincronização com a planilha: {last_sync():%d/%m/%Y %H:%M}")
+    with col2:
+        if st.button("Sincronizar Agora", icon=":material/sync:"):
+            with st.spinner("Sincronizando dados INMET..."):
+                new_rows = sync_mirror()
+            st.toast(f"{new_rows} nova(s) linha(s) sincronizada(s).", icon="✅")
+            st.rerun()
+
     st.divider()
     
     with st.container():
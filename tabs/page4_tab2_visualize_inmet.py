@@ -1,24 +1,19 @@
 import streamlit as st
-import pandas as pd
-from utils.gsheets_connection import get_connection
-
-conn = get_connection()
+from utils.inmet_mirror import load_inmet_data, mirror_version
+from utils.export import render_export
+from utils.inmet_index import get_inmet_index
+from utils.inmet_cube import query
+from utils.downsampling import DEFAULT_MAX_POINTS, downsample_frame, visible_window
 
 def load_and_prepare_data():
-    """Carrega e prepara os dados do Google Sheets"""
-    df = conn.read(worksheet="Dados INMET")
-    df['Data_Medicao'] = pd.to_datetime(df['Data_Medicao'])
-    return df
-
-def convert_df_to_csv(df):
-    """Converte DataFrame para CSV"""
-    return df.to_csv(index=False).encode('utf-8')
-
+    """Carrega os dados tipados do espelho local da planilha"""
+    return load_inmet_data()
 
 def render():
     st.title("Dashboard de Dados INMET")
     
     df = load_and_prepare_data()
+    index = get_inmet_index(df)
     
     with st.expander("Filtros", icon=":material/filter_alt:"):
         cont1 = st.container()
@@ -26,7 +21,7 @@ def render():
 
         with cont1:
             col1, col2 = st.columns(2)
-            all_stations = sorted(df['Nome'].unique())
+            all_stations = index.stations
 
             # cont1 = st.container()
             
@@ -55,11 +50,11 @@ def render():
             col1, col2, col3 = st.columns(3)
 
             with col1:
-                max_date = df['Data_Medicao'].max().date()
+                max_date = index.max_date.date()
                 end_date = st.date_input("Data Final", max_date)
 
             with col2:
-                min_date = df['Data_Medicao'].min().date()
+                min_date = index.min_date.date()
                 start_date = st.date_input("Data Inicial", min_date)
 
             with col3:
@@ -75,12 +70,7 @@ def render():
                 )
 
             
-    mask = (
-        (df['Nome'].isin(selected_stations)) &
-        (df['Data_Medicao'].dt.date >= start_date) &
-        (df['Data_Medicao'].dt.date <= end_date)
-    )
-    filtered_df = df[mask]
+    filtered_df = index.filter(selected_stations, start_date, end_date)
     
     if not selected_stations:
         st.warning("⚠️ Por favor, selecione pelo menos uma estação!")
@@ -98,28 +88,55 @@ def render():
         values=selected_var
     )
     
-    st.line_chart(chart_data)
+    with st.expander("Resolução do Gráfico", icon=":material/zoom_in:"):
+        col1, col2 = st.columns([1, 2])
+        with col1:
+            max_points = st.number_input(
+                "Pontos por série (≈ largura em pixels)",
+                min_value=100,
+                max_value=5000,
+                value=DEFAULT_MAX_POINTS,
+                step=100
+            )
+            method = st.radio(
+                "Redução",
+                options=["lttb", "minmax"],
+                format_func=lambda x: {"lttb": "LTTB", "minmax": "Mín/Máx por intervalo"}[x],
+                horizontal=True
+            )
+        with col2:
+            window_start, window_end = st.slider(
+                "Janela visível",
+                min_value=chart_data.index.min().to_pydatetime(),
+                max_value=chart_data.index.max().to_pydatetime(),
+                value=(chart_data.index.min().to_pydatetime(), chart_data.index.max().to_pydatetime()),
+                format="MM/YYYY"
+            ) if len(chart_data) > 1 else (chart_data.index.min(), chart_data.index.max())
+
+    window_data = visible_window(chart_data, window_start, window_end)
+    plotted_data = downsample_frame(window_data, max_points, method)
+    if len(plotted_data) < len(window_data):
+        st.caption(f"Exibindo {plotted_data.notna().sum().sum()} de {window_data.notna().sum().sum()} pontos. Reduza a janela visível para ver a resolução completa.")
+
+    st.line_chart(plotted_data)
         
-    csv = convert_df_to_csv(filtered_df)
-    
-
-    st.download_button(
-        type="secondary",
-        label="Download .CSV",
-        data=csv,
-        file_name=f'dados_inmet_{start_date}_{end_date}.csv',
-        mime='text/csv',
-        icon=":material/description:"
+    render_export(
+        filtered_df,
+        signature=("dashboard", mirror_version(), tuple(selected_stations), str(start_date), str(end_date)),
+        file_name=f"dados_inmet_{start_date}_{end_date}",
+        key="dashboard"
     )
     
 
     st.text(f"{variables[selected_var]}")
-    stats_df = filtered_df.groupby('Nome')[selected_var].agg([
-            ('Média', 'mean'),
-            ('Mínimo', 'min'),
-            ('Máximo', 'max'),
-            ('Desvio Padrão', 'std')
-        ]).round(2)
+    stats_df = query(df, index, selected_var, selected_stations, start_date, end_date)[
+            ['mean', 'min', 'max', 'std']
+        ].rename(columns={
+            'mean': 'Média',
+            'min': 'Mínimo',
+            'max': 'Máximo',
+            'std': 'Desvio Padrão'
+        }).round(2)
     st.dataframe(stats_df, use_container_width=True)
     
 
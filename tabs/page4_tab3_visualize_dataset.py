@@ -1,31 +1,21 @@
 import streamlit as st
-from utils.gsheets_connection import get_connection
-
-conn = get_connection()
-
-
-def convert_df_to_csv(df):
-    """Converte DataFrame para CSV"""
-    return df.to_csv(index=False).encode('utf-8')
-
+from utils.inmet_mirror import load_inmet_data, mirror_version
+from utils.export import render_export
 
 
 def render():
     with st.container():
         st.title("Dataset INMET - Captação Mensal")
         with st.container():
-            @st.cache_data
-            def load_stations_data():
-                return conn.read(worksheet="Dados INMET")
-            data = load_stations_data()
+            data = load_inmet_data()
             st.dataframe(data, use_container_width=True)
             
             
-    csv = convert_df_to_csv(data)
-    st.download_button(
-        label="Download Dataset .CSV",
-        data=csv,
-        file_name='dados_inmet_1961-01-31_2025-01-01.csv',
-        mime='text/csv'
+    render_export(
+        data,
+        signature=("dataset", mirror_version()),
+        file_name='dados_inmet_1961-01-31_2025-01-01',
+        key="dataset",
+        prepare_label="Preparar Download do Dataset",
+        download_label="Download Dataset"
     )
-       
\ No newline at end of file
@@ -1,5 +1,4 @@
 import streamlit as st
-import hydroeval as he
 import pandas as pd
 
 def render():
@@ -89,6 +88,8 @@ def render():
 
         st.subheader("Saída")
 
+        import hydroeval as he
+
         nse = he.evaluator(he.nse, simulacoes, avaliacoes)
 
         kge, r, alpha, beta = he.evaluator(he.kge, simulacoes, avaliacoes)
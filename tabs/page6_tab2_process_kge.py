@@ -1,7 +1,99 @@
+import os
 import streamlit as st
-from utils.gsheets_connection import get_connection
+from utils.result_cache import list_entries, series_frame
+from utils.inmet_mirror import load_inmet_data, measurement_columns
+from utils.kge import INMET_VARIABLES, align_series, bootstrap_kge, inmet_station_frame, rolling_kge, score_table
 
-conn = get_connection()
 
 def render():
-   st.write("process kge")
\ No newline at end of file
+    st.title("Comparar Dados CEDA x INMET")
+
+    entries = list_entries()
+    if entries.empty:
+        st.info("Nenhuma série CEDA extraída ainda. Processe estações na página **Processar Estações** para compará-las.")
+        return
+
+    datasets = entries.drop_duplicates("url").set_index("url")["var_id"]
+    inmet_data = load_inmet_data()
+    inmet_variables = measurement_columns(inmet_data.columns)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        selected_url = st.selectbox(
+            "Dataset CEDA",
+            options=list(datasets.index),
+            format_func=lambda url: f"{datasets[url]} - {os.path.basename(url)}"
+        )
+    with col2:
+        default_var = INMET_VARIABLES.get(datasets[selected_url])
+        selected_var = st.selectbox(
+            "Variável INMET",
+            options=inmet_variables,
+            index=inmet_variables.index(default_var) if default_var in inmet_variables else 0
+        )
+
+    simulations = series_frame(selected_url)
+    evaluations = inmet_station_frame(inmet_data, selected_var)
+    simulations, evaluations = align_series(simulations, evaluations)
+
+    if simulations.empty:
+        st.warning("Nenhuma estação com dados CEDA e INMET no mesmo período.")
+        return
+
+    scores = score_table(simulations, evaluations)
+
+    with st.container(border=True):
+        col1, col2, col3 = st.columns(3, gap="small")
+        with col1:
+            st.metric("Estações Comparadas", len(scores))
+        with col2:
+            st.metric("KGE Mediano", f"{scores['KGE'].median():.3f}")
+        with col3:
+            st.metric("NSE Mediano", f"{scores['NSE'].median():.3f}")
+
+    st.subheader("Métricas por Estação")
+    st.dataframe(
+        scores.round(3),
+        use_container_width=True,
+        column_config={"n": st.column_config.NumberColumn("Meses", format="%d")}
+    )
+
+    st.subheader("Estabilidade do KGE ao Longo do Tempo")
+    col1, col2 = st.columns(2)
+    with col1:
+        window_years = st.number_input("Janela (anos)", min_value=2, max_value=30, value=10)
+    with col2:
+        step_years = st.number_input("Passo (anos)", min_value=1, max_value=10, value=1)
+
+    rolling = rolling_kge(simulations, evaluations, window=window_years * 12, step=step_years * 12)
+    if rolling.empty:
+        st.info(f"As séries alinhadas têm menos de {window_years} anos em comum.")
+    else:
+        rolling.index = rolling.index.to_timestamp()
+        st.line_chart(rolling)
+
+    st.subheader("Intervalos de Confiança (Bootstrap em Blocos)")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        n_resamples = st.number_input("Reamostragens", min_value=100, max_value=10000, value=1000, step=100)
+    with col2:
+        block_size = st.number_input("Tamanho do bloco (meses)", min_value=1, max_value=60, value=12)
+    with col3:
+        confidence = st.selectbox("Confiança", options=[0.90, 0.95, 0.99], index=1, format_func=lambda x: f"{x:.0%}")
+
+    if st.button("Calcular Intervalos", icon=":material/calculate:"):
+        progress_bar = st.progress(0.0, text="Reamostrando...")
+
+        def update_progress(done, total):
+            progress_bar.progress(done / total, text=f"Reamostrando: {done} de {total} grupos de estações")
+
+        intervals = bootstrap_kge(
+            simulations,
+            evaluations,
+            n_resamples=n_resamples,
+            block_size=block_size,
+            confidence=confidence,
+            progress_callback=update_progress
+        )
+        progress_bar.empty()
+        st.dataframe(scores[["KGE", "r", "alpha", "beta"]].join(intervals).round(3), use_container_width=True)
@@ -0,0 +1,65 @@
+import json
+import streamlit as st
+import pandas as pd
+from utils.ceda_download import format_bytes
+from utils.metrics import current_run, memory_peak, peak_rss_bytes, prometheus_text, rss_bytes
+
+# Etapas cujos bytes vieram da rede (as demais contam bytes lidos do disco ou da memória).
+TRANSFER_STAGES = ("download", "range_fetch")
+
+
+def stage_summary(run):
+    """Uma linha por etapa medida no rerun: chamadas, tempo, bytes, linhas e acertos/faltas de cache."""
+    df = pd.DataFrame([item.as_dict() for item in run])
+    df["hits"] = df["cache"].eq("hit")
+    df["misses"] = df["cache"].eq("miss")
+    summary = df.groupby("stage", sort=False).agg(
+        chamadas=("stage", "size"),
+        segundos=("seconds", "sum"),
+        bytes=("bytes", "sum"),
+        linhas=("rows", "sum"),
+        cache_hit=("hits", "sum"),
+        cache_miss=("misses", "sum"),
+        erros=("error", "count"),
+    )
+    return summary.sort_values("segundos", ascending=False)
+
+
+def render():
+    """Painel lateral com as etapas medidas no último rerun da página."""
+    run = list(current_run())
+    with st.sidebar.expander("Desempenho do rerun", expanded=True, icon=":material/speed:"):
+        peak = memory_peak()
+        col1, col2 = st.columns(2)
+        col1.metric("Tempo medido", f"{sum(item.seconds for item in run):.2f} s",
+                    help="Soma das etapas; etapas aninhadas (ex.: range_fetch dentro de parse) contam nas duas.")
+        col2.metric("Transferido", format_bytes(sum(item.bytes for item in run if item.stage in TRANSFER_STAGES)))
+        col1.metric("Pico (rerun)", format_bytes(peak) if peak is not None else "—")
+        rss, peak_rss = rss_bytes(), peak_rss_bytes()
+        col2.metric("RSS", format_bytes(rss) if rss is not None else "—",
+                    help=f"Pico do processo: {format_bytes(peak_rss)}" if peak_rss is not None else None)
+
+        if not run:
+            st.caption("Nenhuma etapa medida neste rerun.")
+        else:
+            st.dataframe(stage_summary(run), column_config={
+                "segundos": st.column_config.NumberColumn(format="%.3f"),
+            })
+
+        st.caption("O pico do rerun vem do tracemalloc, que mede o processo inteiro (inclui outras sessões).")
+        st.download_button(
+            "Exportar rerun (JSON Lines)",
+            data="".join(json.dumps(item.as_dict(), default=str) + "\n" for item in run),
+            file_name="desempenho_rerun.jsonl",
+            mime="application/x-ndjson",
+            icon=":material/download:",
+            key="performance_export_jsonl",
+        )
+        st.download_button(
+            "Exportar totais (Prometheus)",
+            data=prometheus_text(),
+            file_name="ceda_metrics.prom",
+            mime="text/plain",
+            icon=":material/download:",
+            key="performance_export_prometheus",
+        )
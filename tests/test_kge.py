@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import hydroeval as he
+import pytest
+from scipy.stats import spearmanr
+from utils import kge
+from utils.kge import batch_scores, bootstrap_kge
+
+
+def precipitation_pair(rng, n_time):
+    """Séries mensais de precipitação com muitos meses secos (empates em zero) e valores repetidos."""
+    obs = np.round(np.maximum(rng.gamma(0.6, 80, n_time) - 30, 0))
+    sim = np.round(np.maximum(obs * rng.normal(1, 0.2, n_time) + rng.normal(0, 10, n_time), 0))
+    return sim, obs
+
+
+@pytest.mark.parametrize("n_time", [24, 120, 480])
+def test_kgenp_matches_hydroeval_with_ties(n_time):
+    sim, obs = precipitation_pair(np.random.default_rng(n_time), n_time)
+    assert (obs == 0).sum() > 1 and (sim == 0).sum() > 1
+
+    scores = batch_scores(sim[:, None], obs[:, None])
+    _, _, alpha_np, beta = he.evaluator(he.kgenp, sim, obs)[:, 0]
+    r_np = spearmanr(sim, obs).statistic
+    kge_np = 1 - np.sqrt((r_np - 1) ** 2 + (alpha_np - 1) ** 2 + (beta - 1) ** 2)
+
+    np.testing.assert_allclose(scores["r_np"][0], r_np, rtol=1e-12)
+    np.testing.assert_allclose(scores["alpha_np"][0], alpha_np, rtol=1e-12)
+    np.testing.assert_allclose(scores["KGEnp"][0], kge_np, rtol=1e-12)
+
+
+def test_kgenp_matches_hydroeval_without_ties():
+    rng = np.random.default_rng(1)
+    obs = rng.gamma(2, 50, 240)
+    sim = obs * rng.normal(1, 0.2, 240)
+
+    scores = batch_scores(sim[:, None], obs[:, None])
+    kge_np, r_np, alpha_np, _ = he.evaluator(he.kgenp, sim, obs)[:, 0]
+
+    np.testing.assert_allclose(scores["r_np"][0], r_np, rtol=1e-12)
+    np.testing.assert_allclose(scores["alpha_np"][0], alpha_np, rtol=1e-12)
+    np.testing.assert_allclose(scores["KGEnp"][0], kge_np, rtol=1e-12)
+
+
+def test_masked_stations_match_hydroeval_pairwise_deletion():
+    rng = np.random.default_rng(2)
+    sim, obs = precipitation_pair(rng, 240)
+    sim = np.column_stack([sim, sim])
+    obs = np.column_stack([obs, obs])
+    obs[rng.random(240) < 0.2, 1] = np.nan
+
+    scores = batch_scores(sim, obs)
+    valid = ~np.isnan(obs[:, 1])
+    expected = batch_scores(sim[valid, 1:], obs[valid, 1:])
+    for name in ("KGE", "r_np", "KGEnp", "NSE"):
+        np.testing.assert_allclose(scores[name][1], expected[name][0], rtol=1e-12)
+    np.testing.assert_allclose(scores["KGE"][1], he.evaluator(he.kge, sim[:, 1], obs[:, 1])[0, 0], rtol=1e-12)
+
+
+def test_bootstrap_does_not_depend_on_how_stations_are_split(tmp_path, monkeypatch):
+    rng = np.random.default_rng(3)
+    index = pd.period_range("1991-01", periods=120, freq="M")
+    obs = pd.DataFrame(rng.gamma(2, 50, (120, 6)), index=index, columns=[f"8{i:04d}" for i in range(6)])
+    sim = obs * rng.normal(1, 0.2, obs.shape)
+
+    results = []
+    for max_workers, columns in [(1, obs.columns), (3, obs.columns), (2, obs.columns[2:5])]:
+        monkeypatch.setattr(kge, "BOOTSTRAP_DIR", str(tmp_path / f"{max_workers}_{len(columns)}"))
+        results.append(bootstrap_kge(sim[columns], obs[columns], n_resamples=40, max_workers=max_workers))
+
+    pd.testing.assert_frame_equal(results[0], results[1])
+    pd.testing.assert_frame_equal(results[0].loc[results[2].index], results[2])
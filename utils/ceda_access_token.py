@@ -1,29 +1,96 @@
-import streamlit as st
+import time
+import hashlib
+import threading
 import requests
+from utils.ceda_client import request
+from utils.metrics import span
 from datetime import datetime, timezone, timedelta
 from base64 import b64encode
 
-TOKEN_KEY = "ceda_token"
 TOKEN_URL = "https://services-beta.ceda.ac.uk/api/token/create/"
+REFRESH_MARGIN = timedelta(minutes=10)
+RETRY_DELAY = 60
+TOKEN_ATTEMPTS = 3
+TOKEN_BACKOFF = 2.0
 
+_tokens = {}
+_lock = threading.Lock()
+_credential_locks = {}
+_refresh_timers = {}
 
-def load_cached_token():
-    if TOKEN_KEY in st.session_state:
-        token_data = st.session_state[TOKEN_KEY]
 
-        if isinstance(token_data, dict):
-            expires = token_data.get("expires")
-            if expires:
-                expires = datetime.fromisoformat(expires)
-                if datetime.now(timezone.utc) < expires:
-                    return token_data.get("access_token")
-        else:
-            st.error("Invalid token format. Expected a dictionary.")
-    return None
+def credential_key(username, password):
+    return hashlib.sha256(f"{username}:{password}".encode("utf-8")).hexdigest()
 
 
-def save_token_in_session(token, expires):
-    st.session_state[TOKEN_KEY] = {"access_token": token, "expires": expires.isoformat()}
+def _credential_lock(key):
+    with _lock:
+        return _credential_locks.setdefault(key, threading.Lock())
+
+
+def _is_valid(token_data):
+    return token_data is not None and datetime.now(timezone.utc) < token_data["expires"]
+
+
+def load_cached_token(username, password):
+    """Token válido do cache do processo para as credenciais, sem gerar um novo."""
+    token_data = _tokens.get(credential_key(username, password))
+    return token_data["access_token"] if _is_valid(token_data) else None
+
+
+def token_expiration(username, password):
+    token_data = _tokens.get(credential_key(username, password))
+    return token_data["expires"] if _is_valid(token_data) else None
+
+
+def _schedule_refresh(key, username, password, delay):
+    timer = threading.Timer(delay, _refresh, args=(key, username, password))
+    timer.daemon = True
+    with _lock:
+        previous = _refresh_timers.get(key)
+        if previous is not None:
+            previous.cancel()
+        _refresh_timers[key] = timer
+    timer.start()
+
+
+def _refresh(key, username, password):
+    try:
+        with _credential_lock(key):
+            generate_token(username, password)
+    except ValueError:
+        if _is_valid(_tokens.get(key)):
+            _schedule_refresh(key, username, password, RETRY_DELAY)
+
+
+def save_token(username, password, token, expires, issued_at=None):
+    """Guarda o token no cache do processo e agenda a renovação antes de `expires`."""
+    key = credential_key(username, password)
+    _tokens[key] = {"access_token": token, "expires": expires}
+
+    issued_at = issued_at or datetime.now(timezone.utc)
+    margin = min(REFRESH_MARGIN, (expires - issued_at) / 2)
+    delay = max((expires - margin - datetime.now(timezone.utc)).total_seconds(), 0)
+    _schedule_refresh(key, username, password, delay)
+
+
+def _post_token_request(headers):
+    """
+    POST de criação do token, repetido (até `TOKEN_ATTEMPTS` vezes) só quando
+    o servidor certamente não criou um token: 429 ou falha ao conectar.
+    """
+    for attempt in range(1, TOKEN_ATTEMPTS + 1):
+        try:
+            response = request("POST", TOKEN_URL, headers=headers)
+        except requests.exceptions.ConnectTimeout:
+            if attempt == TOKEN_ATTEMPTS:
+                raise
+            time.sleep(TOKEN_BACKOFF * attempt)
+            continue
+        if response.status_code != 429 or attempt == TOKEN_ATTEMPTS:
+            return response
+        retry_after = response.headers.get("retry-after", "")
+        time.sleep(float(retry_after) if retry_after.isdigit() else TOKEN_BACKOFF * attempt)
 
 
 def generate_token(username, password):
@@ -31,7 +98,7 @@ def generate_token(username, password):
     headers = {"Authorization": f"Basic {encoded_credentials}"}
 
     try:
-        response = requests.post(TOKEN_URL, headers=headers)
+        response = _post_token_request(headers)
         response.raise_for_status()
 
         data = response.json()
@@ -41,22 +108,48 @@ def generate_token(username, password):
         if not token or not expires_in:
             raise ValueError("Erro ao gerar o token: Resposta inválida do servidor. Token ou tempo de expiração ausente.")
 
-        expires = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
-        save_token_in_session(token, expires)
+        issued_at = datetime.now(timezone.utc)
+        expires = issued_at + timedelta(seconds=expires_in)
+        save_token(username, password, token, expires, issued_at)
         return token
 
     except requests.exceptions.RequestException as e:
         raise ValueError(f"Erro ao gerar o token: Erro na requisição ao servidor: {e}")
 
-    except ValueError as e:
-        raise ValueError(str(e))
-
 
 def get_access_token(username, password):
-    try:
-        token = load_cached_token()
-        if not token:
-            token = generate_token(username, password)
-        return token
-    except ValueError as e:
-        return str(e)
+    """
+    Token CEDA compartilhado por todas as sessões e jobs do processo.
+
+    O token é renovado em segundo plano `REFRESH_MARGIN` antes de expirar, então
+    normalmente esta chamada só lê o cache. Gerações simultâneas para as mesmas
+    credenciais são feitas uma única vez. Levanta `ValueError` em caso de falha.
+    """
+    key = credential_key(username, password)
+    with span("ceda_token") as s:
+        token = load_cached_token(username, password)
+        if token:
+            s.hit()
+            return token
+
+        with _credential_lock(key):
+            token = load_cached_token(username, password)
+            if token:
+                s.hit()
+            else:
+                s.miss()
+                token = generate_token(username, password)
+            return token
+
+
+def clear_token(username, password):
+    key = credential_key(username, password)
+    with _lock:
+        _tokens.pop(key, None)
+        timer = _refresh_timers.pop(key, None)
+    if timer is not None:
+        timer.cancel()
+
+
+def auth_headers(token):
+    return {"Authorization": f"Bearer {token}"}
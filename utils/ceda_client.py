@@ -0,0 +1,102 @@
+import os
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+POOL_SIZE = int(os.environ.get("CEDA_POOL_SIZE", 10))
+MAX_CONNECTIONS_PER_HOST = int(os.environ.get("CEDA_MAX_CONNECTIONS_PER_HOST", 4))
+MAX_DOWNLOADS_PER_HOST = int(os.environ.get("CEDA_MAX_DOWNLOADS_PER_HOST", 2))
+MAX_RETRIES = int(os.environ.get("CEDA_MAX_RETRIES", 5))
+BACKOFF_FACTOR = float(os.environ.get("CEDA_BACKOFF_FACTOR", 0.5))
+CONNECT_TIMEOUT = float(os.environ.get("CEDA_CONNECT_TIMEOUT", 10))
+READ_TIMEOUT = float(os.environ.get("CEDA_READ_TIMEOUT", 60))
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+_host_semaphores = {}
+_download_semaphores = {}
+
+
+def _build_session():
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        # POST fica de fora: repetir a criação de token pode emitir vários tokens para um pedido.
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """
+    Sessão HTTP compartilhada pelo processo para todas as chamadas ao CEDA.
+
+    Mantém conexões keep-alive em pool (sem novo handshake TLS por arquivo) e
+    repete automaticamente, com backoff exponencial, respostas 429/5xx e
+    falhas de conexão de GET e HEAD (POST só é repetido quando a conexão nem
+    chegou a ser aberta).
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _build_session()
+        return _session
+
+
+def _reset_after_fork():
+    # Processos filhos (pool de extração) não devem reutilizar os sockets do processo pai.
+    global _session, _session_lock
+    _session = None
+    _session_lock = threading.Lock()
+    _host_semaphores.clear()
+    _download_semaphores.clear()
+
+
+if hasattr(os, "register_at_fork"):  # indisponível no Windows, que não usa fork
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _host_semaphore(url, semaphores=_host_semaphores, limit=MAX_CONNECTIONS_PER_HOST):
+    host = urlsplit(url).netloc
+    with _session_lock:
+        return semaphores.setdefault(host, threading.BoundedSemaphore(limit))
+
+
+@contextmanager
+def host_slot(url):
+    """Limita o número de requisições simultâneas ao mesmo host. Use em volta de respostas em streaming."""
+    semaphore = _host_semaphore(url)
+    with semaphore:
+        yield
+
+
+@contextmanager
+def download_slot(url):
+    """
+    Limite próprio para downloads completos (streams de vários GB) ao mesmo host.
+
+    Fica separado do `host_slot` para que as requisições curtas da interface
+    (HEAD, Range) não esperem na fila atrás dos downloads.
+    """
+    semaphore = _host_semaphore(url, _download_semaphores, MAX_DOWNLOADS_PER_HOST)
+    with semaphore:
+        yield
+
+
+def request(method, url, **kwargs):
+    """Requisição pela sessão compartilhada, com timeout padrão e limite de concorrência por host."""
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    with host_slot(url):
+        return get_session().request(method, url, **kwargs)
@@ -0,0 +1,162 @@
+import os
+import uuid
+import hashlib
+import tempfile
+import threading
+from utils.ceda_client import CONNECT_TIMEOUT, READ_TIMEOUT, download_slot, get_session
+from utils.metrics import span
+
+CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_DIR = os.path.join(tempfile.gettempdir(), "ceda_downloads")
+
+_part_locks = {}
+_part_locks_lock = threading.Lock()
+
+
+def download_path_for(url, download_dir=DOWNLOAD_DIR):
+    """Caminho local estável para a URL, permitindo retomar downloads entre execuções."""
+    url_hash = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+    file_name = os.path.basename(url.split("?")[0]) or "dataset.nc"
+    return os.path.join(download_dir, f"{url_hash}_{file_name}")
+
+
+def unique_download_path(url, download_dir=DOWNLOAD_DIR):
+    """Caminho final exclusivo de um download: quem baixou pode apagá-lo sem afetar outras leituras."""
+    base, file_name = os.path.split(download_path_for(url, download_dir))
+    return os.path.join(base, f"{uuid.uuid4().hex[:8]}_{file_name}")
+
+
+class _StalePartial(Exception):
+    pass
+
+
+def _part_lock(part_path):
+    with _part_locks_lock:
+        return _part_locks.setdefault(part_path, threading.Lock())
+
+
+def _read_validator(path):
+    try:
+        with open(path) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _write_validator(path, validator):
+    if validator:
+        with open(path, "w") as f:
+            f.write(validator)
+    elif os.path.exists(path):
+        os.unlink(path)
+
+
+def _hash_existing(path, chunk_size):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest
+
+
+def download_dataset(url, headers=None, dest_path=None, chunk_size=CHUNK_SIZE, progress_callback=None, timeout=None):
+    """
+    Baixa o dataset em blocos de tamanho fixo direto para o disco.
+
+    Um download interrompido fica salvo em um arquivo `.part` por URL e é
+    retomado com `Range` na próxima chamada, com `If-Range` e o ETag (ou
+    Last-Modified) do início do download: se o arquivo remoto mudou, o
+    servidor devolve o arquivo inteiro e o parcial é descartado. Downloads
+    simultâneos da mesma URL no processo esperam um pelo outro, e cada um
+    termina em um arquivo próprio (`unique_download_path`) quando `dest_path`
+    não é informado. O SHA-256 é calculado à medida que os blocos chegam.
+    `progress_callback(baixados, total)` recebe os bytes baixados e o total
+    esperado (ou None quando o servidor não informa). `timeout` vale para a
+    conexão e para cada leitura do stream (padrão: o do `ceda_client`), então
+    uma conexão parada falha em vez de prender o worker.
+    """
+    if dest_path:
+        part_path = dest_path + ".part"
+    else:
+        part_path = download_path_for(url) + ".part"
+        dest_path = unique_download_path(url)
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+
+    with _part_lock(part_path):
+        try:
+            return _download(url, headers, dest_path, part_path, chunk_size, progress_callback, timeout)
+        except _StalePartial:
+            return _download(url, headers, dest_path, part_path, chunk_size, progress_callback, timeout)
+
+
+def _download(url, headers, dest_path, part_path, chunk_size, progress_callback, timeout):
+    validator_path = part_path + ".etag"
+    validator = _read_validator(validator_path)
+    request_headers = dict(headers or {})
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) and validator else 0
+    if offset:
+        request_headers["Range"] = f"bytes={offset}-"
+        request_headers["If-Range"] = validator
+
+    timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+    with span("download", url=url, resumed_from=offset) as s, download_slot(url), \
+            get_session().get(url, headers=request_headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 416 and offset:
+            # O arquivo parcial já está completo no disco.
+            digest = _hash_existing(part_path, chunk_size)
+            os.replace(part_path, dest_path)
+            _write_validator(validator_path, None)
+            return {"path": dest_path, "size": offset, "sha256": digest.hexdigest(),
+                    "content_type": response.headers.get("content-type"), "resumed": True}
+
+        response.raise_for_status()
+
+        current = response.headers.get("etag") or response.headers.get("last-modified")
+        if offset and response.status_code == 206 and current and current != validator:
+            # Servidor sem suporte a If-Range devolveu bytes de outra versão: descarta o parcial.
+            os.unlink(part_path)
+            _write_validator(validator_path, None)
+            raise _StalePartial()
+
+        if offset and response.status_code == 206:
+            digest = _hash_existing(part_path, chunk_size)
+            mode = "ab"
+        else:
+            # Servidor ignorou o Range ou o arquivo remoto mudou (If-Range): recomeça do início.
+            digest = hashlib.sha256()
+            offset = 0
+            mode = "wb"
+            _write_validator(validator_path, response.headers.get("etag") or response.headers.get("last-modified"))
+
+        content_length = response.headers.get("content-length")
+        total = offset + int(content_length) if content_length else None
+        downloaded = offset
+
+        with open(part_path, mode) as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if not chunk:
+                    continue
+                f.write(chunk)
+                digest.update(chunk)
+                downloaded += len(chunk)
+                s.add(bytes=len(chunk))
+                if progress_callback:
+                    progress_callback(downloaded, total)
+
+        content_type = response.headers.get("content-type")
+
+    if total is not None and downloaded < total:
+        raise IOError(f"Download incompleto: {downloaded} de {total} bytes recebidos.")
+
+    os.replace(part_path, dest_path)
+    _write_validator(validator_path, None)
+    return {"path": dest_path, "size": downloaded, "sha256": digest.hexdigest(),
+            "content_type": content_type, "resumed": mode == "ab"}
+
+
+def format_bytes(num_bytes):
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
@@ -0,0 +1,315 @@
+import io
+import os
+import time
+import uuid
+import shutil
+import hashlib
+import tempfile
+import threading
+from collections import Counter
+from utils.ceda_client import request
+from utils.metrics import span
+from utils.netcdf_classic import is_classic
+
+BLOCK_SIZE = 1024 * 1024
+BLOCK_CACHE_DIR = os.path.join(tempfile.gettempdir(), "ceda_blocks")
+BLOCK_CACHE_MAX_BYTES = int(os.environ.get("CEDA_BLOCK_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+# Diretórios usados há menos tempo que isso não são removidos: podem estar abertos em outro processo.
+BLOCK_CACHE_MIN_AGE = 600
+TOUCH_INTERVAL = 60
+
+ACCESS_MODES = {
+    "download": "Download completo",
+    "range": "Leitura remota (HTTP Range)",
+    "opendap": "OPeNDAP",
+}
+
+CEDA_DAP_HOST = "https://dap.ceda.ac.uk/"
+CEDA_OPENDAP_PREFIX = "https://dap.ceda.ac.uk/thredds/dodsC/"
+
+_open_dirs = Counter()
+_open_dirs_lock = threading.Lock()
+
+
+def _tmp_path(path):
+    # Nome exclusivo: a UI e os processos de extração podem gravar o mesmo bloco ao mesmo tempo.
+    return f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+
+
+class HTTPRangeFile(io.RawIOBase):
+    """
+    Arquivo somente leitura servido por requisições HTTP Range.
+
+    O conteúdo é lido em blocos de `block_size` bytes, guardados em disco em
+    `cache_dir`; blocos já baixados são reaproveitados entre leituras e entre
+    execuções do app. A cada abertura, uma requisição de 1 byte obtém o tamanho
+    e a versão (ETag/Last-Modified) do arquivo; o cache é separado por URL,
+    versão e `block_size`, então um arquivo alterado no servidor nunca é
+    servido com blocos antigos. O cache é limitado a `BLOCK_CACHE_MAX_BYTES`
+    (os arquivos usados há mais tempo saem primeiro), sem remover os abertos
+    neste processo nem os usados nos últimos `BLOCK_CACHE_MIN_AGE` segundos,
+    que podem estar abertos em outro. Usado como arquivo para o
+    h5netcdf/xarray, que só pede os chunks HDF5 necessários.
+    """
+
+    def __init__(self, url, headers=None, block_size=BLOCK_SIZE, cache_dir=None):
+        super().__init__()
+        self.url = url
+        self.headers = dict(headers or {})
+        self.block_size = block_size
+        self.bytes_fetched = 0
+        self.position = 0
+        self._lock = threading.Lock()
+        self.size, self.version = self._probe()
+
+        cache_dir = cache_dir or BLOCK_CACHE_DIR
+        key = "|".join((url, self.version, str(self.size), str(block_size)))
+        self.cache_dir = os.path.join(cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest())
+        with _open_dirs_lock:
+            _open_dirs[self.cache_dir] += 1
+        self._registered = True
+        self._touched_at = time.monotonic()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._check_cached_version()
+        evict_block_cache(cache_dir)
+
+    def close(self):
+        if getattr(self, "_registered", False):
+            self._registered = False
+            with _open_dirs_lock:
+                _open_dirs[self.cache_dir] -= 1
+                if _open_dirs[self.cache_dir] <= 0:
+                    del _open_dirs[self.cache_dir]
+        super().close()
+
+    def _probe(self):
+        response = request("GET", self.url, headers={**self.headers, "Range": "bytes=0-0"})
+        response.raise_for_status()
+        content_range = response.headers.get("content-range")
+        if response.status_code != 206 or not content_range:
+            raise IOError("O servidor não suporta requisições HTTP Range para este arquivo.")
+        version = response.headers.get("etag") or response.headers.get("last-modified") or ""
+        return int(content_range.rsplit("/", 1)[-1]), version
+
+    def _check_cached_version(self):
+        """Confere o arquivo `size` do cache (tamanho e versão); blocos de outra versão são descartados."""
+        size_path = os.path.join(self.cache_dir, "size")
+        expected = f"{self.size}\n{self.version}"
+        if os.path.exists(size_path):
+            with open(size_path) as f:
+                if f.read() == expected:
+                    os.utime(size_path)
+                    return
+            for name in os.listdir(self.cache_dir):
+                try:
+                    os.unlink(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    pass
+        self._write_size(expected)
+
+    def _write_size(self, expected=None):
+        size_path = os.path.join(self.cache_dir, "size")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = _tmp_path(size_path)
+        with open(tmp_path, "w") as f:
+            f.write(expected or f"{self.size}\n{self.version}")
+        os.replace(tmp_path, size_path)
+
+    def _touch(self):
+        """Marca o diretório como em uso (no máximo a cada `TOUCH_INTERVAL` s), para a limpeza de outros processos."""
+        now = time.monotonic()
+        if now - self._touched_at < TOUCH_INTERVAL:
+            return
+        self._touched_at = now
+        try:
+            os.utime(os.path.join(self.cache_dir, "size"))
+        except FileNotFoundError:
+            self._write_size()
+
+    def _block_path(self, block):
+        return os.path.join(self.cache_dir, f"{block}.blk")
+
+    def _fetch_blocks(self, first, last):
+        start = first * self.block_size
+        end = min((last + 1) * self.block_size, self.size) - 1
+        with span("range_fetch", url=self.url) as s:
+            response = request("GET", self.url, headers={**self.headers, "Range": f"bytes={start}-{end}"})
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise IOError("O servidor ignorou o cabeçalho Range.")
+            current = response.headers.get("etag") or response.headers.get("last-modified") or ""
+            if current != self.version:
+                raise IOError("O arquivo remoto mudou durante a leitura; abra o dataset novamente.")
+            content = response.content
+            s.add(bytes=len(content))
+        self.bytes_fetched += len(content)
+
+        if not os.path.isdir(self.cache_dir):
+            # Removido pela limpeza de outro processo: recria o diretório.
+            self._write_size()
+        for block in range(first, last + 1):
+            offset = (block - first) * self.block_size
+            tmp_path = _tmp_path(self._block_path(block))
+            with open(tmp_path, "wb") as f:
+                f.write(content[offset:offset + self.block_size])
+            os.replace(tmp_path, self._block_path(block))
+        return content
+
+    def _read_block(self, block):
+        try:
+            with open(self._block_path(block), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            content = self._fetch_blocks(block, block)
+            return content[:self.block_size]
+
+    def _ensure_blocks(self, first, last):
+        missing = [b for b in range(first, last + 1) if not os.path.exists(self._block_path(b))]
+        # Agrupa blocos faltantes contíguos em uma única requisição.
+        run_start = None
+        for i, block in enumerate(missing):
+            if run_start is None:
+                run_start = block
+            if i + 1 == len(missing) or missing[i + 1] != block + 1:
+                self._fetch_blocks(run_start, block)
+                run_start = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = self.size + offset
+        return self.position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self.position
+        size = max(0, min(size, self.size - self.position))
+        if size == 0:
+            return b""
+
+        with self._lock:
+            first = self.position // self.block_size
+            last = (self.position + size - 1) // self.block_size
+            self._touch()
+            self._ensure_blocks(first, last)
+
+            data = b"".join(self._read_block(b) for b in range(first, last + 1))
+            offset = self.position - first * self.block_size
+            chunk = data[offset:offset + size]
+            self.position += len(chunk)
+            return chunk
+
+    def readinto(self, buffer):
+        chunk = self.read(len(buffer))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+
+def evict_block_cache(cache_dir=None, max_bytes=None, min_age=BLOCK_CACHE_MIN_AGE):
+    """
+    Remove os arquivos em cache usados há mais tempo até o cache de blocos caber em `max_bytes`.
+
+    Preserva os diretórios abertos neste processo e os usados há menos de
+    `min_age` segundos (um `HTTPRangeFile` aberto os marca periodicamente).
+    """
+    cache_dir = cache_dir or BLOCK_CACHE_DIR
+    max_bytes = BLOCK_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    with _open_dirs_lock:
+        open_dirs = set(_open_dirs)
+    now = time.time()
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        try:
+            used = os.path.getmtime(os.path.join(path, "size"))
+            size = sum(entry.stat().st_size for entry in os.scandir(path))
+        except OSError:
+            continue
+        entries.append((used, size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for used, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path not in open_dirs and now - used >= min_age:
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+class DownloadRequired(ValueError):
+    """O dataset não pode ser lido remotamente neste modo e deve ser baixado."""
+
+
+class ClassicNetCDFError(DownloadRequired):
+    """NetCDF clássico não pode ser aberto por HTTP Range sem transferir o arquivo inteiro."""
+
+
+def opendap_url_for(url):
+    """Endereço OPeNDAP equivalente a uma URL de arquivo do CEDA, ou None quando não há."""
+    if url.startswith(CEDA_OPENDAP_PREFIX):
+        return url
+    if url.startswith(CEDA_DAP_HOST):
+        return CEDA_OPENDAP_PREFIX + url[len(CEDA_DAP_HOST):]
+    return None
+
+
+def _open_opendap(url, headers, error=DownloadRequired):
+    """
+    Abre o endereço OPeNDAP do CEDA. O netCDF-C só autentica por usuário/senha,
+    cookies ou certificado (`.ncrc`), não por cabeçalho `Authorization`, então
+    com token a requisição seria anônima e falharia nos datasets restritos:
+    nesse caso levanta `error` para que o arquivo seja baixado.
+    """
+    import xarray as xr
+
+    dap_url = opendap_url_for(url)
+    if not dap_url:
+        raise error("Este dataset não possui endereço OPeNDAP no CEDA. Use o modo Download.")
+    if any(name.lower() == "authorization" for name in (headers or {})):
+        raise error("O OPeNDAP não envia o token do CEDA. Use o modo Download.")
+    return xr.open_dataset(dap_url, engine="netcdf4")
+
+
+def open_remote_dataset(url, headers=None, mode="range", block_size=BLOCK_SIZE):
+    """
+    Abre o dataset remoto sem baixar o arquivo inteiro.
+
+    - `range`: lê somente os bytes pedidos pelo xarray via HTTP Range autenticado,
+      com cache de blocos em disco (NetCDF-4/HDF5, via h5netcdf). O leitor de
+      NetCDF clássico (scipy) carrega todas as variáveis ao abrir, então esses
+      arquivos são abertos por OPeNDAP quando o CEDA oferece e a leitura é
+      anônima; senão levanta `ClassicNetCDFError` e o arquivo deve ser baixado.
+    - `opendap`: abre o endereço OPeNDAP do CEDA, deixando o servidor recortar
+      os dados. Só para datasets públicos: com token (ou sem endereço
+      OPeNDAP), levanta `DownloadRequired`, base também de `ClassicNetCDFError`.
+
+    Retorna `(dataset, arquivo)`; o arquivo (None no OPeNDAP) expõe `bytes_fetched`.
+    """
+    import xarray as xr
+
+    with span("parse", mode=mode):
+        if mode == "opendap":
+            return _open_opendap(url, headers), None
+
+        remote_file = HTTPRangeFile(url, headers=headers, block_size=block_size)
+        magic = remote_file.read(4)
+        remote_file.seek(0)
+        if is_classic(magic):
+            remote_file.close()
+            try:
+                return _open_opendap(url, headers, error=ClassicNetCDFError), None
+            except ClassicNetCDFError as e:
+                raise ClassicNetCDFError(f"Arquivo NetCDF clássico: a leitura remota transferiria o arquivo inteiro. {e}") from None
+        return xr.open_dataset(remote_file, engine="h5netcdf"), remote_file
@@ -0,0 +1,117 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from utils.metrics import span
+from utils.monthly import aggregation_for, convert_units, to_monthly
+from utils.station_extraction import (
+    LAT_NAMES, LON_NAMES, TIME_NAMES, find_coordinate, find_data_variable, grid_dims, points_frame,
+    select_station_points,
+)
+
+CHUNK_BYTES = int(os.environ.get("DASK_CHUNK_BYTES", 128 * 1024 * 1024))
+CHUNKED_MIN_BYTES = int(os.environ.get("CHUNKED_MIN_BYTES", 1024 * 1024 * 1024))
+DASK_THREADS = int(os.environ.get("DASK_THREADS", 4))
+DASK_MEMORY_LIMIT = os.environ.get("DASK_MEMORY_LIMIT", "2GiB")
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_dask_client():
+    """
+    Cliente Dask local do processo, criado na primeira extração em blocos.
+
+    Usa um único worker com threads (funciona também dentro dos processos do
+    pool de extração) e limite de memória `DASK_MEMORY_LIMIT`: ao se aproximar
+    do limite, o worker pausa novas tarefas e descarrega resultados em disco.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            from distributed import Client, LocalCluster
+
+            cluster = LocalCluster(
+                n_workers=1,
+                threads_per_worker=DASK_THREADS,
+                processes=False,
+                memory_limit=DASK_MEMORY_LIMIT,
+                dashboard_address=None,
+            )
+            _client = Client(cluster, set_as_default=False)
+        return _client
+
+
+def _reset_after_fork():
+    # O cliente (e suas threads) não sobrevive ao fork; cada processo filho cria o seu.
+    global _client, _client_lock
+    _client = None
+    _client_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):  # indisponível no Windows, que não usa fork
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def use_chunked(path):
+    """Processamento em blocos para arquivos a partir de `CHUNKED_MIN_BYTES`."""
+    return os.path.getsize(path) >= CHUNKED_MIN_BYTES
+
+
+def aligned_chunks(var, time_name, chunk_bytes=CHUNK_BYTES):
+    """
+    Tamanhos de bloco Dask alinhados ao chunking HDF5 da variável.
+
+    As dimensões espaciais mantêm o chunk do arquivo (cada bloco Dask lê chunks
+    HDF5 inteiros) e o eixo do tempo junta chunks do arquivo até cerca de
+    `chunk_bytes` por bloco. Em arquivos sem chunking, só o tempo é dividido.
+    """
+    native = var.encoding.get("chunksizes")
+    if native:
+        chunks = dict(zip(var.dims, native))
+    else:
+        chunks = {dim: (1 if dim == time_name else size) for dim, size in var.sizes.items()}
+
+    block_bytes = var.dtype.itemsize * int(np.prod(list(chunks.values())))
+    factor = max(1, chunk_bytes // max(block_bytes, 1))
+    chunks[time_name] = min(chunks[time_name] * factor, var.sizes[time_name])
+    return chunks
+
+
+def open_chunked(path, var_name=None, chunk_bytes=CHUNK_BYTES):
+    """Abre o arquivo com Dask, em blocos alinhados ao chunking do arquivo. Retorna `(dataset, variável)`."""
+    import xarray as xr
+
+    with xr.open_dataset(path) as probe:
+        lat_name = find_coordinate(probe, LAT_NAMES)
+        lon_name = find_coordinate(probe, LON_NAMES)
+        time_name = find_coordinate(probe, TIME_NAMES)
+        var_name = find_data_variable(probe, var_name, *grid_dims(probe, lat_name, lon_name))
+        chunks = aligned_chunks(probe[var_name], time_name, chunk_bytes)
+
+    return xr.open_dataset(path, chunks=chunks), var_name
+
+
+def extract_station_series_chunked(path, stations, var_id=None, cache_key=None, chunk_bytes=CHUNK_BYTES):
+    """
+    Extração em blocos para arquivos maiores que a memória.
+
+    Seleção das estações, conversão de unidades e reamostragem mensal são
+    montadas como um grafo Dask preguiçoso e calculadas no cliente local; o
+    pico de memória depende do tamanho do bloco, não do arquivo. Retorna
+    `(series, grid_points)` como `extract_station_series`, já em resolução mensal.
+    """
+    with span("parse", mode="chunked"):
+        ds, var_name = open_chunked(path, var_id, chunk_bytes)
+    with span("extract", var=var_id, stations=len(stations), mode="chunked") as s:
+        try:
+            points, grid_points = select_station_points(ds, stations, var_name, cache_key)
+            if points is None:
+                return pd.DataFrame(), grid_points
+            s.add(bytes=points.nbytes, rows=points.size)
+            how = aggregation_for(points.name, points.attrs)
+            monthly = to_monthly(convert_units(points), how)
+            monthly = monthly.compute(scheduler=get_dask_client())
+        finally:
+            ds.close()
+        return points_frame(monthly), grid_points
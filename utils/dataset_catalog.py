@@ -0,0 +1,203 @@
+import os
+import json
+import asyncio
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from utils.ceda_client import request
+from utils.metrics import span
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "catalog", "catalog.json")
+CONCURRENCY = 8
+
+_catalog_lock = threading.Lock()
+
+
+def load_catalog(path=CATALOG_PATH):
+    """Índice local `url -> metadados` gerado por `refresh_catalog`."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_catalog(catalog, path=CATALOG_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _catalog_lock:
+        with open(path + ".tmp", "w") as f:
+            json.dump(catalog, f, ensure_ascii=False, indent=1)
+        os.replace(path + ".tmp", path)
+
+
+def head_info(url, headers=None):
+    """Tamanho, versão (ETag/Last-Modified) e tipo do arquivo remoto, via HEAD."""
+    response = request("HEAD", url, headers=headers, allow_redirects=True)
+    response.raise_for_status()
+    size = response.headers.get("content-length")
+    return {
+        "size": int(size) if size else None,
+        "version": response.headers.get("etag") or response.headers.get("last-modified") or "",
+        "content_type": response.headers.get("content-type"),
+    }
+
+
+def _attr_value(value):
+    if isinstance(value, (np.integer, np.floating)):
+        return value.item()
+    if isinstance(value, (str, int, float)):
+        return value
+    return None
+
+
+def _time_coverage(ds):
+    for name in ("time", "t"):
+        if name in ds.coords or name in ds.variables:
+            values = ds[name].values
+            if values.size:
+                return str(pd.Timestamp(values.min()).date()), str(pd.Timestamp(values.max()).date())
+    return None, None
+
+
+def _variable_info(dims, dtype, attrs):
+    return {
+        "dims": list(dims),
+        "dtype": str(dtype),
+        "units": _attr_value(attrs.get("units")),
+        "long_name": _attr_value(attrs.get("long_name")),
+    }
+
+
+def _classic_header(remote_file):
+    """Entrada do catálogo de um NetCDF clássico, lendo só o cabeçalho e o primeiro/último tempo."""
+    from xarray.coding.times import decode_cf_datetime
+    from utils.netcdf_classic import read_classic_header, read_classic_values
+
+    header = read_classic_header(remote_file)
+    time_start = time_end = None
+    time_name = next((name for name in ("time", "t") if name in header["variables"]), None)
+    if time_name and header["dims"].get(header["variables"][time_name]["dims"][0]):
+        time_var = header["variables"][time_name]
+        # Só o primeiro e o último registro quando o tempo é a dimensão de registro.
+        values = read_classic_values(remote_file, header, time_name, [0, -1]).ravel()
+        units = time_var["attrs"].get("units")
+        if isinstance(units, str) and " since " in units:
+            dates = decode_cf_datetime(values, units, time_var["attrs"].get("calendar", "standard"))
+            time_start, time_end = (str(pd.Timestamp(str(date)).date()) for date in (min(dates), max(dates)))
+
+    attrs = {key: _attr_value(value) for key, value in header["attrs"].items()}
+    return {
+        "dims": header["dims"],
+        "variables": {
+            name: _variable_info(var["dims"], var["dtype"].name, var["attrs"])
+            for name, var in header["variables"].items()
+        },
+        "attrs": {key: value for key, value in attrs.items() if value is not None},
+        "time_start": time_start,
+        "time_end": time_end,
+    }
+
+
+def read_header(url, headers=None):
+    """
+    Dimensões, variáveis, atributos e cobertura temporal do dataset.
+
+    Abre o arquivo por HTTP Range, de modo que só os blocos do cabeçalho (e a
+    coordenada de tempo) são transferidos; os blocos ficam no cache de blocos e
+    são reaproveitados pela leitura remota. NetCDF clássico é lido por um
+    leitor próprio do cabeçalho, sem o scipy (que carregaria todos os dados).
+    """
+    import xarray as xr
+    from utils.ceda_remote import HTTPRangeFile
+    from utils.netcdf_classic import is_classic
+
+    remote_file = HTTPRangeFile(url, headers=headers)
+    try:
+        with span("parse", mode="header"):
+            if is_classic(remote_file.read(4)):
+                info = _classic_header(remote_file)
+            else:
+                remote_file.seek(0)
+                with xr.open_dataset(remote_file, engine="h5netcdf") as ds:
+                    time_start, time_end = _time_coverage(ds)
+                    attrs = {key: _attr_value(value) for key, value in ds.attrs.items()}
+                    info = {
+                        "dims": {name: int(size) for name, size in ds.sizes.items()},
+                        "variables": {
+                            name: _variable_info(var.dims, var.dtype, var.attrs) for name, var in ds.variables.items()
+                        },
+                        "attrs": {key: value for key, value in attrs.items() if value is not None},
+                        "time_start": time_start,
+                        "time_end": time_end,
+                    }
+            return {**info, "header_bytes": remote_file.bytes_fetched}
+    finally:
+        remote_file.close()
+
+
+def inspect_dataset(url, headers=None, cached=None):
+    """Entrada do catálogo para `url`; reaproveita `cached` quando a versão remota não mudou."""
+    info = head_info(url, headers)
+    if cached and not cached.get("error") and info["version"] and cached.get("version") == info["version"]:
+        return {**cached, **info, "checked_at": datetime.now().isoformat(timespec="seconds")}
+
+    return {
+        "url": url,
+        **info,
+        **read_header(url, headers),
+        "error": None,
+        "checked_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+async def crawl_catalog(urls, headers=None, concurrency=CONCURRENCY, progress_callback=None, path=CATALOG_PATH):
+    """
+    Atualiza o catálogo de todas as `urls` ao mesmo tempo, com no máximo
+    `concurrency` datasets em andamento. Falhas ficam registradas em `error`
+    na entrada da URL, sem interromper as demais.
+    """
+    catalog = load_catalog(path)
+    semaphore = asyncio.Semaphore(concurrency)
+    urls = list(dict.fromkeys(urls))
+    done = 0
+
+    async def crawl(url):
+        nonlocal done
+        async with semaphore:
+            try:
+                entry = await asyncio.to_thread(inspect_dataset, url, headers, catalog.get(url))
+            except Exception as e:
+                entry = {**catalog.get(url, {}), "url": url, "error": str(e),
+                         "checked_at": datetime.now().isoformat(timespec="seconds")}
+        catalog[url] = entry
+        done += 1
+        if progress_callback:
+            progress_callback(done, len(urls))
+
+    await asyncio.gather(*(crawl(url) for url in urls))
+    save_catalog(catalog, path)
+    return catalog
+
+
+def refresh_catalog(urls, headers=None, concurrency=CONCURRENCY, progress_callback=None, path=CATALOG_PATH):
+    """Versão síncrona de `crawl_catalog`, para uso no Streamlit e na CLI."""
+    return asyncio.run(crawl_catalog(urls, headers, concurrency, progress_callback, path))
+
+
+def catalog_frame(infos, catalog=None):
+    """Linhas do `Infos` com o tamanho real, dimensões e cobertura temporal do catálogo."""
+    catalog = load_catalog() if catalog is None else catalog
+    rows = [
+        {
+            "url": url,
+            "real_size": entry.get("size"),
+            "dims": ", ".join(f"{name}={size}" for name, size in entry.get("dims", {}).items()) or None,
+            "time_start": entry.get("time_start"),
+            "time_end": entry.get("time_end"),
+            "checked_at": entry.get("checked_at"),
+            "error": entry.get("error"),
+        }
+        for url, entry in catalog.items()
+    ]
+    columns = ["url", "real_size", "dims", "time_start", "time_end", "checked_at", "error"]
+    return infos.merge(pd.DataFrame(rows, columns=columns), on="url", how="left")
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_POINTS = 1000
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Índices escolhidos pelo Largest-Triangle-Three-Buckets.
+
+    `x` e `y` são arrays numéricos sem NaN, com `x` crescente. O primeiro e o
+    último ponto são sempre mantidos.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    indices = np.empty(n_out, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+
+    # Média de cada bucket, usada como terceiro vértice do triângulo.
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, x[-1])
+    avg_y = np.append(sums_y / counts, y[-1])
+
+    previous = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        bucket_x, bucket_y = x[start:stop], y[start:stop]
+        area = np.abs(
+            (x[previous] - avg_x[i + 1]) * (bucket_y - y[previous])
+            - (x[previous] - bucket_x) * (avg_y[i + 1] - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        indices[i + 1] = previous
+    return indices
+
+
+def minmax_indices(y, n_out):
+    """Índices do mínimo e do máximo de cada bucket (n_out / 2 buckets), em ordem."""
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+
+    n_buckets = n_out // 2
+    edges = np.linspace(0, n, n_buckets + 1).astype(int)
+    bucket_of = np.repeat(np.arange(n_buckets), np.diff(edges))
+    order = np.lexsort((y, bucket_of))
+    first = edges[:-1]
+    last = edges[1:] - 1
+    return np.unique(np.concatenate((order[first], order[last])))
+
+
+def downsample_series(series, max_points=DEFAULT_MAX_POINTS, method="lttb"):
+    series = series.dropna()
+    if len(series) <= max_points:
+        return series
+
+    x = series.index.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(float)
+    y = series.to_numpy(dtype=float)
+    if method == "minmax":
+        indices = minmax_indices(y, max_points)
+    else:
+        indices = lttb_indices(x, y, max_points)
+    return series.iloc[indices]
+
+
+def downsample_frame(chart_data, max_points=DEFAULT_MAX_POINTS, method="lttb"):
+    """
+    Reduz cada coluna (série) do gráfico a no máximo `max_points` pontos.
+
+    `max_points` deve acompanhar a largura do gráfico em pixels: mais pontos do
+    que pixels não aparecem na tela e só pesam no navegador.
+    """
+    if chart_data.empty or (chart_data.notna().sum() <= max_points).all():
+        return chart_data
+    reduced = {column: downsample_series(chart_data[column], max_points, method) for column in chart_data.columns}
+    return pd.DataFrame(reduced).sort_index()
+
+
+def visible_window(chart_data, start, end):
+    """Recorte do gráfico para a janela visível, lido em resolução total antes da redução."""
+    return chart_data.loc[pd.Timestamp(start):pd.Timestamp(end)]
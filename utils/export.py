@@ -0,0 +1,135 @@
+import os
+import gzip
+import hashlib
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+EXPORT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "exports")
+CHUNK_ROWS = 50000
+MAX_CACHED_EXPORTS = 20
+
+EXPORT_FORMATS = {
+    "csv": {"label": "CSV", "extension": "csv", "mime": "text/csv"},
+    "csv.gz": {"label": "CSV (gzip)", "extension": "csv.gz", "mime": "application/gzip"},
+    "parquet": {"label": "Parquet", "extension": "parquet", "mime": "application/vnd.apache.parquet"},
+}
+
+
+def write_csv(df, file, chunk_rows=CHUNK_ROWS):
+    for start in range(0, max(len(df), 1), chunk_rows):
+        df.iloc[start:start + chunk_rows].to_csv(file, index=False, header=start == 0)
+
+
+def write_parquet(df, path, chunk_rows=CHUNK_ROWS):
+    schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+    with pq.ParquetWriter(path, schema) as writer:
+        for start in range(0, len(df), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows]
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def export_path(signature, fmt, export_dir=EXPORT_DIR):
+    digest = hashlib.sha1(repr(signature).encode("utf-8")).hexdigest()
+    return os.path.join(export_dir, f"{digest}.{EXPORT_FORMATS[fmt]['extension']}")
+
+
+def cached_export(signature, fmt, export_dir=EXPORT_DIR):
+    """Caminho do arquivo já exportado para a assinatura de filtros, ou None."""
+    path = export_path(signature, fmt, export_dir)
+    return path if os.path.exists(path) else None
+
+
+def export_dataframe(df, fmt, signature, export_dir=EXPORT_DIR, chunk_rows=CHUNK_ROWS):
+    """
+    Exporta o DataFrame para disco em blocos de `chunk_rows` linhas.
+
+    O arquivo é memoizado pela `signature` (filtros que geraram o DataFrame):
+    uma segunda exportação com os mesmos filtros só devolve o caminho.
+    """
+    path = cached_export(signature, fmt, export_dir)
+    if path:
+        return path
+
+    os.makedirs(export_dir, exist_ok=True)
+    path = export_path(signature, fmt, export_dir)
+    tmp_path = path + ".tmp"
+
+    if fmt == "parquet":
+        write_parquet(df, tmp_path, chunk_rows)
+    elif fmt == "csv.gz":
+        with gzip.open(tmp_path, "wt", encoding="utf-8", newline="") as f:
+            write_csv(df, f, chunk_rows)
+    else:
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            write_csv(df, f, chunk_rows)
+
+    os.replace(tmp_path, path)
+    _prune(export_dir)
+    return path
+
+
+def _prune(export_dir, keep=MAX_CACHED_EXPORTS):
+    files = sorted(
+        (os.path.join(export_dir, name) for name in os.listdir(export_dir) if not name.endswith(".tmp")),
+        key=os.path.getmtime,
+        reverse=True,
+    )
+    for path in files[keep:]:
+        os.unlink(path)
+
+
+def _read_export(df, fmt, signature):
+    """Conteúdo do arquivo exportado; se `_prune` de outra sessão o apagou, gera de novo."""
+    for _ in range(2):
+        path = export_dataframe(df, fmt, signature)
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            continue
+    raise FileNotFoundError(path)
+
+
+def render_export(df, signature, file_name, key, prepare_label="Preparar Download", download_label="Download"):
+    """
+    Seletor de formato e botões de exportação; o arquivo só é gerado quando solicitado.
+
+    `signature` identifica o conteúdo exportado (filtros e versão dos dados,
+    por exemplo `inmet_mirror.mirror_version()`) e `key` prefixa as chaves
+    dos widgets, para que várias abas usem o mesmo componente. O botão de
+    download, que envia o arquivo inteiro ao navegador a cada rerun, só
+    aparece depois do clique em "Preparar" para esta assinatura e formato e
+    sai depois do download; o arquivo em disco continua memoizado.
+    """
+    import streamlit as st
+
+    ready_key, download_key = f"{key}_export_ready", f"{key}_export_download"
+    if st.session_state.get(download_key):
+        # Rerun do clique em download: o arquivo já foi enviado.
+        st.session_state.pop(ready_key, None)
+    col1, col2 = st.columns([1, 3], vertical_alignment="bottom")
+    with col1:
+        fmt = st.selectbox(
+            "Formato",
+            options=list(EXPORT_FORMATS.keys()),
+            format_func=lambda x: EXPORT_FORMATS[x]["label"],
+            key=f"{key}_export_format"
+        )
+    with col2:
+        if st.session_state.get(ready_key) != (signature, fmt):
+            if not st.button(prepare_label, key=f"{key}_export_prepare", icon=":material/description:"):
+                return
+            st.session_state[ready_key] = (signature, fmt)
+
+        with st.spinner("Gerando arquivo..."):
+            data = _read_export(df, fmt, signature)
+        extension = EXPORT_FORMATS[fmt]["extension"]
+        st.download_button(
+            type="secondary",
+            label=f"{download_label} .{extension.upper()}",
+            data=data,
+            file_name=f"{file_name}.{extension}",
+            mime=EXPORT_FORMATS[fmt]["mime"],
+            icon=":material/download:",
+            key=download_key
+        )
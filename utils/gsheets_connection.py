@@ -1,5 +1,95 @@
+import time
+import threading
 import streamlit as st
-from streamlit_gsheets import GSheetsConnection
+from utils.metrics import span
+
+DEFAULT_TTL = 600
+WORKSHEET_TTL = {
+    "Estacoes": 300,
+    "Infos": 3600,
+    "Dados INMET": 3600,
+}
+
+_cache = {}
+_cache_lock = threading.Lock()
+_worksheet_locks = {}
+
 
 def get_connection():
+    # Importado aqui: o streamlit_gsheets (gspread, google-auth) pesa na inicialização das páginas.
+    from streamlit_gsheets import GSheetsConnection
+
     return st.connection("gsheets", type=GSheetsConnection)
+
+
+def open_worksheet(worksheet):
+    """Aba da planilha como `gspread.Worksheet`, para operações que o `GSheetsConnection` não expõe."""
+    return get_connection().client._select_worksheet(worksheet=worksheet)
+
+
+def _worksheet_lock(worksheet):
+    with _cache_lock:
+        return _worksheet_locks.setdefault(worksheet, threading.Lock())
+
+
+def _cached(worksheet, ttl):
+    entry = _cache.get(worksheet)
+    if entry and time.monotonic() - entry[0] < ttl:
+        return entry[1]
+    return None
+
+
+def read_worksheet(worksheet, ttl=None, copy=True):
+    """
+    Lê uma aba da planilha com cache compartilhado entre sessões e reruns.
+
+    Cada aba tem seu próprio TTL (`WORKSHEET_TTL`). Leituras simultâneas da
+    mesma aba esperam a primeira terminar e reaproveitam o resultado, em vez
+    de disparar várias requisições à API do Google Sheets. Retorna uma cópia,
+    então quem chama pode alterar o DataFrame livremente; com `copy=False`
+    retorna o próprio DataFrame do cache (somente leitura), que só muda de
+    identidade quando a aba é relida.
+    """
+    ttl = WORKSHEET_TTL.get(worksheet, DEFAULT_TTL) if ttl is None else ttl
+
+    with span("sheets_read", worksheet=worksheet) as s:
+        df = _cached(worksheet, ttl)
+        if df is None:
+            with _worksheet_lock(worksheet):
+                df = _cached(worksheet, ttl)
+                if df is None:
+                    s.miss()
+                    df = get_connection().read(worksheet=worksheet, ttl=0)
+                    _cache[worksheet] = (time.monotonic(), df)
+        if s.cache is None:
+            s.hit()
+        s.add(rows=len(df))
+        return df.copy() if copy else df
+
+
+def patch_cached(worksheet, update, expected_rows=None):
+    """
+    Aplica `update(df)` ao DataFrame em cache da aba, sem relê-la da planilha.
+
+    Usado depois de escritas que o app conhece por inteiro (linhas acrescentadas).
+    Se o cache não tem `expected_rows` linhas, a aba mudou por outro caminho e
+    o cache é descartado. O DataFrame atualizado é um novo objeto, então quem
+    memoiza pela identidade (`load_stations`) refaz seus derivados.
+    """
+    with _worksheet_lock(worksheet):
+        entry = _cache.get(worksheet)
+        if entry is None:
+            return
+        if expected_rows is not None and len(entry[1]) != expected_rows:
+            invalidate(worksheet)
+            return
+        _cache[worksheet] = (entry[0], update(entry[1]))
+
+
+def invalidate(worksheet=None):
+    """Descarta o cache de uma aba (ou de todas) após uma escrita na planilha."""
+    with _cache_lock:
+        if worksheet is None:
+            _cache.clear()
+        else:
+            _cache.pop(worksheet, None)
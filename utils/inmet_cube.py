@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+from utils.inmet_mirror import measurement_columns
+
+KEYS = ["variable", "Nome", "year", "month"]
+STAT_COLUMNS = ["count", "sum", "sumsq", "min", "max"]
+
+_cube_memo = {"source": None, "rows": 0, "cube": None}
+
+
+def aggregate(df, variables=None):
+    """Agregados parciais (count, sum, sumsq, min, max) por variável, estação, ano e mês."""
+    variables = variables or measurement_columns(df.columns)
+    base = pd.DataFrame({
+        "Nome": df["Nome"].astype(str).to_numpy(),
+        "year": df["Data_Medicao"].dt.year.to_numpy(),
+        "month": df["Data_Medicao"].dt.month.to_numpy(),
+    })
+
+    frames = []
+    for variable in variables:
+        values = df[variable].astype(float).to_numpy()
+        grouped = base.assign(value=values, sq=values ** 2).groupby(["Nome", "year", "month"])
+        partial = grouped["value"].agg(["count", "sum", "min", "max"])
+        partial["sumsq"] = grouped["sq"].sum()
+        frames.append(partial.reset_index().assign(variable=variable))
+
+    if not frames:
+        return pd.DataFrame(columns=KEYS + STAT_COLUMNS)
+    return pd.concat(frames, ignore_index=True)[KEYS + STAT_COLUMNS]
+
+
+def merge(*cubes):
+    """Combina agregados parciais com as mesmas chaves."""
+    cubes = [cube for cube in cubes if cube is not None and not cube.empty]
+    if not cubes:
+        return pd.DataFrame(columns=KEYS + STAT_COLUMNS)
+    combined = pd.concat(cubes, ignore_index=True)
+    return combined.groupby(KEYS, as_index=False).agg(
+        count=("count", "sum"), sum=("sum", "sum"), sumsq=("sumsq", "sum"), min=("min", "min"), max=("max", "max")
+    )
+
+
+def get_cube(df):
+    """
+    Cubo materializado dos dados INMET.
+
+    Quando o DataFrame de origem só ganhou linhas no final (sincronização
+    incremental do espelho), apenas as linhas novas são agregadas e somadas ao
+    cubo existente; caso contrário o cubo é reconstruído.
+    """
+    memo = _cube_memo
+    if memo["source"] is df:
+        return memo["cube"]
+
+    previous = memo["source"]
+    appended = (
+        previous is not None
+        and len(df) > memo["rows"]
+        and list(df.columns) == list(previous.columns)
+        and df["Data_Medicao"].iloc[:memo["rows"]].equals(previous["Data_Medicao"])
+    )
+    if appended:
+        cube = merge(memo["cube"], aggregate(df.iloc[memo["rows"]:]))
+    else:
+        cube = aggregate(df)
+
+    memo.update(source=df, rows=len(df), cube=cube)
+    return cube
+
+
+def summarize(cube, by=None):
+    """Média, mínimo, máximo e desvio padrão amostral a partir dos agregados."""
+    grouped = cube.groupby(by, observed=True) if by else cube.assign(_all=0).groupby("_all")
+    totals = grouped.agg(
+        count=("count", "sum"), sum=("sum", "sum"), sumsq=("sumsq", "sum"), min=("min", "min"), max=("max", "max")
+    )
+    count = totals["count"].astype(float)
+    mean = totals["sum"] / count.where(count > 0)
+    variance = (totals["sumsq"] - totals["sum"] ** 2 / count.where(count > 0)) / (count - 1).where(count > 1)
+    return pd.DataFrame({
+        "count": totals["count"],
+        "mean": mean,
+        "min": totals["min"],
+        "max": totals["max"],
+        "std": np.sqrt(variance.clip(lower=0)),
+    })
+
+
+def _month_floor(date):
+    return pd.Timestamp(date).to_period("M")
+
+
+def query(df, index, variable, stations, start_date, end_date):
+    """
+    Estatísticas por estação para um período, combinando agregados mensais.
+
+    Meses inteiramente dentro do período vêm do cubo; meses parcialmente
+    cobertos nas bordas são agregados a partir das linhas brutas via `index`.
+    """
+    cube = get_cube(df)
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    first_full = _month_floor(start) if start.day == 1 else _month_floor(start) + 1
+    last_full = _month_floor(end) if (end + pd.Timedelta(days=1)).day == 1 else _month_floor(end) - 1
+
+    period = cube["year"] * 12 + cube["month"] - 1
+    selection = (
+        (cube["variable"] == variable)
+        & cube["Nome"].isin(stations)
+        & (period >= first_full.year * 12 + first_full.month - 1)
+        & (period <= last_full.year * 12 + last_full.month - 1)
+    )
+    parts = [cube[selection]]
+
+    edges = []
+    if first_full > last_full:
+        edges.append((start, end))
+    else:
+        if start < first_full.start_time:
+            edges.append((start, first_full.start_time - pd.Timedelta(days=1)))
+        if end > last_full.end_time.normalize():
+            edges.append((last_full.end_time.normalize() + pd.Timedelta(days=1), end))
+    for edge_start, edge_end in edges:
+        rows = index.filter(stations, edge_start, edge_end)
+        if not rows.empty:
+            parts.append(aggregate(rows, [variable]))
+
+    return summarize(merge(*parts), by="Nome")
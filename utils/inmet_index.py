@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+_index_memo = {"source": None, "index": None}
+
+
+class InmetIndex:
+    """
+    Dados INMET ordenados por (Nome, Data_Medicao) com o intervalo de linhas de cada estação.
+
+    Filtrar por estações e período vira uma busca binária nas datas de cada
+    estação selecionada, sem percorrer a tabela inteira.
+    """
+
+    def __init__(self, df):
+        names = df["Nome"].astype(str).to_numpy()
+        dates = df["Data_Medicao"].to_numpy(dtype="datetime64[ns]")
+        order = np.lexsort((dates, names))
+
+        self.df = df.iloc[order].reset_index(drop=True)
+        self.dates = dates[order]
+        sorted_names = names[order]
+
+        boundaries = np.flatnonzero(sorted_names[1:] != sorted_names[:-1]) + 1
+        starts = np.concatenate(([0], boundaries)) if len(sorted_names) else np.array([], dtype=int)
+        stops = np.concatenate((boundaries, [len(sorted_names)])) if len(sorted_names) else np.array([], dtype=int)
+        self.ranges = {sorted_names[start]: (start, stop) for start, stop in zip(starts, stops)}
+
+        self.stations = list(self.ranges.keys())
+        self.min_date = pd.Timestamp(self.dates.min()) if len(self.dates) else None
+        self.max_date = pd.Timestamp(self.dates.max()) if len(self.dates) else None
+
+    def row_positions(self, stations, start_date, end_date):
+        """Posições (no DataFrame ordenado) das linhas das estações entre as datas, inclusive."""
+        start = np.datetime64(pd.Timestamp(start_date), "ns")
+        end = np.datetime64(pd.Timestamp(end_date) + pd.Timedelta(days=1), "ns")
+
+        positions = []
+        for station in stations:
+            if station not in self.ranges:
+                continue
+            first, last = self.ranges[station]
+            station_dates = self.dates[first:last]
+            lo = first + np.searchsorted(station_dates, start, side="left")
+            hi = first + np.searchsorted(station_dates, end, side="left")
+            positions.append(np.arange(lo, hi))
+        return np.concatenate(positions) if positions else np.array([], dtype=int)
+
+    def filter(self, stations, start_date, end_date):
+        return self.df.iloc[self.row_positions(stations, start_date, end_date)]
+
+
+def get_inmet_index(df):
+    """Índice do DataFrame, reconstruído apenas quando o DataFrame de origem muda."""
+    if _index_memo["source"] is not df:
+        _index_memo["index"] = InmetIndex(df)
+        _index_memo["source"] = df
+    return _index_memo["index"]
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import threading
+import pandas as pd
+from utils.metrics import span
+
+WORKSHEET = "Dados INMET"
+MIRROR_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "inmet")
+MIRROR_PATH = os.path.join(MIRROR_DIR, "dados_inmet.parquet")
+STATE_PATH = os.path.join(MIRROR_DIR, "state.json")
+
+SYNC_INTERVAL = 600
+FULL_SYNC_INTERVAL = 24 * 3600
+
+CATEGORICAL_COLUMNS = ["Nome", "Estacao"]
+MEASUREMENT_KEYWORDS = ["TEMPERATURA", "PRECIPITACAO", "VENTO"]
+
+_sync_lock = threading.Lock()
+_memo = {"mtime": None, "df": None}
+
+
+def measurement_columns(columns):
+    return [col for col in columns if any(keyword in col.upper() for keyword in MEASUREMENT_KEYWORDS)]
+
+
+def prepare_inmet_frame(df):
+    """Tipagem das colunas: data já convertida, estações categóricas e medições numéricas."""
+    df = df.dropna(how="all").copy()
+    df["Data_Medicao"] = pd.to_datetime(df["Data_Medicao"])
+    for column in measurement_columns(df.columns):
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype(str).astype("category")
+    return df.reset_index(drop=True)
+
+
+def _load_state():
+    if not os.path.exists(STATE_PATH) or not os.path.exists(MIRROR_PATH):
+        return {}
+    with open(STATE_PATH) as f:
+        return json.load(f)
+
+
+def _save_state(state):
+    with open(STATE_PATH, "w") as f:
+        json.dump(state, f)
+
+
+def _save(df, state):
+    os.makedirs(MIRROR_DIR, exist_ok=True)
+    df.to_parquet(MIRROR_PATH + ".tmp", engine="pyarrow", index=False)
+    os.replace(MIRROR_PATH + ".tmp", MIRROR_PATH)
+    _save_state(state)
+
+
+def _get_values(worksheet, range_name=None):
+    # Mesmas opções da leitura completa do GSheetsConnection (gspread_dataframe): números
+    # sem a formatação da planilha ("23,5" viria como texto) e datas como texto.
+    return worksheet.get_values(range_name, value_render_option="UNFORMATTED_VALUE",
+                                date_time_render_option="FORMATTED_STRING")
+
+
+def _rows_frame(values, header):
+    """Linhas brutas da planilha como DataFrame com as colunas de `header`, sem as linhas vazias."""
+    rows = [row + [""] * (len(header) - len(row)) for row in values if any(cell != "" for cell in row)]
+    return pd.DataFrame([row[:len(header)] for row in rows], columns=header).replace("", None)
+
+
+def _fetch_all_rows():
+    """
+    Aba inteira como DataFrame, com o cabeçalho e o número de linhas da planilha abaixo dele.
+
+    O número de linhas vem da própria planilha (até a última linha preenchida,
+    contando as vazias no meio), que é o deslocamento usado pelas leituras
+    incrementais seguintes.
+    """
+    from utils.gsheets_connection import open_worksheet
+
+    with span("sheets_read", worksheet=WORKSHEET, mode="full") as s:
+        s.miss()
+        values = _get_values(open_worksheet(WORKSHEET))
+        s.add(rows=len(values))
+    if not values:
+        return pd.DataFrame(), [], 0
+    header = [str(cell) for cell in values[0]]
+    return _rows_frame(values[1:], header), header, len(values) - 1
+
+
+def _fetch_new_rows(sheet_rows, header):
+    """
+    Linhas da planilha depois das `sheet_rows` já espelhadas (sem contar o cabeçalho).
+
+    Retorna as linhas novas e quantas linhas da planilha foram consumidas.
+    """
+    from utils.gsheets_connection import open_worksheet
+
+    with span("sheets_read", worksheet=WORKSHEET, mode="incremental") as s:
+        s.miss()
+        worksheet = open_worksheet(WORKSHEET)
+        first_row = sheet_rows + 2
+        if first_row > worksheet.row_count:
+            return pd.DataFrame(columns=header), 0
+        values = _get_values(worksheet, f"{first_row}:{worksheet.row_count}")
+        s.add(rows=len(values))
+    return _rows_frame(values, header), len(values)
+
+
+def sync_mirror(full=False):
+    """
+    Atualiza o espelho local da aba "Dados INMET".
+
+    Normalmente busca apenas as linhas adicionadas desde a última sincronização;
+    uma recarga completa é feita na primeira vez, quando `full=True` ou a cada
+    `FULL_SYNC_INTERVAL`. As duas leituras usam as mesmas opções da API e a
+    mesma conversão, então o espelho incremental é igual ao de uma recarga
+    completa. Retorna o número de linhas novas.
+    """
+    with _sync_lock:
+        state = _load_state()
+        now = time.time()
+        full = full or not state or now - state.get("last_full_sync", 0) > FULL_SYNC_INTERVAL
+
+        if not full:
+            try:
+                new_rows, consumed_rows = _fetch_new_rows(state["sheet_rows"], state["header"])
+            except Exception:
+                full = True
+
+        if full:
+            raw, header, sheet_rows = _fetch_all_rows()
+            df = prepare_inmet_frame(raw)
+            _save(df, {
+                "sheet_rows": sheet_rows,
+                "header": header,
+                "last_sync": now,
+                "last_full_sync": now,
+            })
+            return len(df)
+
+        state["last_sync"] = now
+        state["sheet_rows"] += consumed_rows
+        if new_rows.empty:
+            _save_state(state)
+            return 0
+
+        df = pd.concat([load_mirror(), prepare_inmet_frame(new_rows)], ignore_index=True)
+        df = prepare_inmet_frame(df)
+        _save(df, state)
+        return len(new_rows)
+
+
+def load_mirror():
+    """Lê o espelho em Parquet, reaproveitando o DataFrame em memória enquanto o arquivo não mudar."""
+    with span("inmet_mirror") as s:
+        mtime = os.path.getmtime(MIRROR_PATH)
+        if _memo["mtime"] != mtime:
+            s.miss()
+            s.add(bytes=os.path.getsize(MIRROR_PATH))
+            _memo["df"] = pd.read_parquet(MIRROR_PATH, engine="pyarrow")
+            _memo["mtime"] = mtime
+        else:
+            s.hit()
+        s.add(rows=len(_memo["df"]))
+        return _memo["df"]
+
+
+def mirror_version():
+    """
+    Versão do conteúdo do espelho: muda só quando o arquivo é regravado
+    (linhas novas ou recarga completa), não a cada sincronização sem novidades.
+    """
+    stat = os.stat(MIRROR_PATH)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def last_sync():
+    state = _load_state()
+    return pd.Timestamp(state["last_sync"], unit="s") if state else None
+
+
+def load_inmet_data():
+    """
+    Dados INMET tipados a partir do espelho local, sincronizando quando expirado.
+
+    O DataFrame retornado é compartilhado entre reruns: não o altere no lugar.
+    """
+    state = _load_state()
+    if not state or time.time() - state.get("last_sync", 0) > SYNC_INTERVAL:
+        try:
+            sync_mirror()
+        except Exception:
+            if not os.path.exists(MIRROR_PATH):
+                raise
+    return load_mirror()
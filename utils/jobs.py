@@ -0,0 +1,243 @@
+import os
+import uuid
+import threading
+import multiprocessing
+import pandas as pd
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from utils.ceda_download import download_dataset
+from utils.metrics import span
+from utils.result_cache import dataset_version, get_series, put_extraction
+
+DOWNLOAD_WORKERS = 4
+EXTRACTION_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+STATUS_LABELS = {
+    "pending": "Na fila",
+    "downloading": "Baixando",
+    "extracting": "Extraindo",
+    "done": "Concluída",
+    "error": "Erro",
+    "cancelled": "Cancelada",
+}
+FINAL_STATUSES = ("done", "error", "cancelled")
+# Depois de entregue ao pool de processos, a extração não é interrompida.
+CANCELLABLE_STATUSES = ("pending", "downloading")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def extract_to_cache(source, var_id, url, version, stations, access_mode="download", headers=None):
+    """
+    Extrai as séries das estações e grava no cache de séries.
+
+    Executada em um processo separado: abre o arquivo baixado (ou o dataset
+    remoto), lê só as células das estações, reduz as séries a mensais e
+    devolve quantas séries gravou.
+    Arquivos baixados a partir de `CHUNKED_MIN_BYTES` são processados em blocos (Dask).
+    """
+    import xarray as xr
+    from utils.station_extraction import extract_monthly_series
+    from utils.chunked_extraction import extract_station_series_chunked, use_chunked
+
+    if access_mode == "download" and use_chunked(source):
+        series, grid_points = extract_station_series_chunked(source, pd.DataFrame(stations), var_id, cache_key=url)
+    else:
+        if access_mode == "download":
+            with span("parse", mode=access_mode):
+                ds, remote_file = xr.open_dataset(source), None
+        else:
+            from utils.ceda_remote import DownloadRequired, open_remote_dataset
+            try:
+                ds, remote_file = open_remote_dataset(source, headers=headers, mode=access_mode)
+            except DownloadRequired:
+                # NetCDF clássico ou OPeNDAP sem como enviar o token: baixa o arquivo.
+                downloaded = download_dataset(source, headers=headers)["path"]
+                try:
+                    return extract_to_cache(downloaded, var_id, url, version, stations, "download")
+                finally:
+                    os.unlink(downloaded)
+
+        try:
+            series, grid_points = extract_monthly_series(ds, pd.DataFrame(stations), var_name=var_id, cache_key=url)
+        finally:
+            ds.close()
+            if remote_file is not None:
+                remote_file.close()
+
+    return put_extraction(var_id, url, version, series, grid_points)
+
+
+class Task:
+    """Processamento de uma linha do `Infos` (dataset/variável) para um conjunto de estações."""
+
+    def __init__(self, var_id, url, stations, headers, access_mode):
+        self.id = uuid.uuid4().hex[:8]
+        self.var_id = var_id
+        self.url = url
+        self.stations = stations
+        self.headers = headers
+        self.access_mode = access_mode
+        self.status = "pending"
+        self.attempts = 0
+        self.downloaded = 0
+        self.total = None
+        self.cached_stations = 0
+        self.extracted_stations = 0
+        self.error = None
+        self.created_at = datetime.now()
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    @property
+    def cancellable(self):
+        return self.status in CANCELLABLE_STATUSES
+
+    def resolve_headers(self):
+        """Cabeçalhos atuais da tarefa; `headers` pode ser uma função, para usar o token renovado."""
+        return self.headers() if callable(self.headers) else self.headers
+
+    def as_row(self):
+        progress = self.downloaded / self.total if self.total else None
+        return {
+            "id": self.id,
+            "var_id": self.var_id,
+            "url": self.url,
+            "estações": len(self.stations),
+            "status": STATUS_LABELS[self.status],
+            "download": progress,
+            "em cache": self.cached_stations,
+            "extraídas": self.extracted_stations,
+            "tentativas": self.attempts,
+            "erro": self.error,
+            "criada em": self.created_at,
+        }
+
+
+class JobRunner:
+    """
+    Fila de processamento em segundo plano, compartilhada por todas as sessões.
+
+    Downloads (I/O) rodam em um pool de threads e a extração (CPU) em um pool de
+    processos. Como o executor vive no processo do servidor, os jobs continuam
+    durante os reruns do Streamlit. O pool de processos usa `spawn`: um `fork`
+    a partir do servidor, que tem várias threads, poderia copiar locks presos.
+    """
+
+    def __init__(self, download_workers=DOWNLOAD_WORKERS, extraction_workers=EXTRACTION_WORKERS):
+        self.tasks = {}
+        self._lock = threading.Lock()
+        self._download_pool = ThreadPoolExecutor(max_workers=download_workers, thread_name_prefix="ceda-download")
+        self._extraction_pool = ProcessPoolExecutor(
+            max_workers=extraction_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def submit(self, var_id, url, stations, headers=None, access_mode="download"):
+        """
+        Enfileira uma tarefa. `stations` são registros com `CD_ESTACAO`, `lat` e `lon`.
+
+        `headers` pode ser um dicionário ou uma função que o devolve, chamada a cada etapa.
+        """
+        task = Task(var_id, url, stations, headers, access_mode)
+        with self._lock:
+            self.tasks[task.id] = task
+        self._start(task)
+        return task
+
+    def _start(self, task):
+        task.attempts += 1
+        task.status = "pending"
+        task.error = None
+        task.cancel_event.clear()
+        task.future = self._download_pool.submit(self._run, task)
+
+    def _run(self, task):
+        try:
+            self._check_cancelled(task)
+            version = dataset_version(task.url, task.resolve_headers())
+            missing = [
+                station for station in task.stations
+                if get_series(task.var_id, task.url, str(station["CD_ESTACAO"]), version)[0] is None
+            ]
+            task.cached_stations = len(task.stations) - len(missing)
+
+            if missing:
+                source = task.url
+                if task.access_mode == "download":
+                    task.status = "downloading"
+                    source = download_dataset(task.url, headers=task.resolve_headers(), progress_callback=self._progress(task))["path"]
+
+                self._check_cancelled(task)
+                task.status = "extracting"
+                try:
+                    task.extracted_stations = self._extraction_pool.submit(
+                        extract_to_cache, source, task.var_id, task.url, version, missing,
+                        task.access_mode, task.resolve_headers()
+                    ).result()
+                    # Cancelada no instante da entrega ao pool: o resultado fica no cache, mas a tarefa conta como cancelada.
+                    self._check_cancelled(task)
+                finally:
+                    if task.access_mode == "download" and os.path.exists(source):
+                        os.unlink(source)
+
+            task.status = "done"
+        except JobCancelled:
+            task.status = "cancelled"
+        except Exception as e:
+            task.status = "error"
+            task.error = str(e)
+        finally:
+            task.finished_at = datetime.now()
+
+    def _progress(self, task):
+        def update(downloaded, total):
+            task.downloaded, task.total = downloaded, total
+            self._check_cancelled(task)
+        return update
+
+    @staticmethod
+    def _check_cancelled(task):
+        if task.cancel_event.is_set():
+            raise JobCancelled()
+
+    def cancel(self, task_id):
+        """Cancela uma tarefa na fila ou baixando; durante a extração não tem efeito."""
+        task = self.tasks[task_id]
+        if not task.cancellable:
+            return
+        task.cancel_event.set()
+        if task.future is not None and task.future.cancel():
+            task.status = "cancelled"
+
+    def retry(self, task_id):
+        task = self.tasks[task_id]
+        if task.status in ("error", "cancelled"):
+            self._start(task)
+
+    def clear_finished(self):
+        with self._lock:
+            for task_id in [task_id for task_id, task in self.tasks.items() if task.status in FINAL_STATUSES]:
+                del self.tasks[task_id]
+
+    def table(self):
+        with self._lock:
+            rows = [task.as_row() for task in self.tasks.values()]
+        return pd.DataFrame(rows).sort_values("criada em", ascending=False, ignore_index=True) if rows else pd.DataFrame()
+
+    def has_active(self):
+        return any(task.status not in FINAL_STATUSES for task in list(self.tasks.values()))
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner():
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
@@ -0,0 +1,325 @@
+import os
+import hashlib
+import warnings
+import threading
+import multiprocessing
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from utils.metrics import span
+
+INMET_VARIABLES = {
+    "pre": "PRECIPITACAO_TOTAL_MENSAL_mm",
+    "tmp": "TEMPERATURA_MEDIA_COMPENSADA_MENSAL_C",
+    "wnd": "VENTO_VELOCIDADE_MEDIA_MENSAL_m/s",
+}
+
+SCORE_COLUMNS = ["n", "KGE", "r", "alpha", "beta", "KGE'", "gamma", "KGEnp", "r_np", "alpha_np", "NSE", "RMSE", "PBIAS"]
+
+
+def monthly_frame(frame):
+    """Agrega um DataFrame (tempo x estação) por mês, para alinhar séries com carimbos de data diferentes."""
+    index = pd.DatetimeIndex(frame.index).to_period("M")
+    return frame.groupby(index).mean()
+
+
+def align_series(simulations, evaluations):
+    """
+    Alinha séries CEDA e INMET (tempo x estação) por mês e pelas estações em comum.
+
+    Retorna dois DataFrames com o mesmo índice mensal e as mesmas colunas.
+    """
+    sim = monthly_frame(simulations)
+    obs = monthly_frame(evaluations)
+    sim.columns = sim.columns.astype(str)
+    obs.columns = obs.columns.astype(str)
+
+    stations = sim.columns.intersection(obs.columns)
+    periods = sim.index.intersection(obs.index)
+    return sim.loc[periods, stations], obs.loc[periods, stations]
+
+
+def _masked_stats(values, mask, n):
+    safe_n = np.where(n > 0, n, np.nan)
+    filled = np.where(mask, values, 0.0)
+    mean = filled.sum(axis=0) / safe_n
+    centered = np.where(mask, values - mean, 0.0)
+    std = np.sqrt((centered ** 2).sum(axis=0) / safe_n)
+    return filled, mean, centered, std
+
+
+def _masked_ranks(values, mask):
+    """
+    Postos médios por coluna (empates recebem a média das posições, como no
+    `scipy.stats.rankdata`) e a ordem que ordena cada coluna.
+
+    Valores inválidos vão para o fim da ordenação e ficam com postos >= n.
+    """
+    masked = np.where(mask, values, np.inf)
+    ordered = np.argsort(masked, axis=0, kind="stable")
+    ordered_values = np.take_along_axis(masked, ordered, axis=0)
+
+    # Cada grupo de valores iguais na coluna ordenada vai da posição `first` à `last`.
+    positions = np.broadcast_to(np.arange(values.shape[0])[:, None], values.shape)
+    changes = np.ones(values.shape, dtype=bool)
+    changes[1:] = ordered_values[1:] != ordered_values[:-1]
+    first = np.maximum.accumulate(np.where(changes, positions, 0), axis=0)
+    ends = np.ones(values.shape, dtype=bool)
+    ends[:-1] = changes[1:]
+    last = np.minimum.accumulate(np.where(ends, positions, values.shape[0])[::-1], axis=0)[::-1]
+
+    ranks = np.empty(values.shape, dtype=float)
+    np.put_along_axis(ranks, ordered, (first + last) / 2, axis=0)
+    return ranks, ordered
+
+
+def kge_components(simulations, evaluations):
+    """KGE original e seus componentes (r, α, β) por coluna, com a mesma máscara de `batch_scores`."""
+    sim = np.asarray(simulations, dtype=np.float64)
+    obs = np.asarray(evaluations, dtype=np.float64)
+    mask = np.isfinite(sim) & np.isfinite(obs)
+    n = mask.sum(axis=0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sim_filled, _, sim_centered, sim_std = _masked_stats(sim, mask, n)
+        obs_filled, _, obs_centered, obs_std = _masked_stats(obs, mask, n)
+        r = (sim_centered * obs_centered).sum(axis=0) / np.sqrt(
+            (sim_centered ** 2).sum(axis=0) * (obs_centered ** 2).sum(axis=0)
+        )
+        alpha = sim_std / obs_std
+        beta = sim_filled.sum(axis=0) / obs_filled.sum(axis=0)
+        kge = 1 - np.sqrt((r - 1) ** 2 + (alpha - 1) ** 2 + (beta - 1) ** 2)
+
+    return {"n": n, "KGE": kge, "r": r, "alpha": alpha, "beta": beta}
+
+
+def batch_scores(simulations, evaluations):
+    """
+    KGE, KGE', KGEnp, NSE, RMSE e PBIAS de todas as estações de uma vez.
+
+    `simulations` e `evaluations` são arrays 2-D (tempo x estação). Cada
+    estação usa apenas os instantes em que as duas séries são válidas, por
+    meio de máscaras, sem laço em Python por estação. As fórmulas seguem as
+    da biblioteca hydroeval; no r_np (Spearman) os empates, comuns em meses
+    sem chuva, recebem postos médios, enquanto o hydroeval usa postos
+    ordinais que dependem da ordem dos empates.
+    """
+    sim = np.asarray(simulations, dtype=np.float64)
+    obs = np.asarray(evaluations, dtype=np.float64)
+    mask = np.isfinite(sim) & np.isfinite(obs)
+    n = mask.sum(axis=0)
+    safe_n = np.where(n > 0, n, np.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sim_filled, sim_mean, sim_centered, sim_std = _masked_stats(sim, mask, n)
+        obs_filled, obs_mean, obs_centered, obs_std = _masked_stats(obs, mask, n)
+
+        r = (sim_centered * obs_centered).sum(axis=0) / np.sqrt(
+            (sim_centered ** 2).sum(axis=0) * (obs_centered ** 2).sum(axis=0)
+        )
+        alpha = sim_std / obs_std
+        beta = sim_filled.sum(axis=0) / obs_filled.sum(axis=0)
+        kge = 1 - np.sqrt((r - 1) ** 2 + (alpha - 1) ** 2 + (beta - 1) ** 2)
+
+        gamma = (sim_std / sim_mean) / (obs_std / obs_mean)
+        beta_prime = sim_mean / obs_mean
+        kge_prime = 1 - np.sqrt((r - 1) ** 2 + (gamma - 1) ** 2 + (beta_prime - 1) ** 2)
+
+        sim_rank, sim_order = _masked_ranks(sim, mask)
+        obs_rank, obs_order = _masked_ranks(obs, mask)
+        rank_mean = (n - 1) / 2
+        sim_rank_c = np.where(mask, sim_rank - rank_mean, 0.0)
+        obs_rank_c = np.where(mask, obs_rank - rank_mean, 0.0)
+        r_np = (sim_rank_c * obs_rank_c).sum(axis=0) / np.sqrt(
+            (sim_rank_c ** 2).sum(axis=0) * (obs_rank_c ** 2).sum(axis=0)
+        )
+        valid_rows = np.arange(sim.shape[0])[:, None] < n
+        sim_fdc = np.take_along_axis(np.where(mask, sim, 0.0), sim_order, axis=0) / (safe_n * sim_mean)
+        obs_fdc = np.take_along_axis(np.where(mask, obs, 0.0), obs_order, axis=0) / (safe_n * obs_mean)
+        alpha_np = 1 - 0.5 * np.where(valid_rows, np.abs(sim_fdc - obs_fdc), 0.0).sum(axis=0)
+        kge_np = 1 - np.sqrt((r_np - 1) ** 2 + (alpha_np - 1) ** 2 + (beta_prime - 1) ** 2)
+
+        squared_error = np.where(mask, (obs - sim) ** 2, 0.0).sum(axis=0)
+        nse = 1 - squared_error / (obs_centered ** 2).sum(axis=0)
+        rmse = np.sqrt(squared_error / safe_n)
+        pbias = 100 * (obs_filled - sim_filled).sum(axis=0) / obs_filled.sum(axis=0)
+
+    return {
+        "n": n, "KGE": kge, "r": r, "alpha": alpha, "beta": beta,
+        "KGE'": kge_prime, "gamma": gamma,
+        "KGEnp": kge_np, "r_np": r_np, "alpha_np": alpha_np,
+        "NSE": nse, "RMSE": rmse, "PBIAS": pbias,
+    }
+
+
+def score_table(simulations, evaluations):
+    """Tabela de métricas por estação a partir de DataFrames (tempo x estação) já alinhados."""
+    with span("kge_scores") as s:
+        s.add(rows=simulations.size)
+        scores = batch_scores(simulations.to_numpy(), evaluations.to_numpy())
+        table = pd.DataFrame(scores, index=pd.Index(simulations.columns, name="CD_ESTACAO"))
+        return table[SCORE_COLUMNS]
+
+
+def inmet_station_frame(inmet_data, variable):
+    """Dados INMET no formato tempo x estação (código `Estacao`) para a variável."""
+    return inmet_data.pivot_table(
+        index="Data_Medicao", columns="Estacao", values=variable, aggfunc="mean", observed=True
+    )
+
+
+BOOTSTRAP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "bootstrap")
+BOOTSTRAP_COMPONENTS = ["KGE", "r", "alpha", "beta"]
+BOOTSTRAP_WORKERS = os.cpu_count() or 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def block_bootstrap_indices(n_time, n_resamples, block_size, rng):
+    """Índices de tempo de `n_resamples` reamostragens por blocos móveis de `block_size` passos."""
+    block_size = max(1, min(block_size, n_time))
+    n_blocks = int(np.ceil(n_time / block_size))
+    starts = rng.integers(0, n_time - block_size + 1, size=(n_resamples, n_blocks))
+    indices = (starts[:, :, None] + np.arange(block_size)).reshape(n_resamples, -1)
+    return indices[:, :n_time]
+
+
+def station_seed(seed, station):
+    """Semente de uma estação: depende só de `seed` e do código, não de como as estações são divididas."""
+    digest = hashlib.sha1(str(station).encode("utf-8")).digest()
+    return [seed, int.from_bytes(digest[:8], "little")]
+
+
+def _bootstrap_chunk(simulations, evaluations, n_resamples, block_size, seeds, batch_size=50):
+    """Componentes do KGE (reamostragem x componente x estação) para um grupo de estações, com uma semente por estação."""
+    rngs = [np.random.default_rng(seed) for seed in seeds]
+    n_time, n_stations = simulations.shape
+    results = np.empty((n_resamples, len(BOOTSTRAP_COMPONENTS), n_stations))
+    stations = np.arange(n_stations)
+
+    for start in range(0, n_resamples, batch_size):
+        stop = min(start + batch_size, n_resamples)
+        indices = np.stack([block_bootstrap_indices(n_time, stop - start, block_size, rng) for rng in rngs], axis=-1)
+        # (reamostragem, tempo, estação) -> (tempo, reamostragem * estação) para um único lote.
+        sim = simulations[indices, stations].transpose(1, 0, 2).reshape(n_time, -1)
+        obs = evaluations[indices, stations].transpose(1, 0, 2).reshape(n_time, -1)
+        scores = kge_components(sim, obs)
+        for i, component in enumerate(BOOTSTRAP_COMPONENTS):
+            results[start:stop, i] = scores[component].reshape(stop - start, n_stations)
+    return results
+
+
+def _bootstrap_cache_path(simulations, evaluations, params):
+    digest = hashlib.sha1()
+    for frame in (simulations, evaluations):
+        digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+        digest.update(repr(list(frame.columns)).encode("utf-8"))
+    digest.update(repr(params).encode("utf-8"))
+    return os.path.join(BOOTSTRAP_DIR, f"{digest.hexdigest()}.parquet")
+
+
+def get_bootstrap_pool():
+    """
+    Pool de processos do bootstrap, criado uma vez e reaproveitado entre cliques e sessões.
+
+    Usa `spawn`: um `fork` a partir do servidor do Streamlit, que tem várias
+    threads, poderia copiar locks presos por outras threads.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=BOOTSTRAP_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def bootstrap_kge(simulations, evaluations, n_resamples=1000, block_size=12, confidence=0.95,
+                  seed=0, max_workers=None, progress_callback=None):
+    """
+    Intervalos de confiança por bootstrap em blocos para o KGE e seus componentes r, α e β.
+
+    As estações são divididas entre processos e cada processo reamostra em
+    lotes vetorizados. Cada estação tem a própria semente (`station_seed`),
+    então o resultado não depende do número de processos nem da divisão das
+    estações. Ele fica em cache em disco, indexado pelos dados e parâmetros,
+    então repetir a mesma análise não refaz o cálculo. Sem `max_workers`, usa
+    o pool compartilhado (`get_bootstrap_pool`).
+    `progress_callback(concluidos, total)` é chamado a cada grupo de estações.
+    """
+    with span("kge_bootstrap", resamples=n_resamples) as s:
+        s.add(rows=simulations.size)
+        params = ("bootstrap", n_resamples, block_size, confidence, seed)
+        cache_path = _bootstrap_cache_path(simulations, evaluations, params)
+        if os.path.exists(cache_path):
+            s.hit()
+            return pd.read_parquet(cache_path)
+        s.miss()
+
+        sim = simulations.to_numpy(dtype=np.float64)
+        obs = evaluations.to_numpy(dtype=np.float64)
+        n_stations = sim.shape[1]
+        seeds = [station_seed(seed, station) for station in simulations.columns.astype(str)]
+        chunks = [chunk for chunk in np.array_split(np.arange(n_stations), (max_workers or BOOTSTRAP_WORKERS) * 4)
+                  if len(chunk)]
+
+        samples = np.empty((n_resamples, len(BOOTSTRAP_COMPONENTS), n_stations))
+        executor = (ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+                    if max_workers else get_bootstrap_pool())
+        try:
+            futures = {
+                executor.submit(_bootstrap_chunk, sim[:, chunk], obs[:, chunk], n_resamples, block_size,
+                                [seeds[i] for i in chunk]): chunk
+                for chunk in chunks
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                samples[:, :, futures[future]] = future.result()
+                if progress_callback:
+                    progress_callback(done, len(futures))
+        finally:
+            if max_workers:
+                executor.shutdown()
+
+        tail = (1 - confidence) / 2 * 100
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            low = np.nanpercentile(samples, tail, axis=0)
+            high = np.nanpercentile(samples, 100 - tail, axis=0)
+
+        table = pd.DataFrame(index=pd.Index(simulations.columns.astype(str), name="CD_ESTACAO"))
+        for i, component in enumerate(BOOTSTRAP_COMPONENTS):
+            table[f"{component}_low"] = low[i]
+            table[f"{component}_high"] = high[i]
+
+        os.makedirs(BOOTSTRAP_DIR, exist_ok=True)
+        table.to_parquet(cache_path, engine="pyarrow")
+        return table
+
+
+def rolling_kge(simulations, evaluations, window=120, step=12, min_periods=None):
+    """
+    KGE em janelas deslizantes (por padrão 10 anos de dados mensais, avançando 1 ano).
+
+    Todas as janelas de todas as estações são avaliadas em uma única chamada
+    vetorizada a `kge_components`. Retorna um DataFrame (início da janela x estação).
+    """
+    with span("kge_rolling", window=window) as s:
+        s.add(rows=simulations.size)
+        n_time, n_stations = simulations.shape
+        if n_time < window:
+            return pd.DataFrame(columns=simulations.columns)
+
+        min_periods = min_periods or window // 2
+        sim = np.lib.stride_tricks.sliding_window_view(simulations.to_numpy(dtype=np.float64), window, axis=0)[::step]
+        obs = np.lib.stride_tricks.sliding_window_view(evaluations.to_numpy(dtype=np.float64), window, axis=0)[::step]
+        n_windows = sim.shape[0]
+
+        # (janela, estação, tempo) -> (tempo, janela * estação)
+        scores = kge_components(
+            sim.transpose(2, 0, 1).reshape(window, -1),
+            obs.transpose(2, 0, 1).reshape(window, -1),
+        )
+        kge = scores["KGE"].reshape(n_windows, n_stations)
+        kge[scores["n"].reshape(n_windows, n_stations) < min_periods] = np.nan
+
+        starts = simulations.index[::step][:n_windows]
+        return pd.DataFrame(kge, index=starts, columns=simulations.columns)
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+POINT_LIMIT = 1500
+CLUSTER_PIXELS = 48
+TILE_SIZE = 256
+MAP_WIDTH = 800
+MAP_HEIGHT = 500
+MIN_ZOOM = 1
+MAX_ZOOM = 14
+METERS_PER_DEGREE = 111320
+
+
+def _mercator_y(lats):
+    lat = np.radians(np.clip(lats, -85, 85))
+    return np.log(np.tan(np.pi / 4 + lat / 2))
+
+
+def fit_view(lats, lons, width=MAP_WIDTH, height=MAP_HEIGHT, padding=0.1):
+    """`(latitude, longitude, zoom)` que enquadram todos os pontos num mapa `width` x `height` pixels."""
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    if not len(lats):
+        return 0.0, 0.0, MIN_ZOOM
+
+    lon_span = max(lons.max() - lons.min(), 1e-3) * (1 + padding)
+    y_span = max(_mercator_y(lats.max()) - _mercator_y(lats.min()), 1e-5) * (1 + padding)
+    zoom_x = np.log2(width * 360 / (TILE_SIZE * lon_span))
+    zoom_y = np.log2(height * 2 * np.pi / (TILE_SIZE * y_span))
+    zoom = float(np.clip(np.floor(min(zoom_x, zoom_y) * 2) / 2, MIN_ZOOM, MAX_ZOOM))
+    return float((lats.min() + lats.max()) / 2), float((lons.min() + lons.max()) / 2), zoom
+
+
+def cell_degrees(zoom, pixels=CLUSTER_PIXELS):
+    """Lado, em graus, de uma célula de agrupamento que ocupa `pixels` na tela no `zoom` dado."""
+    return pixels * 360 / (TILE_SIZE * 2 ** zoom)
+
+
+def cluster_points(lats, lons, labels, zoom, pixels=CLUSTER_PIXELS):
+    """
+    Agrupa os pontos numa grade de células com `pixels` de lado no `zoom` dado.
+
+    Retorna um DataFrame compacto com uma linha por célula ocupada: centroide
+    (`lon`, `lat`, arredondados), número de estações (`n`), raio de desenho em
+    metros, a contagem como texto (`count`, para o TextLayer, que só desenha
+    strings) e um rótulo (o nome da estação quando a célula tem só uma). O
+    tamanho do resultado depende do número de células visíveis, não do
+    número de estações.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    labels = np.asarray(labels, dtype=object)
+    if not len(lats):
+        return pd.DataFrame(columns=["lon", "lat", "n", "radius", "count", "label"])
+
+    cell = cell_degrees(zoom, pixels)
+    rows = np.floor(lats / cell).astype(np.int64)
+    cols = np.floor(lons / cell).astype(np.int64)
+    keys = (rows - rows.min()) * (cols.max() - cols.min() + 1) + (cols - cols.min())
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+
+    lat_mean = np.bincount(inverse, weights=lats) / counts
+    lon_mean = np.bincount(inverse, weights=lons) / counts
+    first = np.full(len(counts), len(inverse))
+    np.minimum.at(first, inverse, np.arange(len(inverse)))
+
+    cell_meters = cell * METERS_PER_DEGREE * np.cos(np.radians(lat_mean))
+    radius = cell_meters * (0.15 + 0.3 * np.sqrt(counts / counts.max()))
+    label = np.where(counts == 1, labels[first], [f"{n} estações" for n in counts])
+
+    return pd.DataFrame({
+        "lon": np.round(lon_mean, 4),
+        "lat": np.round(lat_mean, 4),
+        "n": counts,
+        "radius": np.round(radius).astype(int),
+        "count": counts.astype(str),
+        "label": label,
+    })
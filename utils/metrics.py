@@ -0,0 +1,232 @@
+import os
+import sys
+import json
+import time
+import threading
+import tracemalloc
+import contextvars
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Windows: sem getrusage, o pico de RSS não é informado.
+    resource = None
+
+LOG_PATH = os.environ.get("CEDA_METRICS_LOG")
+PROMETHEUS_PATH = os.environ.get("CEDA_METRICS_PROM")
+
+TOTAL_FIELDS = ("calls", "seconds", "bytes", "rows", "hits", "misses", "errors")
+# Quem pediu tracemalloc e não faz um novo `begin_run` nesse prazo (sessão fechada) deixa de contar.
+TRACER_IDLE_SECONDS = 3600
+
+_lock = threading.Lock()
+_totals = {}
+_tracers = {}
+_tracing = {"owner": False}
+_current_run = contextvars.ContextVar("metrics_run", default=None)
+
+
+def rss_bytes():
+    """Memória residente atual do processo (Linux), ou o pico quando /proc não está disponível (None sem nenhum dos dois)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KB no Linux e em bytes no macOS.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Span:
+    """Medição de uma etapa: duração, bytes, linhas e acerto/falta de cache."""
+
+    def __init__(self, stage, labels):
+        self.stage = stage
+        self.labels = labels
+        self.started_at = time.time()
+        self.seconds = 0.0
+        self.bytes = 0
+        self.rows = 0
+        self.cache = None
+        self.error = None
+
+    def add(self, bytes=0, rows=0):
+        self.bytes += int(bytes or 0)
+        self.rows += int(rows or 0)
+
+    def hit(self):
+        self.cache = "hit"
+
+    def miss(self):
+        self.cache = "miss"
+
+    def as_dict(self):
+        return {
+            "stage": self.stage,
+            **self.labels,
+            "started_at": self.started_at,
+            "seconds": round(self.seconds, 6),
+            "bytes": self.bytes,
+            "rows": self.rows,
+            "cache": self.cache,
+            "error": self.error,
+        }
+
+
+def _record(item):
+    with _lock:
+        totals = _totals.setdefault(item.stage, dict.fromkeys(TOTAL_FIELDS, 0))
+        totals["calls"] += 1
+        totals["seconds"] += item.seconds
+        totals["bytes"] += item.bytes
+        totals["rows"] += item.rows
+        totals["hits"] += item.cache == "hit"
+        totals["misses"] += item.cache == "miss"
+        totals["errors"] += item.error is not None
+
+    run = _current_run.get()
+    if run is not None:
+        run.append(item)
+
+    if LOG_PATH:
+        line = json.dumps(item.as_dict(), default=str)
+        with _lock, open(LOG_PATH, "a") as f:
+            f.write(line + "\n")
+
+
+@contextmanager
+def span(stage, **labels):
+    """
+    Mede uma etapa (leitura da planilha, download, extração, KGE...).
+
+    Uso: `with span("download", url=url) as s: ...; s.add(bytes=n)`. O
+    resultado entra nos totais do processo, na execução atual (quando
+    `begin_run` foi chamado nesta thread/contexto) e, se `CEDA_METRICS_LOG`
+    estiver definida, numa linha JSON desse arquivo.
+    """
+    item = Span(stage, labels)
+    start = time.perf_counter()
+    try:
+        yield item
+    except BaseException as e:
+        item.error = type(e).__name__
+        raise
+    finally:
+        item.seconds = time.perf_counter() - start
+        _record(item)
+
+
+def _update_tracing(tracer, trace_memory):
+    now = time.monotonic()
+    with _lock:
+        for idle in [key for key, seen in _tracers.items() if now - seen > TRACER_IDLE_SECONDS]:
+            del _tracers[idle]
+        if trace_memory:
+            _tracers[tracer] = now
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _tracing["owner"] = True
+            tracemalloc.reset_peak()
+        else:
+            _tracers.pop(tracer, None)
+            if not _tracers and _tracing["owner"] and tracemalloc.is_tracing():
+                tracemalloc.stop()
+                _tracing["owner"] = False
+
+
+def begin_run(trace_memory=False, tracer=None):
+    """
+    Inicia a coleta das etapas de uma execução (um rerun do Streamlit ou uma execução da CLI).
+
+    Com `trace_memory`, liga o tracemalloc e zera o pico, para que
+    `memory_peak()` dê o pico de memória alocada durante a execução. O
+    tracemalloc deixa as alocações mais lentas, por isso só fica ligado
+    enquanto alguém pede. Como ele vale para o processo inteiro, cada
+    interessado é identificado por `tracer` (no app, o id da sessão) e o
+    rastreamento só é desligado quando nenhum deles o pede mais.
+    """
+    _update_tracing(tracer, trace_memory)
+
+    run = []
+    _current_run.set(run)
+    return run
+
+
+@contextmanager
+def fragment_run():
+    """
+    Coleta as etapas de um `st.fragment` numa lista própria.
+
+    Os reruns de fragmentos (ex.: `run_every`) não passam por `begin_run`;
+    sem isto, as etapas deles entrariam na lista do último rerun completo e o
+    painel somaria o mesmo rerun indefinidamente. Os totais do processo
+    continuam incluindo essas etapas.
+    """
+    run = []
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+
+
+def current_run():
+    return _current_run.get() or []
+
+
+def memory_peak():
+    """Pico de memória alocada desde `begin_run(trace_memory=True)`, ou None sem tracemalloc."""
+    if not tracemalloc.is_tracing():
+        return None
+    return tracemalloc.get_traced_memory()[1]
+
+
+def totals():
+    with _lock:
+        return {stage: dict(values) for stage, values in _totals.items()}
+
+
+PROMETHEUS_METRICS = [
+    ("ceda_stage_calls_total", "calls", "Execuções de cada etapa"),
+    ("ceda_stage_seconds_total", "seconds", "Tempo total gasto em cada etapa"),
+    ("ceda_stage_bytes_total", "bytes", "Bytes transferidos ou lidos por etapa"),
+    ("ceda_stage_rows_total", "rows", "Linhas/séries processadas por etapa"),
+    ("ceda_cache_hits_total", "hits", "Acertos de cache por etapa"),
+    ("ceda_cache_misses_total", "misses", "Faltas de cache por etapa"),
+    ("ceda_stage_errors_total", "errors", "Etapas encerradas com erro"),
+]
+
+
+def prometheus_text():
+    """Totais do processo no formato de texto do Prometheus (para o textfile collector do node_exporter)."""
+    stages = totals()
+    lines = []
+    for name, field, help_text in PROMETHEUS_METRICS:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        lines += [f'{name}{{stage="{stage}"}} {values[field]}' for stage, values in sorted(stages.items())]
+    gauges = [
+        ("process_resident_memory_bytes", "Memória residente atual", rss_bytes()),
+        ("ceda_process_peak_rss_bytes", "Pico de memória residente do processo", peak_rss_bytes()),
+    ]
+    for name, help_text, value in gauges:
+        if value is not None:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path=None):
+    """Grava `prometheus_text()` em `path` (padrão: `CEDA_METRICS_PROM`); não faz nada sem caminho."""
+    path = path or PROMETHEUS_PATH
+    if not path:
+        return None
+    with open(path + ".tmp", "w") as f:
+        f.write(prometheus_text())
+    os.replace(path + ".tmp", path)
+    return path
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+# Agregação mensal pelo nome da variável lida do dataset (comparável às séries mensais do INMET); as demais usam a média.
+MONTHLY_AGGREGATION = {"pre": "sum", "pr": "sum", "tp": "sum", "prcp": "sum", "precip": "sum", "precipitation": "sum"}
+SUM_STANDARD_NAMES = ("precipitation_amount", "precipitation_flux", "lwe_thickness_of_precipitation_amount")
+
+KELVIN_UNITS = ("K", "kelvin", "Kelvin")
+RATE_UNITS = ("kg m-2 s-1", "kg/m2/s", "kg m**-2 s**-1", "mm/s", "mm s-1")
+
+TIME_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def aggregation_for(var_name, attrs=None):
+    """
+    "sum" ou "mean" para a variável efetivamente lida do dataset (`var_name`,
+    com seus atributos), não para o `var_id` pedido, que pode ter outro nome.
+    """
+    attrs = attrs or {}
+    if attrs.get("standard_name") in SUM_STANDARD_NAMES:
+        return "sum"
+    return MONTHLY_AGGREGATION.get(str(var_name), "mean")
+
+
+def time_step_seconds(times):
+    times = np.asarray(times)
+    if times.size < 2:
+        return 0.0
+    return float(np.median(np.diff(times.astype("datetime64[s]").astype("int64"))))
+
+
+def unit_conversion(units, times):
+    """
+    `(escala, deslocamento, unidade)` para levar a variável às unidades do INMET.
+
+    Kelvin vira °C e taxas de precipitação (kg m-2 s-1) viram o total em mm de
+    cada passo de tempo, para que a soma mensal dê o total do mês. Outras
+    unidades ficam como estão.
+    """
+    units = str(units or "").strip()
+    if units in KELVIN_UNITS:
+        return 1.0, -273.15, "degC"
+    if units in RATE_UNITS:
+        return time_step_seconds(times), 0.0, "mm"
+    return 1.0, 0.0, units
+
+
+def convert_units(points):
+    """`unit_conversion` aplicada a um DataArray com o tempo na primeira dimensão (preguiçosa com Dask)."""
+    scale, offset, units = unit_conversion(points.attrs.get("units"), points[points.dims[0]].values)
+    if scale == 1.0 and offset == 0.0:
+        return points
+    return (points * scale + offset).assign_attrs(units=units)
+
+
+def to_monthly(points, how="mean"):
+    """Reamostra um DataArray para meses: soma com `how="sum"` (ver `aggregation_for`), média nos demais."""
+    resampler = points.resample({points.dims[0]: "MS"})
+    return resampler.sum(min_count=1) if how == "sum" else resampler.mean()
+
+
+class MonthlyAccumulator:
+    """
+    Soma e contagem por mês e estação, alimentadas bloco a bloco ao longo do tempo.
+
+    Permite reduzir séries diárias/horárias a mensais lendo o eixo do tempo em
+    partes, sem manter a série completa em memória; meses divididos entre dois
+    blocos são combinados.
+    """
+
+    def __init__(self, columns, how="mean"):
+        self.columns = list(columns)
+        self.how = how
+        self.sums = {}
+        self.counts = {}
+
+    def add(self, times, values):
+        values = np.asarray(values, dtype=float).reshape(len(times), len(self.columns))
+        months = pd.DatetimeIndex(times).to_period("M")
+        codes, uniques = pd.factorize(months)
+
+        valid = ~np.isnan(values)
+        sums = np.zeros((len(uniques), len(self.columns)))
+        counts = np.zeros((len(uniques), len(self.columns)), dtype=np.int64)
+        np.add.at(sums, codes, np.where(valid, values, 0.0))
+        np.add.at(counts, codes, valid)
+
+        for i, month in enumerate(uniques):
+            if month in self.sums:
+                self.sums[month] += sums[i]
+                self.counts[month] += counts[i]
+            else:
+                self.sums[month] = sums[i]
+                self.counts[month] = counts[i]
+
+    def result(self, index_name="time"):
+        """DataFrame mês x estação, indexado pelo primeiro dia de cada mês."""
+        months = sorted(self.sums)
+        if not months:
+            return pd.DataFrame(columns=self.columns)
+        sums = np.vstack([self.sums[month] for month in months])
+        counts = np.vstack([self.counts[month] for month in months])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = sums if self.how == "sum" else sums / counts
+        values = np.where(counts > 0, values, np.nan)
+        index = pd.PeriodIndex(months, freq="M").to_timestamp(how="start")
+        return pd.DataFrame(values, index=pd.Index(index, name=index_name), columns=self.columns)
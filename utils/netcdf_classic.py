@@ -0,0 +1,138 @@
+import struct
+import numpy as np
+
+NC_TYPES = {1: "i1", 2: "S1", 3: ">i2", 4: ">i4", 5: ">f4", 6: ">f8", 7: "u1", 8: ">u2", 9: ">u4", 10: ">i8", 11: ">u8"}
+NC_DIMENSION = 10
+NC_VARIABLE = 11
+NC_ATTRIBUTE = 12
+
+
+def is_classic(magic):
+    """Se os primeiros bytes são de um NetCDF clássico (CDF-1, CDF-2 ou CDF-5)."""
+    return magic[:3] == b"CDF" and len(magic) > 3 and magic[3] in (1, 2, 5)
+
+
+def _padded(size):
+    return size + (-size % 4)
+
+
+class _HeaderReader:
+    """Leitura sequencial dos campos do cabeçalho (big-endian, alinhados em 4 bytes)."""
+
+    def __init__(self, f, version):
+        self.f = f
+        self.count_format = ">Q" if version == 5 else ">I"
+        self.offset_format = ">Q" if version in (2, 5) else ">I"
+
+    def _unpack(self, fmt):
+        size = struct.calcsize(fmt)
+        data = self.f.read(size)
+        if len(data) != size:
+            raise ValueError("Cabeçalho NetCDF truncado.")
+        return struct.unpack(fmt, data)[0]
+
+    def tag(self):
+        return self._unpack(">I")
+
+    def count(self):
+        return self._unpack(self.count_format)
+
+    def offset(self):
+        return self._unpack(self.offset_format)
+
+    def name(self):
+        size = self.count()
+        return self.f.read(_padded(size))[:size].decode("utf-8", "replace")
+
+    def values(self):
+        nc_type = self.tag()
+        n = self.count()
+        dtype = np.dtype(NC_TYPES[nc_type])
+        data = self.f.read(_padded(n * dtype.itemsize))[:n * dtype.itemsize]
+        if nc_type == 2:
+            return data.rstrip(b"\0").decode("utf-8", "replace")
+        values = np.frombuffer(data, dtype)
+        return values[0].item() if n == 1 else values
+
+    def items(self, expected_tag, read_item):
+        tag, n = self.tag(), self.count()
+        if tag == 0 and n == 0:
+            return []
+        if tag != expected_tag:
+            raise ValueError("Cabeçalho NetCDF inválido.")
+        return [read_item() for _ in range(n)]
+
+    def attrs(self):
+        return dict(self.items(NC_ATTRIBUTE, lambda: (self.name(), self.values())))
+
+    def variable(self, dim_names):
+        name = self.name()
+        dim_ids = [self.count() for _ in range(self.count())]
+        attrs = self.attrs()
+        nc_type = self.tag()
+        vsize = self.count()
+        begin = self.offset()
+        return name, {
+            "dims": [dim_names[i] for i in dim_ids],
+            "dtype": np.dtype(NC_TYPES[nc_type]),
+            "attrs": attrs,
+            "vsize": vsize,
+            "begin": begin,
+        }
+
+
+def read_classic_header(f):
+    """
+    Cabeçalho de um NetCDF clássico, sem ler os dados das variáveis.
+
+    Retorna dimensões (a de registro com o número de registros), atributos
+    globais e, por variável, dimensões, dtype, atributos e a posição dos dados
+    no arquivo. Usado com o `HTTPRangeFile`, transfere só os bytes do cabeçalho.
+    """
+    f.seek(0)
+    magic = f.read(4)
+    if not is_classic(magic):
+        raise ValueError("O arquivo não é NetCDF clássico.")
+
+    reader = _HeaderReader(f, magic[3])
+    numrecs = reader.count()
+    dims = reader.items(NC_DIMENSION, lambda: (reader.name(), reader.count()))
+    record_dim = next((name for name, size in dims if size == 0), None)
+    attrs = reader.attrs()
+    dim_names = [name for name, _ in dims]
+    variables = dict(reader.items(NC_VARIABLE, lambda: reader.variable(dim_names)))
+
+    sizes = {name: (numrecs if size == 0 else size) for name, size in dims}
+    for var in variables.values():
+        var["record"] = record_dim is not None and var["dims"][:1] == [record_dim]
+        var["shape"] = [sizes[dim] for dim in var["dims"]]
+    record_vars = [var for var in variables.values() if var["record"]]
+    # Com uma única variável de registro, os registros não têm preenchimento.
+    record_size = (int(np.prod(record_vars[0]["shape"][1:], dtype=np.int64)) * record_vars[0]["dtype"].itemsize
+                   if len(record_vars) == 1 else sum(var["vsize"] for var in record_vars))
+    return {"dims": sizes, "record_dim": record_dim, "record_size": record_size,
+            "attrs": attrs, "variables": variables}
+
+
+def read_classic_values(f, header, name, records=None):
+    """
+    Valores de uma variável do cabeçalho lido por `read_classic_header`.
+
+    Para variáveis de registro, `records` limita a leitura a esses índices
+    (por exemplo `[0, -1]` para o primeiro e o último tempo).
+    """
+    var = header["variables"][name]
+    dtype = var["dtype"]
+    if not var["record"]:
+        count = int(np.prod(var["shape"], dtype=np.int64))
+        f.seek(var["begin"])
+        return np.frombuffer(f.read(count * dtype.itemsize), dtype).reshape(var["shape"])
+
+    numrecs = var["shape"][0]
+    records = range(numrecs) if records is None else [r % numrecs for r in records] if numrecs else []
+    count = int(np.prod(var["shape"][1:], dtype=np.int64))
+    values = []
+    for record in records:
+        f.seek(var["begin"] + record * header["record_size"])
+        values.append(np.frombuffer(f.read(count * dtype.itemsize), dtype))
+    return np.stack(values).reshape([len(values)] + var["shape"][1:]) if values else np.empty(0, dtype)
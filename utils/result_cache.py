@@ -0,0 +1,204 @@
+import os
+import json
+import uuid
+import hashlib
+import pandas as pd
+import requests
+from utils.ceda_client import request
+from utils.metrics import span
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "series")
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+# Parte da chave: entradas gravadas antes das séries mensais não são reaproveitadas.
+SERIES_RESOLUTION = "monthly"
+# Também na chave: sobe quando a extração muda (v2: agregação pela variável lida do dataset).
+SERIES_FORMAT = 2
+
+
+def dataset_version(url, headers=None):
+    """ETag ou Last-Modified do dataset remoto; string vazia quando o servidor não informa."""
+    try:
+        response = request("HEAD", url, headers=headers, allow_redirects=True)
+        response.raise_for_status()
+    except requests.exceptions.RequestException:
+        return ""
+    return response.headers.get("etag") or response.headers.get("last-modified") or ""
+
+
+def cache_key(var_id, url, station_code, version):
+    raw = "|".join(str(part) for part in (var_id, url, station_code, version, SERIES_RESOLUTION, SERIES_FORMAT))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _paths(key, cache_dir):
+    return os.path.join(cache_dir, f"{key}.parquet"), os.path.join(cache_dir, f"{key}.json")
+
+
+def _tmp_path(path):
+    # Nome exclusivo: processos de extração em paralelo podem gravar a mesma chave.
+    return f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+
+
+def get_series(var_id, url, station_code, version, cache_dir=CACHE_DIR):
+    """Série em cache da estação e seus metadados, ou `(None, None)` quando não existe."""
+    data_path, meta_path = _paths(cache_key(var_id, url, station_code, version), cache_dir)
+    with span("series_cache", var=var_id) as s:
+        try:
+            series = pd.read_parquet(data_path)["value"]
+            with open(meta_path) as f:
+                meta = json.load(f)
+            s.add(bytes=os.path.getsize(data_path), rows=len(series))
+            # Atualiza o horário de acesso usado pela política LRU.
+            os.utime(data_path)
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            # Inexistente ou removida pela limpeza de outro processo enquanto era lida.
+            s.miss()
+            return None, None
+        s.hit()
+        return series, meta
+
+
+def load_entry(key, cache_dir=CACHE_DIR):
+    """Série de uma entrada listada por `list_entries`."""
+    data_path, _ = _paths(key, cache_dir)
+    return pd.read_parquet(data_path)["value"]
+
+
+def series_frame(url, station_codes=None, cache_dir=CACHE_DIR):
+    """
+    Séries em cache de um dataset no formato tempo x estação.
+
+    Quando há mais de uma versão do dataset para a estação, usa a acessada mais recentemente.
+    """
+    entries = list_entries(cache_dir)
+    entries = entries[(entries["url"] == url) & (entries["resolution"] == SERIES_RESOLUTION)].drop_duplicates("CD_ESTACAO")
+    if station_codes is not None:
+        entries = entries[entries["CD_ESTACAO"].isin([str(code) for code in station_codes])]
+    series = {}
+    for entry in entries.itertuples():
+        try:
+            series[entry.CD_ESTACAO] = load_entry(entry.key, cache_dir)
+        except (OSError, ValueError):
+            continue
+    return pd.DataFrame(series)
+
+
+def put_series(var_id, url, station_code, version, series, meta=None, cache_dir=CACHE_DIR):
+    """
+    Grava a série extraída em Parquet, com os metadados ao lado em JSON.
+
+    Os dois arquivos são escritos em temporários e renomeados, então leitores
+    em outros processos nunca veem uma entrada pela metade. Não aplica o
+    limite de tamanho: use `put_extraction` (ou chame `evict`) ao fim do lote.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    data_path, meta_path = _paths(cache_key(var_id, url, station_code, version), cache_dir)
+
+    frame = pd.DataFrame({"value": series.to_numpy()}, index=series.index)
+    tmp_path = _tmp_path(data_path)
+    frame.to_parquet(tmp_path, engine="pyarrow")
+    os.replace(tmp_path, data_path)
+
+    meta = {
+        **(meta or {}),
+        "var_id": var_id,
+        "url": url,
+        "CD_ESTACAO": str(station_code),
+        "version": version,
+        "rows": len(frame),
+        "resolution": SERIES_RESOLUTION,
+    }
+    tmp_path = _tmp_path(meta_path)
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+
+def put_extraction(var_id, url, version, series, grid_points, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """Grava as séries de uma extração (uma por estação de `grid_points`) e aplica o limite do cache uma vez."""
+    points = json.loads(grid_points.to_json(orient="records"))
+    for point in points:
+        code = point["CD_ESTACAO"]
+        put_series(var_id, url, code, version, series[code], meta={"grid_point": point}, cache_dir=cache_dir)
+    evict(max_bytes, cache_dir)
+    return len(points)
+
+
+def list_entries(cache_dir=CACHE_DIR):
+    """Inventário do cache: uma linha por série, com tamanho e último acesso."""
+    columns = ["key", "var_id", "CD_ESTACAO", "url", "version", "resolution", "rows", "size_bytes", "last_access"]
+    if not os.path.isdir(cache_dir):
+        return pd.DataFrame(columns=columns)
+
+    rows = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".json"):
+            continue
+        key = name[:-len(".json")]
+        data_path, meta_path = _paths(key, cache_dir)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            size_bytes = os.path.getsize(data_path) + os.path.getsize(meta_path)
+            last_access = os.path.getmtime(data_path)
+        except (OSError, ValueError):
+            # Entrada removida ou ainda sendo gravada por outro processo.
+            continue
+        rows.append({
+            "key": key,
+            "var_id": meta.get("var_id"),
+            "CD_ESTACAO": meta.get("CD_ESTACAO"),
+            "url": meta.get("url"),
+            "version": meta.get("version"),
+            "resolution": meta.get("resolution"),
+            "rows": meta.get("rows"),
+            "size_bytes": size_bytes,
+            "last_access": pd.Timestamp(last_access, unit="s"),
+        })
+    return pd.DataFrame(rows, columns=columns).sort_values("last_access", ascending=False, ignore_index=True)
+
+
+def purge(keys=None, cache_dir=CACHE_DIR):
+    """Remove as entradas indicadas, ou todo o cache quando `keys` é None. Retorna quantas foram removidas."""
+    if keys is None:
+        keys = list_entries(cache_dir)["key"].tolist()
+    for key in keys:
+        for path in _paths(key, cache_dir):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+    return len(keys)
+
+
+def evict(max_bytes=MAX_CACHE_BYTES, cache_dir=CACHE_DIR):
+    """Remove as entradas acessadas há mais tempo até o cache caber em `max_bytes`."""
+    if not os.path.isdir(cache_dir):
+        return 0
+
+    # Só `stat` dos arquivos: os metadados JSON não precisam ser lidos para decidir o que sai.
+    sizes, last_access = {}, {}
+    for entry in os.scandir(cache_dir):
+        key, extension = os.path.splitext(entry.name)
+        if extension not in (".parquet", ".json"):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        sizes[key] = sizes.get(key, 0) + stat.st_size
+        if extension == ".parquet":
+            last_access[key] = stat.st_mtime
+
+    total = sum(sizes.values())
+    if total <= max_bytes:
+        return 0
+
+    evicted = []
+    for key in sorted(sizes, key=lambda key: last_access.get(key, 0)):
+        if total <= max_bytes:
+            break
+        evicted.append(key)
+        total -= sizes[key]
+    return purge(evicted, cache_dir)
@@ -0,0 +1,71 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_xyz(lats, lons):
+    """Pontos (graus) na esfera unitária; a distância euclidiana entre eles é a corda."""
+    lat = np.radians(np.asarray(lats, dtype=float))
+    lon = np.radians(np.asarray(lons, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def chord_from_km(distance_km):
+    return 2 * np.sin(np.minimum(np.asarray(distance_km, dtype=float) / EARTH_RADIUS_KM, np.pi) / 2)
+
+
+def km_from_chord(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord, dtype=float) / 2, 0, 1))
+
+
+class SpatialIndex:
+    """
+    Índice espacial de pontos lat/lon.
+
+    Vizinhos mais próximos e buscas por raio usam uma KD-tree sobre os pontos
+    na esfera unitária (distâncias de grande círculo, sem problemas perto da
+    linha de data ou dos polos). Buscas por retângulo usam as latitudes
+    ordenadas (busca binária) e filtram a longitude só nos candidatos.
+    Pontos sem coordenadas são ignorados; as posições retornadas são as dos
+    arrays originais.
+    """
+
+    def __init__(self, lats, lons):
+        self.lats = np.asarray(lats, dtype=float).ravel()
+        self.lons = np.asarray(lons, dtype=float).ravel()
+        self.positions = np.flatnonzero(np.isfinite(self.lats) & np.isfinite(self.lons))
+        self.tree = cKDTree(to_xyz(self.lats[self.positions], self.lons[self.positions]))
+
+        order = np.argsort(self.lats[self.positions], kind="stable")
+        self._lat_order = self.positions[order]
+        self._lats_sorted = self.lats[self._lat_order]
+
+    def __len__(self):
+        return len(self.positions)
+
+    def nearest(self, lats, lons, k=1):
+        """`(distâncias_km, posições)` dos `k` pontos mais próximos de cada ponto consultado."""
+        chords, idx = self.tree.query(to_xyz(lats, lons), k=k)
+        return km_from_chord(chords), self.positions[idx]
+
+    def within_radius(self, lat, lon, radius_km):
+        """`(posições, distâncias_km)` dos pontos a até `radius_km` de (lat, lon), do mais próximo ao mais distante."""
+        center = to_xyz([lat], [lon])[0]
+        idx = np.asarray(self.tree.query_ball_point(center, chord_from_km(radius_km)), dtype=int)
+        distances = km_from_chord(np.linalg.norm(self.tree.data[idx] - center, axis=1)) if len(idx) else np.array([])
+        order = np.argsort(distances, kind="stable")
+        return self.positions[idx[order]], distances[order]
+
+    def within_bbox(self, lat_min, lat_max, lon_min, lon_max):
+        """Posições dos pontos no retângulo; `lon_min > lon_max` indica um retângulo que cruza a linha de data."""
+        start = np.searchsorted(self._lats_sorted, lat_min, side="left")
+        stop = np.searchsorted(self._lats_sorted, lat_max, side="right")
+        candidates = self._lat_order[start:stop]
+
+        span = (lon_max - lon_min) % 360
+        if lon_max - lon_min >= 360:
+            span = 360
+        inside = (self.lons[candidates] - lon_min) % 360 <= span
+        return np.sort(candidates[inside])
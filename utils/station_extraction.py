@@ -0,0 +1,223 @@
+import numpy as np
+import pandas as pd
+from utils.metrics import span
+from utils.monthly import TIME_BLOCK_BYTES, MonthlyAccumulator, aggregation_for, unit_conversion
+
+LAT_NAMES = ("lat", "latitude", "y")
+LON_NAMES = ("lon", "longitude", "x")
+TIME_NAMES = ("time", "t")
+
+_grid_index_cache = {}
+
+
+def find_coordinate(ds, candidates):
+    """Retorna o nome da primeira coordenada/dimensão do dataset presente em `candidates`."""
+    names = list(ds.coords) + [dim for dim in ds.dims if dim not in ds.coords]
+    for name in names:
+        if name.lower() in candidates:
+            return name
+    raise KeyError(f"Coordenada não encontrada no dataset: {', '.join(candidates)}")
+
+
+def grid_dims(ds, lat_name, lon_name):
+    """Dimensões (linha, coluna) da grade: as próprias lat/lon, ou as dimensões de lat/lon 2D (grade curvilínea)."""
+    if ds[lat_name].ndim == 2:
+        return ds[lat_name].dims
+    return ds[lat_name].dims[0], ds[lon_name].dims[0]
+
+
+def find_data_variable(ds, var_id=None, lat_name="lat", lon_name="lon"):
+    """Variável a extrair: `var_id` do `Infos` quando existir, senão a primeira com as dimensões da grade."""
+    if var_id and var_id in ds.data_vars:
+        return var_id
+    for name, var in ds.data_vars.items():
+        if lat_name in var.dims and lon_name in var.dims:
+            return name
+    raise KeyError("Nenhuma variável com dimensões de latitude/longitude encontrada no dataset.")
+
+
+class GridIndex:
+    """Índice pré-calculado de uma grade lat/lon regular para busca do ponto mais próximo."""
+
+    def __init__(self, lats, lons, dims=("lat", "lon")):
+        self.dims = tuple(dims)
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        self._lat_order = np.argsort(self.lats)
+        self._lon_order = np.argsort(self.lons)
+        self._lats_sorted = self.lats[self._lat_order]
+        self._lons_sorted = self.lons[self._lon_order]
+        self.lon_360 = bool(self.lons.max() > 180)
+
+    @staticmethod
+    def _nearest(sorted_values, order, targets):
+        pos = np.clip(np.searchsorted(sorted_values, targets), 1, len(sorted_values) - 1)
+        left = sorted_values[pos - 1]
+        right = sorted_values[pos]
+        pos = pos - ((targets - left) <= (right - targets))
+        return order[pos]
+
+    def nearest(self, lats, lons):
+        """Índices (lat, lon) da célula mais próxima para cada ponto."""
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        if self.lon_360:
+            lons = np.mod(lons, 360)
+        if len(self.lats) == 1:
+            lat_idx = np.zeros(len(lats), dtype=int)
+        else:
+            lat_idx = self._nearest(self._lats_sorted, self._lat_order, lats)
+        if len(self.lons) == 1:
+            lon_idx = np.zeros(len(lons), dtype=int)
+        else:
+            lon_idx = self._nearest(self._lons_sorted, self._lon_order, lons)
+        return lat_idx, lon_idx
+
+    def coordinates(self, lat_idx, lon_idx):
+        return self.lats[lat_idx], self.lons[lon_idx]
+
+
+class CurvilinearGridIndex:
+    """
+    Grade com latitude/longitude 2D (projetada ou rotacionada), onde a busca
+    por linha e coluna separadas não vale: o ponto mais próximo vem do mesmo
+    `SpatialIndex` (KD-tree) usado para as estações.
+    """
+
+    def __init__(self, lats, lons, dims):
+        from utils.spatial_index import SpatialIndex
+
+        self.dims = tuple(dims)
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        self.index = SpatialIndex(self.lats, self.lons)
+
+    def nearest(self, lats, lons):
+        """Índices (linha, coluna) da célula mais próxima para cada ponto."""
+        _, positions = self.index.nearest(lats, lons)
+        return np.unravel_index(positions, self.lats.shape)
+
+    def coordinates(self, row_idx, col_idx):
+        return self.lats[row_idx, col_idx], self.lons[row_idx, col_idx]
+
+
+def get_grid_index(ds, lat_name, lon_name, cache_key=None):
+    """Constrói o `GridIndex` do dataset, reaproveitando o índice quando `cache_key` já foi visto."""
+    key = (cache_key, lat_name, lon_name) if cache_key else None
+    if key in _grid_index_cache:
+        return _grid_index_cache[key]
+    dims = grid_dims(ds, lat_name, lon_name)
+    if ds[lat_name].ndim == 2:
+        index = CurvilinearGridIndex(ds[lat_name].values, ds[lon_name].values, dims)
+    else:
+        index = GridIndex(ds[lat_name].values, ds[lon_name].values, dims)
+    if key:
+        _grid_index_cache[key] = index
+    return index
+
+
+def select_station_points(ds, stations, var_name=None, cache_key=None):
+    """
+    Seleção (ainda não lida) da célula mais próxima de cada estação.
+
+    Retorna `(pontos, grid_points)`, onde `pontos` é um DataArray com as
+    dimensões (tempo, `station`). Primeiro seleciona apenas as linhas/colunas
+    da grade usadas pelas estações (leitura ortogonal) e depois os pontos de
+    cada estação. Com um dataset aberto em blocos (Dask), nada é lido até o
+    `compute`.
+    """
+    import xarray as xr
+
+    lat_name = find_coordinate(ds, LAT_NAMES)
+    lon_name = find_coordinate(ds, LON_NAMES)
+    time_name = find_coordinate(ds, TIME_NAMES)
+    row_dim, col_dim = grid_dims(ds, lat_name, lon_name)
+    var_name = find_data_variable(ds, var_name, row_dim, col_dim)
+
+    stations = stations.dropna(subset=["lat", "lon"])
+    if stations.empty:
+        return None, pd.DataFrame()
+
+    index = get_grid_index(ds, lat_name, lon_name, cache_key)
+    lat_idx, lon_idx = index.nearest(stations["lat"].to_numpy(), stations["lon"].to_numpy())
+    grid_lats, grid_lons = index.coordinates(lat_idx, lon_idx)
+
+    unique_lat, lat_pos = np.unique(lat_idx, return_inverse=True)
+    unique_lon, lon_pos = np.unique(lon_idx, return_inverse=True)
+
+    data = ds[var_name].transpose(time_name, row_dim, col_dim, ...)
+    extra_dims = {dim: 0 for dim in data.dims if dim not in (time_name, row_dim, col_dim)}
+    block = data.isel({row_dim: unique_lat, col_dim: unique_lon, **extra_dims})
+
+    station_codes = stations["CD_ESTACAO"].astype(str).to_numpy()
+    points = block.isel({
+        row_dim: xr.DataArray(lat_pos, dims="station"),
+        col_dim: xr.DataArray(lon_pos, dims="station"),
+    }).drop_vars([lat_name, lon_name, row_dim, col_dim], errors="ignore").assign_coords(station=station_codes)
+
+    grid_points = pd.DataFrame({
+        "CD_ESTACAO": station_codes,
+        "lat": stations["lat"].to_numpy(),
+        "lon": stations["lon"].to_numpy(),
+        "grid_lat": grid_lats,
+        "grid_lon": grid_lons,
+        "lat_idx": lat_idx,
+        "lon_idx": lon_idx,
+    })
+    return points, grid_points
+
+
+def points_frame(points):
+    """DataFrame tempo x estação a partir do DataArray de `select_station_points` (já calculado)."""
+    time_name = points.dims[0]
+    return pd.DataFrame(
+        points.values,
+        index=pd.Index(points[time_name].values, name=time_name),
+        columns=points["station"].values,
+    )
+
+
+def extract_station_series(ds, stations, var_name=None, cache_key=None):
+    """
+    Extrai a série temporal da célula mais próxima de cada estação.
+
+    `stations` deve ter as colunas `CD_ESTACAO`, `lat` e `lon` (graus decimais).
+    Apenas as linhas/colunas da grade usadas pelas estações são lidas, em uma
+    única leitura ortogonal preguiçosa; o resultado é um DataFrame indexado
+    pelo tempo com uma coluna por estação.
+    """
+    with span("extract", var=var_name, stations=len(stations)) as s:
+        points, grid_points = select_station_points(ds, stations, var_name, cache_key)
+        if points is None:
+            return pd.DataFrame(), grid_points
+        points = points.load()
+        s.add(bytes=points.nbytes, rows=points.size)
+        return points_frame(points), grid_points
+
+
+def extract_monthly_series(ds, stations, var_name=None, cache_key=None, block_bytes=TIME_BLOCK_BYTES):
+    """
+    Como `extract_station_series`, mas já reduzida à resolução mensal do INMET.
+
+    O eixo do tempo é lido em blocos de cerca de `block_bytes`; cada bloco é
+    convertido para as unidades do INMET e acumulado por mês (soma ou média,
+    conforme `MONTHLY_AGGREGATION`), de modo que a série diária/horária
+    completa nunca fica em memória.
+    """
+    with span("extract", var=var_name, stations=len(stations)) as s:
+        points, grid_points = select_station_points(ds, stations, var_name, cache_key)
+        if points is None:
+            return pd.DataFrame(), grid_points
+
+        time_name = points.dims[0]
+        times = points[time_name].values
+        scale, offset, _ = unit_conversion(points.attrs.get("units"), times)
+
+        cells = grid_points["lat_idx"].nunique() * grid_points["lon_idx"].nunique()
+        step = max(1, block_bytes // (points.dtype.itemsize * cells))
+        accumulator = MonthlyAccumulator(points["station"].values, aggregation_for(points.name, points.attrs))
+        for start in range(0, len(times), step):
+            block = points.isel({time_name: slice(start, start + step)}).values
+            s.add(bytes=block.nbytes, rows=block.size)
+            accumulator.add(times[start:start + step], block * scale + offset)
+        return accumulator.result(time_name), grid_points
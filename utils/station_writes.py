@@ -0,0 +1,168 @@
+import threading
+from concurrent.futures import Future
+import numpy as np
+import pandas as pd
+from utils.metrics import span
+
+WORKSHEET = "Estacoes"
+KEY_COLUMN = "CD_ESTACAO"
+FLUSH_DELAY = 1.0
+MAX_BATCH = 500
+WRITE_TIMEOUT = 60
+
+
+class StationConflict(ValueError):
+    """Códigos de estação que já existem na planilha (cadastrados por outro editor ou repetidos no envio)."""
+
+    def __init__(self, codes):
+        self.codes = list(codes)
+        super().__init__(f"Estação(ões) já cadastrada(s): {', '.join(self.codes)}")
+
+
+def station_code(value):
+    return str(value).strip()
+
+
+def _cell(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def sheet_row(record, header):
+    """Valores do registro na ordem das colunas da planilha; colunas ausentes ficam vazias."""
+    return [_cell(record.get(column)) for column in header]
+
+
+def append_to_frame(df, records):
+    """`df` com os registros acrescentados, convertendo as colunas numéricas como na leitura da planilha."""
+    new_rows = pd.DataFrame(records).reindex(columns=df.columns)
+    for column in df.columns:
+        if pd.api.types.is_numeric_dtype(df[column]):
+            new_rows[column] = pd.to_numeric(new_rows[column], errors="coerce")
+    return pd.concat([df, new_rows], ignore_index=True)
+
+
+class StationWriteQueue:
+    """
+    Fila de escrita (write-behind) da aba `Estacoes`, compartilhada pelas sessões.
+
+    Inclusões feitas com `append_and_wait` dentro de `delay` segundos (ou até
+    `max_batch` linhas) são gravadas juntas com um único `append_rows`, que
+    acrescenta após a última linha sem reescrever a aba. A gravação roda na
+    thread de quem abriu o lote (o script da sessão), não em uma thread
+    própria, então `st.connection` tem o contexto do script. O cabeçalho é
+    relido a cada gravação, para acompanhar colunas incluídas ou reordenadas.
+
+    O controle de concorrência é otimista e vale só para este processo: na
+    gravação os códigos atuais da planilha são relidos e inclusões cujo código
+    já existe falham com `StationConflict` em vez de duplicar a estação, e as
+    gravações do processo são serializadas. Outro processo (outra réplica do
+    app, a CLI) ainda pode acrescentar o mesmo código entre a leitura dos
+    códigos e o `append_rows`. Depois da gravação, só o cache de leitura da
+    aba `Estacoes` é atualizado, com as linhas novas.
+    """
+
+    def __init__(self, worksheet=WORKSHEET, key_column=KEY_COLUMN, delay=FLUSH_DELAY, max_batch=MAX_BATCH):
+        self.worksheet = worksheet
+        self.key_column = key_column
+        self.delay = delay
+        self.max_batch = max_batch
+        self._pending = []
+        self._has_leader = False
+        self._batch_full = threading.Event()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def _enqueue(self, records):
+        if isinstance(records, pd.DataFrame):
+            records = records.to_dict("records")
+        future = Future()
+        with self._lock:
+            self._pending.append((list(records), future))
+            if sum(len(batch) for batch, _ in self._pending) >= self.max_batch:
+                self._batch_full.set()
+            leader = not self._has_leader
+            self._has_leader = True
+        return future, leader
+
+    def append(self, records):
+        """
+        Enfileira registros (dicts ou DataFrame) e retorna um `Future` com o
+        número de linhas gravadas (ou a exceção da gravação). Nada é gravado
+        até um `flush` (ou o `append_and_wait` que abriu o lote).
+        """
+        return self._enqueue(records)[0]
+
+    def append_and_wait(self, records, timeout=WRITE_TIMEOUT):
+        """
+        Enfileira e espera a gravação. A primeira chamada de um lote espera
+        até `delay` segundos por outras inclusões e grava o lote na própria thread.
+        """
+        future, leader = self._enqueue(records)
+        if leader:
+            self._batch_full.wait(self.delay)
+            self.flush()
+        return future.result(timeout=timeout)
+
+    def flush(self):
+        """Grava tudo o que está na fila com uma única chamada à API; retorna o número de linhas gravadas."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                self._has_leader = False
+                self._batch_full.clear()
+            if not pending:
+                return 0
+            try:
+                return self._write(pending)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                return 0
+
+    def _accept(self, pending, existing_codes):
+        seen = set(existing_codes)
+        accepted = []
+        for records, future in pending:
+            codes = [station_code(record.get(self.key_column, "")) for record in records]
+            conflicts = [code for i, code in enumerate(codes) if code in seen or code in codes[:i]]
+            if conflicts:
+                future.set_exception(StationConflict(conflicts))
+                continue
+            seen.update(codes)
+            accepted.append((records, future))
+        return accepted
+
+    def _write(self, pending):
+        from utils.gsheets_connection import open_worksheet, patch_cached
+
+        with span("sheets_append", worksheet=self.worksheet) as s:
+            worksheet = open_worksheet(self.worksheet)
+            header = worksheet.row_values(1)
+            existing_codes = [station_code(code) for code in worksheet.col_values(header.index(self.key_column) + 1)[1:]]
+
+            accepted = self._accept(pending, existing_codes)
+            records = [record for batch, _ in accepted for record in batch]
+            if records:
+                worksheet.append_rows([sheet_row(record, header) for record in records],
+                                      value_input_option="USER_ENTERED", table_range="A1")
+                s.add(rows=len(records))
+                patch_cached(self.worksheet, lambda df: append_to_frame(df, records), expected_rows=len(existing_codes))
+
+        for batch, future in accepted:
+            future.set_result(len(batch))
+        return len(records)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_station_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = StationWriteQueue()
+        return _queue
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+COORDINATE_SCALE = 100000000
+
+
+def decode_coordinates(values):
+    """
+    Converte as coordenadas da planilha `Estacoes` para graus decimais.
+
+    As coordenadas originais são armazenadas como inteiros multiplicados por
+    1e8; estações cadastradas pelo formulário já estão em graus. Valores que
+    não podem ser convertidos viram NaN.
+    """
+    numbers = pd.to_numeric(pd.Series(values), errors="coerce").astype(float)
+    scaled = numbers.abs() > 360
+    return numbers.where(~scaled, numbers / COORDINATE_SCALE)
+
+
+def stations_with_coordinates(df):
+    """Retorna uma cópia das estações com colunas `lat`/`lon` em graus decimais."""
+    df = df.copy()
+    df["lat"] = decode_coordinates(df["VL_LATITUDE"]).to_numpy()
+    df["lon"] = decode_coordinates(df["VL_LONGITUDE"]).to_numpy()
+    return df
+
+
+class StationIndex:
+    """Estações (com `lat`/`lon` decodificadas) e seu `SpatialIndex`, com consultas que retornam DataFrames."""
+
+    def __init__(self, stations):
+        from utils.spatial_index import SpatialIndex
+
+        self.stations = stations.reset_index(drop=True)
+        self.index = SpatialIndex(self.stations["lat"].to_numpy(), self.stations["lon"].to_numpy())
+
+    def within_radius(self, lat, lon, radius_km):
+        """Estações a até `radius_km` do ponto, da mais próxima à mais distante, com a coluna `distancia_km`."""
+        positions, distances = self.index.within_radius(lat, lon, radius_km)
+        result = self.stations.iloc[positions].copy()
+        result["distancia_km"] = distances
+        return result
+
+    def within_bbox(self, lat_min, lat_max, lon_min, lon_max):
+        """Estações dentro do retângulo (por exemplo, uma célula da grade CEDA)."""
+        return self.stations.iloc[self.index.within_bbox(lat_min, lat_max, lon_min, lon_max)]
+
+    def nearest(self, lat, lon, k=1):
+        """As `k` estações mais próximas do ponto, com a coluna `distancia_km`."""
+        k = min(k, len(self.index))
+        if k == 0:
+            return self.stations.iloc[:0].assign(distancia_km=[])
+        distances, positions = self.index.nearest([lat], [lon], k=k)
+        result = self.stations.iloc[np.ravel(positions)].copy()
+        result["distancia_km"] = np.ravel(distances)
+        return result
+
+
+_stations_memo = {"source": None, "stations": None, "index": None}
+
+
+def load_stations():
+    """
+    Aba `Estacoes` com `lat`/`lon` em graus e o `StationIndex` correspondente.
+
+    A decodificação e o índice são refeitos só quando a planilha é relida
+    (nova leitura do cache de `read_worksheet`), não a cada rerun.
+    """
+    from utils.gsheets_connection import read_worksheet
+
+    source = read_worksheet("Estacoes", copy=False)
+    if _stations_memo["source"] is not source:
+        stations = stations_with_coordinates(source).reset_index(drop=True)
+        _stations_memo.update(source=source, stations=stations, index=StationIndex(stations))
+    return _stations_memo["stations"].copy(), _stations_memo["index"]